@@ -18,4 +18,5 @@ setup(name='ymir-verifier',
       include_package_data=True,
       entry_points={'console_scripts': [
           'ymir-verifier = src.cmd:main',
+          'ymir-verifier-dataset = src.synthetic:main',
       ]})
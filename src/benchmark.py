@@ -0,0 +1,182 @@
+"""benchmark the throughput of infer and mining task, compare with the stored baseline
+
+benchmark:
+  tasks: [infer, mining]  # optional, the tasks to benchmark
+  warmup: 1  # optional, the trials not count, eg: load the docker image into page cache
+  trials: 3  # optional, the trials to measure
+  tolerance: 0.1  # optional, fail if images/sec drop more than 10% compared with baseline
+  family: ''  # optional, the baseline name, default is the docker image name without version
+  baseline_dir: ''  # optional, default is <cache_root>/benchmark
+
+for each trial, the time is split into:
+- startup: from container create to the data loaded (or the first log line if not found)
+- steady: from the data loaded to the container exit
+images/sec = the number of candidate images / steady seconds, the median of trials is used.
+
+the results are saved in <work_dir>/benchmark-<benchmark_id>/benchmark-result.yaml,
+the baseline is saved in <baseline_dir>/<family>.yaml if not exist or update_baseline=True.
+"""
+import copy
+import os
+import os.path as osp
+import re
+import shutil
+import statistics
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import yaml
+from easydict import EasyDict as edict
+
+from .dataset_index import read_index_file
+from .runtime import get_runtime
+from .utils import get_cache_root
+from .verifier_detection import VerifierDetection
+from .verifier_segmentation import VerifierSegmentation
+
+
+def get_image_family(docker_image: str) -> str:
+    """remove the version in docker image tag
+    eg: youdaoyzbx/ymir-executor:ymir2.1.0-yolov5-v7.0-cu111-tmi --> youdaoyzbx_ymir-executor_ymir-yolov5-cu111-tmi
+    """
+    repository, _, tag = docker_image.rpartition(':')
+    if not repository or '/' in tag:
+        repository, tag = docker_image, ''
+    tag = re.sub(r'v?\d+(\.\d+)+', '', tag)
+    family = re.sub('[^a-zA-Z0-9_.-]', '_', f'{repository}_{tag}' if tag else repository)
+    return re.sub('-+', '-', family).strip('-_')
+
+
+def get_trial_seconds(events: Dict[str, float]) -> Dict[str, float]:
+    """split the container time into startup and steady seconds
+    """
+    steady_start = events.get('data_loaded', events.get('first_log', events['container_start']))
+    return dict(startup=round(steady_start - events['container_create'], 3),
+                steady=round(events['container_exit'] - steady_start, 3),
+                total=round(events['container_exit'] - events['container_create'], 3))
+
+
+class Benchmark(object):
+
+    def __init__(self, cfg: edict, benchmark_id: str = '', update_baseline: bool = False):
+        self.cfg = copy.deepcopy(cfg)
+        # the cached result makes the throughput meaningless
+        self.cfg.result_cache = False
+        self.benchmark_id = benchmark_id or str(round(time.time()))
+        self.benchmark_dir = osp.join(self.cfg.work_dir, f'benchmark-{self.benchmark_id}')
+        self.result_file = osp.join(self.benchmark_dir, 'benchmark-result.yaml')
+        self.update_baseline = update_baseline
+
+        benchmark_cfg = self.cfg.get('benchmark', None) or {}
+        self.tasks: List[str] = benchmark_cfg.get('tasks', ['infer', 'mining'])
+        self.warmup: int = benchmark_cfg.get('warmup', 1)
+        self.trials: int = benchmark_cfg.get('trials', 3)
+        self.tolerance: float = benchmark_cfg.get('tolerance', 0.1)
+        self.family: str = benchmark_cfg.get('family', '') or get_image_family(self.cfg.docker_image)
+        baseline_dir = benchmark_cfg.get('baseline_dir', '') or osp.join(get_cache_root(), 'benchmark')
+        self.baseline_file = osp.join(baseline_dir, f'{self.family}.yaml')
+
+        self.cfg.object_type = get_runtime(self.cfg).get_object_type(self.cfg.docker_image)
+        if self.cfg.object_type == 2:
+            self.verifier_class = VerifierDetection
+        else:
+            self.verifier_class = VerifierSegmentation
+
+    def get_image_num(self) -> int:
+        docker_in_dir = self.cfg.env_config.input.root_dir
+        index_file = self.cfg.env_config.input.candidate_index_file.replace(docker_in_dir, self.cfg.data_dir)
+        return len(read_index_file(index_file, docker_in_dir, self.cfg.data_dir))
+
+    def run_trial(self, task: str, trial: int) -> Dict[str, float]:
+        cfg = copy.deepcopy(self.cfg)
+        cfg.task_id = f'{self.benchmark_id}-{task}-{trial}'
+        cfg.in_dir = osp.join(self.benchmark_dir, f'{task}-{trial}', 'in')
+        cfg.out_dir = osp.join(self.benchmark_dir, f'{task}-{trial}', 'out')
+        shutil.rmtree(osp.dirname(cfg.in_dir), ignore_errors=True)
+
+        v = self.verifier_class(cfg)
+        task_result = v.verify_task(docker_image_name=cfg.docker_image, task=task)
+        return get_trial_seconds(task_result['events']['events'])
+
+    def run_task(self, task: str, image_num: int) -> Dict:
+        trials = []
+        for trial in range(self.warmup + self.trials):
+            seconds = self.run_trial(task, trial)
+            warmup = trial < self.warmup
+            print(f'benchmark {task} trial {trial}{" (warmup)" if warmup else ""}: {seconds}')
+            if not warmup:
+                trials.append(seconds)
+
+        steady = statistics.median(t['steady'] for t in trials)
+        total = statistics.median(t['total'] for t in trials)
+        return dict(image_num=image_num,
+                    images_per_sec=round(image_num / steady, 3) if steady > 0 else 0.0,
+                    end_to_end_images_per_sec=round(image_num / total, 3) if total > 0 else 0.0,
+                    startup=statistics.median(t['startup'] for t in trials),
+                    steady=steady,
+                    trials=trials)
+
+    def load_baseline(self) -> Dict:
+        if osp.isfile(self.baseline_file):
+            with open(self.baseline_file, 'r') as fp:
+                return yaml.safe_load(fp) or {}
+        return {}
+
+    def save_baseline(self, baseline: Dict) -> None:
+        os.makedirs(osp.dirname(self.baseline_file), exist_ok=True)
+        with open(self.baseline_file, 'w') as fw:
+            yaml.safe_dump(baseline, fw, sort_keys=False)
+        print(f'benchmark baseline saved to {self.baseline_file}')
+
+    def compare(self, result: Dict, baseline_result: Optional[Dict]) -> str:
+        """return the error message if the throughput drop past tolerance, empty string if pass
+        """
+        if not baseline_result or not baseline_result.get('images_per_sec'):
+            return ''
+
+        ratio = result['images_per_sec'] / baseline_result['images_per_sec']
+        result['baseline_images_per_sec'] = baseline_result['images_per_sec']
+        result['ratio'] = round(ratio, 3)
+        if ratio < 1 - self.tolerance:
+            return (f'images/sec {result["images_per_sec"]} is {100 * (1 - ratio):.1f}% slower than baseline '
+                    f'{baseline_result["images_per_sec"]} ({baseline_result.get("docker_image", "")})')
+        return ''
+
+    def run(self) -> bool:
+        os.makedirs(self.benchmark_dir, exist_ok=True)
+        image_num = self.get_image_num()
+        baseline = self.load_baseline()
+        print(f'run benchmark {self.benchmark_id} for {self.cfg.docker_image} with {image_num} images, '
+              f'baseline {self.baseline_file}')
+
+        results: Dict[str, Dict] = {}
+        for task in self.tasks:
+            try:
+                result = self.run_task(task, image_num)
+                result['error'] = self.compare(result, baseline.get(task, None))
+            except Exception as e:
+                traceback.print_exc()
+                result = dict(error=f'{type(e).__name__}: {e}')
+            result['state'] = 'fail' if result['error'] else 'pass'
+            results[task] = result
+            print(f'benchmark {task}: {result}')
+
+            if result.get('images_per_sec') and (self.update_baseline or task not in baseline):
+                baseline[task] = dict(images_per_sec=result['images_per_sec'],
+                                      startup=result['startup'],
+                                      steady=result['steady'],
+                                      image_num=image_num,
+                                      docker_image=self.cfg.docker_image,
+                                      timestamp=time.time())
+                self.save_baseline(baseline)
+
+        with open(self.result_file, 'w') as fw:
+            yaml.safe_dump(dict(docker_image=self.cfg.docker_image,
+                                family=self.family,
+                                tolerance=self.tolerance,
+                                results=results),
+                           fw,
+                           sort_keys=False)
+        print(f'benchmark result saved to {self.result_file}')
+        return all(result['state'] == 'pass' for result in results.values())
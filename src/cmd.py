@@ -1,9 +1,10 @@
 import argparse
+import sys
 
 import yaml
 from easydict import EasyDict as edict
 
-from .pipeline import PipeLine
+from .utils import get_task_list
 
 
 class ParseKwargs(argparse.Action):
@@ -25,7 +26,47 @@ def get_args():
                         help='the task to test, will overwrite config file if offered',
                         required=False,
                         choices=['training', 'mining', 'infer', 'tmi', 'ttmi', 'mi', 't', 'm', 'i'])
-    parser.add_argument('--config', help='the config file', required=True)
+    parser.add_argument('--config', help='the config file, required without --matrix', required=False)
+    parser.add_argument('--matrix',
+                        default=None,
+                        help='the matrix file, verify multiple docker images and configs concurrently')
+    parser.add_argument('--sweep',
+                        action='store_true',
+                        help='batch test the hyper_parameters in config file, see src/sweep.py for detail')
+    parser.add_argument('--sweep_id', default='', help='resume the sweep with sweep_id, skip the passed points')
+    parser.add_argument('--smoke_size',
+                        type=float,
+                        default=None,
+                        help='smoke verification with a subset of dataset, the number (>=1) or fraction (<1) of images')
+    parser.add_argument('--smoke_seed', type=int, default=None, help='the random seed for --smoke_size')
+    parser.add_argument('--result_cache',
+                        action='store_true',
+                        help='reuse the output of previous successful task if nothing changed')
+    parser.add_argument('--benchmark',
+                        action='store_true',
+                        help='benchmark the throughput of infer and mining, see src/benchmark.py for detail')
+    parser.add_argument('--update_baseline', action='store_true', help='save the benchmark result as baseline')
+    parser.add_argument('--scaling',
+                        action='store_true',
+                        help='measure the time and memory of infer or mining with candidate sizes, see src/scaling.py')
+    parser.add_argument('--startup',
+                        action='store_true',
+                        help='profile the cold and warm container startup latency, see src/startup.py for detail')
+    parser.add_argument('--resume',
+                        default='',
+                        help='resume the pipeline with task_id, skip the passed stages in <work_dir>/<task_id>')
+    parser.add_argument('--runtime',
+                        default=None,
+                        choices=['docker-cli', 'docker-sdk', 'fake'],
+                        help='the container runtime, fake for the local fake executor, see src/runtime.py for detail')
+    parser.add_argument('--warm_container',
+                        action='store_true',
+                        help='run all tasks in one container with docker exec, see src/warm_container.py')
+    parser.add_argument('--dry_run',
+                        '--dry-run',
+                        action='store_true',
+                        help='print the plan of pipeline without starting any container: task order, workspaces, '
+                        'mounts and rendered configs')
     parser.add_argument('--pretrain_weights_dir', default=None, help='use for mining and infer only')
     parser.add_argument('--gpu_id', nargs='?')
     parser.add_argument('--cfg-options', nargs='*', action=ParseKwargs)
@@ -36,30 +77,48 @@ def get_args():
 def main():
     args = get_args()
 
+    if args.dry_run and (args.matrix or args.sweep or args.benchmark or args.scaling or args.startup):
+        raise Exception('--dry_run only support the pipeline, not --matrix, --sweep, --benchmark, --scaling '
+                        'or --startup')
+
+    # import the module of each mode on demand, keep the cli startup and --help fast
+    if args.matrix:
+        from .matrix import run_matrix
+        success = run_matrix(args.matrix)
+        sys.exit(0 if success else 1)
+    elif not args.config:
+        raise Exception('--config is required without --matrix')
+
     with open(args.config, 'r') as fp:
         cfg = edict(yaml.safe_load(fp))
 
     if args.tasks:
-        if args.tasks in ['t', 'training']:
-            tasks = ['training']
-        elif args.tasks in ['m', 'mining']:
-            tasks = ['mining']
-        elif args.tasks in ['i', 'infer']:
-            tasks = ['infer']
-        elif args.tasks in ['tmi']:
-            tasks = ['training', 'mining', 'infer']
-        elif args.tasks in ['mi']:
-            tasks = ['mining', 'infer']
-        elif args.tasks in ['ttmi']:
-            tasks = ['training', 'training', 'mining', 'infer']
-        else:
-            raise Exception(f'unknown task {args.task}')
-
-        cfg.tasks = tasks
+        cfg.tasks = get_task_list(args.tasks)
 
     if args.docker_image:
         cfg.docker_image = args.docker_image
 
+    if args.smoke_size:
+        cfg.smoke_size = args.smoke_size
+    if args.smoke_seed is not None:
+        cfg.smoke_seed = args.smoke_seed
+
+    if args.result_cache:
+        cfg.result_cache = True
+
+    if args.runtime:
+        cfg.runtime = args.runtime
+
+    if args.warm_container:
+        cfg.warm_container = True
+
+    if args.dry_run:
+        cfg.dry_run = True
+
+    if args.resume:
+        cfg.task_id = args.resume
+        cfg.resume = True
+
     if args.pretrain_weights_dir:
         cfg.pretrain_weights_dir = args.pretrain_weights_dir
 
@@ -68,7 +127,31 @@ def main():
         for key, value in args.cfg_options.items():
             cfg[key] = value
 
+    if args.benchmark:
+        from .benchmark import Benchmark
+        success = Benchmark(cfg, update_baseline=args.update_baseline).run()
+        sys.exit(0 if success else 1)
+
+    if args.scaling:
+        from .scaling import Scaling
+        success = Scaling(cfg).run()
+        sys.exit(0 if success else 1)
+
+    if args.startup:
+        from .startup import StartupProfiler
+        success = StartupProfiler(cfg).run()
+        sys.exit(0 if success else 1)
+
+    if args.sweep:
+        from .sweep import Sweep
+        success = Sweep(cfg, args.sweep_id).run()
+        sys.exit(0 if success else 1)
+
+    from .pipeline import PipeLine
     v = PipeLine(cfg)
+    if args.dry_run:
+        print(yaml.safe_dump(v.plan(), sort_keys=False))
+        return
     v.run()
 
 
@@ -0,0 +1,97 @@
+"""resolve the config once, the pipeline share the resolved config with all tasks
+
+the resolved config contains:
+- env_config: from all-in-one config, env_config_file (default ./env.yaml) or the default ymir env
+- param_config: from all-in-one config, param_config_file (default ./test-config.yaml) or empty for each task
+- resolved: true, Verifier use the resolved config without copy and reading the yaml files again
+
+the pretrain weight files are cached in process by the modify time of pretrain_weights_dir,
+the tasks with the same pretrain_weights_dir glob the directory only once.
+"""
+import copy
+import glob
+import os
+import os.path as osp
+import threading
+from typing import Dict, List, Tuple
+
+import yaml
+from easydict import EasyDict as edict
+
+SUPPORTED_TASKS = ['training', 'mining', 'infer']
+
+_pretrain_files_lock = threading.Lock()
+# (pretrain_weights_dir, mtime_ns) -> the files in docker container
+_pretrain_files_cache: Dict[Tuple[str, int], List[str]] = {}
+
+
+def get_default_env_config() -> Dict:
+    """the ymir env config, affect /in/env.yaml
+    """
+    return dict(input=dict(annotations_dir='/in/annotations',
+                           assets_dir='/in/assets',
+                           candidate_index_file='/in/candidate-index.tsv',
+                           config_file='/in/config.yaml',
+                           models_dir='/in/models',
+                           root_dir='/in',
+                           training_index_file='/in/train-index.tsv',
+                           val_index_file='/in/val-index.tsv'),
+                output=dict(infer_result_file='/out/infer-result.json',
+                            mining_result_file='/out/result.tsv',
+                            models_dir='/out/models',
+                            monitor_file='/out/monitor.txt',
+                            root_dir='/out',
+                            tensorboard_dir='/out/tensorboard',
+                            training_result_file='/out/models/result.yaml'),
+                run_infer=False,
+                run_mining=False,
+                run_training=True,
+                task_id='t00000020000029d077c1662111056')
+
+
+def get_pretrain_files(pretrain_weights_dir: str, docker_models_dir: str = '/in/models') -> List[str]:
+    """the docker container path of files in pretrain_weights_dir, not recursive
+    note pretrain_weights_dir will mount to docker_models_dir
+    """
+    if not osp.isdir(pretrain_weights_dir):
+        return []
+
+    key = (osp.abspath(pretrain_weights_dir), os.stat(pretrain_weights_dir).st_mtime_ns)
+    with _pretrain_files_lock:
+        if key in _pretrain_files_cache:
+            return list(_pretrain_files_cache[key])
+
+    pretrain_files = []
+    for f in sorted(glob.glob(osp.join(pretrain_weights_dir, '*'), recursive=False)):
+        if osp.isfile(f):
+            pretrain_files.append(osp.join(docker_models_dir, osp.relpath(f, start=pretrain_weights_dir)))
+    with _pretrain_files_lock:
+        _pretrain_files_cache[key] = pretrain_files
+    return list(pretrain_files)
+
+
+def resolve_config(cfg: edict) -> edict:
+    """return the resolved copy of cfg, return cfg itself if resolved
+    """
+    if cfg.get('resolved', False):
+        return cfg
+
+    cfg = copy.deepcopy(cfg)
+    if not cfg.get('env_config', None):
+        env_config_file = cfg.get('env_config_file', './env.yaml')
+        if osp.exists(env_config_file):
+            with open(env_config_file, 'r') as fp:
+                cfg.env_config = yaml.safe_load(fp)
+        else:
+            cfg.env_config = get_default_env_config()
+
+    if not cfg.get('param_config', None):
+        param_config_file = cfg.get('param_config_file', './test-config.yaml')
+        if osp.exists(param_config_file):
+            with open(param_config_file, 'r') as fp:
+                cfg.param_config = yaml.safe_load(fp)
+        else:
+            cfg.param_config = {task: {} for task in SUPPORTED_TASKS}
+
+    cfg.resolved = True
+    return cfg
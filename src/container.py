@@ -0,0 +1,181 @@
+"""run the docker container with docker sdk, capture the logs with timestamps
+
+each run write two files:
+- <log_file>: the container stdout and stderr, each line prefixed by docker timestamp
+- <events_file>: the timing events extracted from logs, eg: first log line, first iteration
+"""
+import json
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .telemetry import ResourceSampler
+
+if TYPE_CHECKING:
+    import docker
+
+_client_lock = threading.Lock()
+_client = None
+
+# the milestones in executor logs, the first matched line is recorded
+DEFAULT_LOG_MILESTONES = {
+    'data_loaded': r'(load(ed|ing)? .*(data|dataset|annotation|image)s?|(data|dataset)s? .*(loaded|ready)|'
+                   r'dataloader|done \(t=)',
+    'first_iteration': r'\b(epoch|iter|iteration|step)\b\S*\s*[\[(:]?\s*\d+',
+    'evaluation_start': r'\b(evaluating|evaluation|evaluate|validating|validation)\b',
+}
+
+
+def parse_docker_timestamp(timestamp: str) -> Optional[float]:
+    """parse docker log timestamp (RFC3339Nano), eg: 2022-10-12T08:01:02.123456789Z
+    """
+    match = re.match(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?Z', timestamp)
+    if match is None:
+        return None
+
+    seconds = datetime.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    fraction = float(match.group(2)) if match.group(2) else 0.0
+    return seconds + fraction
+
+
+def format_docker_timestamp(timestamp: float) -> str:
+    """the docker log timestamp for host time, eg: 2022-10-12T08:01:02.123456Z
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class LogCapture(object):
+    """write the docker logs to file line by line, and record the timing events
+    """
+
+    def __init__(self, log_file: str, milestones: Optional[Dict[str, str]] = None, prefix: str = ''):
+        self.log_file = log_file
+        self.prefix = prefix
+        self.milestones = {key: re.compile(value, re.IGNORECASE) for key, value in (milestones or {}).items()}
+        self.events: Dict[str, float] = {}
+        self._buffer = b''
+        # the logs without docker timestamp, see feed_host_time()
+        self._host_buffer = b''
+        self._fw = open(log_file, 'w')
+
+    def add_event(self, name: str, timestamp: Optional[float] = None) -> None:
+        if name not in self.events:
+            self.events[name] = timestamp or time.time()
+
+    def add_line(self, line: str) -> None:
+        self._fw.write(line + '\n')
+        timestamp_str, _, message = line.partition(' ')
+        timestamp = parse_docker_timestamp(timestamp_str)
+        print(f'{self.prefix}{message}')
+
+        self.add_event('first_log', timestamp)
+        for name, pattern in self.milestones.items():
+            if name not in self.events and pattern.search(message):
+                self.add_event(name, timestamp)
+
+    def feed(self, data: bytes) -> None:
+        """the data may contain multiple lines or part of line
+        """
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            self.add_line(line.decode('utf-8', errors='replace').rstrip('\r'))
+
+    def feed_host_time(self, data: bytes) -> None:
+        """the same as feed(), but the data has no docker timestamp, eg: the output of docker exec.
+        each line is prefixed by the host time when it is received
+        """
+        self._host_buffer += data
+        *lines, self._host_buffer = self._host_buffer.split(b'\n')
+        for line in lines:
+            self.feed(f'{format_docker_timestamp(time.time())} '.encode('utf-8') + line + b'\n')
+
+    def close(self) -> None:
+        if self._host_buffer:
+            self.feed(f'{format_docker_timestamp(time.time())} '.encode('utf-8') + self._host_buffer)
+            self._host_buffer = b''
+        if self._buffer:
+            self.add_line(self._buffer.decode('utf-8', errors='replace'))
+            self._buffer = b''
+        self._fw.close()
+
+    def save_events(self, events_file: str) -> None:
+        with open(events_file, 'w') as fw:
+            json.dump(self.get_durations(), fw, indent=2)
+
+    def get_durations(self) -> Dict:
+        """the events timestamp and the seconds relative to container start
+        """
+        start = self.events.get('container_start', None)
+        return dict(events=self.events,
+                    seconds={key: round(value - start, 3)
+                             for key, value in self.events.items()} if start else {})
+
+
+def get_device_requests(gpu_id: str) -> List:
+    if not gpu_id:
+        return []
+
+    # import docker sdk on demand, it takes most of the cli startup time
+    import docker
+
+    device_ids = [d.strip() for d in str(gpu_id).split(',') if d.strip()]
+    return [docker.types.DeviceRequest(device_ids=device_ids, capabilities=[['gpu']])]
+
+
+def get_docker_client(max_pool_size: int = 32) -> 'docker.DockerClient':
+    """the docker client shared in process, the parallel tasks reuse the connections in its pool
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import docker
+            _client = docker.from_env(max_pool_size=max_pool_size)
+        return _client
+
+
+def run_container(docker_image: str,
+                  command: List[str],
+                  volumes: List[str],
+                  gpu_id: str,
+                  name: str,
+                  log_capture: LogCapture,
+                  ipc_mode: str = 'host',
+                  resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+    """run the container until exit, stream the logs to log_capture
+    volumes: the bind volumes, eg: ['/host/in:/in:ro', '/host/out:/out:rw']
+    resource_sampler: optional, sample the resource usage while the container is running
+
+    raise subprocess.CalledProcessError if the container exit with non-zero code
+    """
+    client = get_docker_client()
+    try:
+        container = client.containers.create(image=docker_image,
+                                             command=command,
+                                             name=name,
+                                             volumes=volumes,
+                                             device_requests=get_device_requests(gpu_id),
+                                             ipc_mode=ipc_mode)
+        log_capture.add_event('container_create')
+        try:
+            container.start()
+            log_capture.add_event('container_start')
+            if resource_sampler is not None:
+                resource_sampler.start_sampling(container)
+            for data in container.logs(stream=True, follow=True, timestamps=True):
+                log_capture.feed(data)
+            exit_code = container.wait()['StatusCode']
+            log_capture.add_event('container_exit')
+        finally:
+            if resource_sampler is not None:
+                resource_sampler.stop()
+            container.remove(force=True)
+    finally:
+        log_capture.close()
+
+    if exit_code != 0:
+        raise subprocess.CalledProcessError(exit_code, command)
+    return log_capture.get_durations()
@@ -0,0 +1,178 @@
+"""check the asset and annotation files in index files before running the docker container
+
+the index file contains one line for each image, the columns are separated by tab, eg:
+/in/assets/train/xxx.jpg	/in/annotations/train/xxx.txt
+
+instead of os.path.isfile for each file, list the parent directories with os.scandir in a thread pool.
+the result is cached in <cache_root>/dataset-index, it is valid when the mtime of index files and
+all parent directories not change, then the scan is skipped.
+"""
+import hashlib
+import json
+import os
+import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from .utils import get_cache_root
+
+# the columns of index file
+COLUMNS = ['assets', 'annotations']
+
+
+def get_mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def scan_dirs(dirs: List[str]) -> List[Tuple[str, Optional[int], Set[str]]]:
+    """list a batch of directories, return [(dir, mtime_ns, entry names)], mtime_ns is None if not exist
+    """
+    results = []
+    for d in dirs:
+        try:
+            mtime_ns = os.stat(d).st_mtime_ns
+            with os.scandir(d) as it:
+                names = {entry.name for entry in it}
+        except OSError:
+            mtime_ns, names = None, set()
+        results.append((d, mtime_ns, names))
+    return results
+
+
+def get_host_path(path: str, docker_in_dir: str, host_in_dir: str) -> str:
+    """convert the docker path in index file to host path, keep the other path
+    """
+    if path == docker_in_dir or path.startswith(docker_in_dir + '/'):
+        return host_in_dir + path[len(docker_in_dir):]
+    return path
+
+
+def read_index_file(index_file: str, docker_in_dir: str, host_in_dir: str) -> List[List[str]]:
+    """return the host path of each column for each line
+    """
+    lines = []
+    with open(index_file, 'r') as fp:
+        for line in fp:
+            items = line.strip().split('\t')
+            if not items[0]:
+                continue
+            lines.append([get_host_path(item, docker_in_dir, host_in_dir) for item in items[0:len(COLUMNS)]])
+    return lines
+
+
+class DatasetIndex(object):
+    """the pre-flight check result of index files, cached by the mtime of index files and directories
+    """
+
+    def __init__(self,
+                 index_files: List[str],
+                 docker_in_dir: str = '/in',
+                 host_in_dir: str = '',
+                 num_workers: Optional[int] = None,
+                 batch_size: int = 16):
+        self.index_files = [osp.abspath(f) for f in index_files]
+        self.docker_in_dir = docker_in_dir
+        self.host_in_dir = osp.abspath(host_in_dir)
+        self.num_workers = num_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.batch_size = batch_size
+
+        key = json.dumps([self.docker_in_dir, self.host_in_dir, sorted(self.index_files)])
+        self.cache_file = osp.join(get_cache_root(), 'dataset-index',
+                                   hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+        self.from_cache = False
+
+    def load_cache(self) -> Optional[Dict]:
+        """return the cached result if the index files and the directories not change
+        """
+        if not osp.isfile(self.cache_file):
+            return None
+
+        try:
+            with open(self.cache_file, 'r') as fp:
+                cache = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        for path, mtime_ns in list(cache['index_files'].items()) + list(cache['dirs'].items()):
+            if get_mtime_ns(path) != mtime_ns:
+                return None
+        return cache['result']
+
+    def save_cache(self, index_mtimes: Dict[str, Optional[int]], dir_mtimes: Dict[str, Optional[int]],
+                   result: Dict) -> None:
+        os.makedirs(osp.dirname(self.cache_file), exist_ok=True)
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as fw:
+            json.dump(dict(index_files=index_mtimes, dirs=dir_mtimes, result=result), fw)
+        os.replace(tmp_file, self.cache_file)
+
+    def scan(self) -> Dict:
+        """check the files in index files, return the number of images and missing files for each index file
+        {index_file: {'image_num': 100, 'missing': {'assets': 1, 'annotations': 0}, 'samples': [...]}}
+        """
+        # get the mtime before read to avoid missing the modification during scan
+        index_mtimes = {f: get_mtime_ns(f) for f in self.index_files}
+        index_lines = {f: read_index_file(f, self.docker_in_dir, self.host_in_dir) for f in self.index_files}
+
+        dirs = sorted({osp.dirname(path) for lines in index_lines.values() for paths in lines for path in paths})
+        batches = [dirs[i:i + self.batch_size] for i in range(0, len(dirs), self.batch_size)]
+        dir_names: Dict[str, Set[str]] = {}
+        dir_mtimes: Dict[str, Optional[int]] = {}
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for results in executor.map(scan_dirs, batches):
+                for d, mtime_ns, names in results:
+                    dir_mtimes[d] = mtime_ns
+                    dir_names[d] = names
+
+        result = {}
+        for index_file, lines in index_lines.items():
+            missing = {column: 0 for column in COLUMNS}
+            samples: List[str] = []
+            for paths in lines:
+                for column, path in zip(COLUMNS, paths):
+                    if osp.basename(path) not in dir_names[osp.dirname(path)]:
+                        missing[column] += 1
+                        if len(samples) < 10:
+                            samples.append(path)
+            result[index_file] = dict(image_num=len(lines), missing=missing, samples=samples)
+
+        self.save_cache(index_mtimes, dir_mtimes, result)
+        return result
+
+    def check(self) -> Dict:
+        """return the cached result if valid, otherwise scan the directories
+        """
+        result = self.load_cache()
+        self.from_cache = result is not None
+        if result is None:
+            result = self.scan()
+        return result
+
+
+def check_index_files(index_files: List[str],
+                      docker_in_dir: str,
+                      host_in_dir: str,
+                      num_workers: Optional[int] = None) -> Dict:
+    """raise Exception if any asset or annotation file in index files not exist
+    """
+    dataset_index = DatasetIndex(index_files, docker_in_dir, host_in_dir, num_workers)
+    result = dataset_index.check()
+
+    errors = []
+    for index_file, info in result.items():
+        missing_num = sum(info['missing'].values())
+        if info['image_num'] == 0:
+            errors.append(f'{index_file} is empty')
+        elif missing_num > 0:
+            errors.append(f'{index_file} missing {info["missing"]} in {info["image_num"]} images, '
+                          f'eg: {info["samples"][0:3]}')
+
+    source = 'cache' if dataset_index.from_cache else 'scan'
+    print(f'check index files by {source}: ' +
+          ', '.join(f'{osp.basename(f)} {info["image_num"]} images' for f, info in result.items()))
+    if errors:
+        raise Exception('; '.join(errors))
+    return result
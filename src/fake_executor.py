@@ -0,0 +1,243 @@
+"""emulate the ymir executor in local process, test the verifier and pipeline without docker or gpu
+
+fake_executor:
+  object_type: 2  # optional, 2 for detection, 3 for semantic segmentation, 4 for instance segmentation
+  speed: 100  # optional, the images per second for each training epoch, infer and mining
+  epochs: 2  # optional, the epochs in training template, each epoch save a model stage
+  weights_size: 1048576  # optional, the bytes of each weight file
+  boxes_per_image: 3  # optional, the annotations for each image in infer result
+  mode: valid  # optional, valid, crash, stall, missing_output or bad_output
+
+the executor read /in/env.yaml and /in/config.yaml, write the logs, monitor file and task output
+in ymir format. the other modes emulate the broken executor:
+- crash: exit with code 1 after loading the dataset
+- stall: no progress after loading the dataset until killed
+- missing_output: exit with code 0 without result file
+- bad_output: the result file with wrong content, eg: unknown image, nan score, missing weight file
+"""
+import json
+import os
+import os.path as osp
+import threading
+import time
+import zipfile
+import zlib
+from typing import Callable, Dict, List
+
+import yaml
+
+from .tfevents import EventWriter
+from .utils import get_image_size
+
+MODES = ['valid', 'crash', 'stall', 'missing_output', 'bad_output']
+
+
+def get_score(text: str) -> float:
+    """the stable pseudo random score in [0, 1) for image path
+    """
+    return zlib.crc32(text.encode('utf-8')) / 2**32
+
+
+def write_weights_file(weights_file: str, size: int, seed: str) -> None:
+    """write the weight file as zip archive like torch.save(), the payload is size bytes
+    """
+    os.makedirs(osp.dirname(weights_file), exist_ok=True)
+    block = (seed.encode('utf-8') * (4096 // max(len(seed), 1) + 1))[0:4096]
+    with zipfile.ZipFile(weights_file, 'w', compression=zipfile.ZIP_STORED) as zf:
+        with zf.open('archive/data.pkl', 'w', force_zip64=True) as fw:
+            for offset in range(0, size, len(block)):
+                fw.write(block[0:min(len(block), size - offset)])
+
+
+class FakeExecutor(object):
+
+    def __init__(self, fake_cfg: Dict):
+        self.object_type: int = fake_cfg.get('object_type', 2)
+        self.speed: float = fake_cfg.get('speed', 100)
+        self.epochs: int = fake_cfg.get('epochs', 2)
+        self.weights_size: int = fake_cfg.get('weights_size', 1 << 20)
+        self.boxes_per_image: int = fake_cfg.get('boxes_per_image', 3)
+        self.mode: str = fake_cfg.get('mode', 'valid')
+        if self.mode not in MODES:
+            raise Exception(f'unknown fake executor mode {self.mode}, supported modes: {MODES}')
+
+    def get_img_man_files(self) -> Dict[str, str]:
+        """the /img-man directory in fake docker image
+        """
+        return {
+            '/img-man/manifest.yaml': yaml.safe_dump(dict(object_type=self.object_type)),
+            '/img-man/training-template.yaml': yaml.safe_dump(dict(epochs=self.epochs, batch_size=4,
+                                                                   learning_rate=0.001)),
+            '/img-man/infer-template.yaml': yaml.safe_dump(dict(conf_threshold=0.2)),
+            '/img-man/mining-template.yaml': yaml.safe_dump(dict(mining_algorithm='entropy')),
+        }
+
+    def read_img_man_file(self, docker_file_path: str) -> str:
+        img_man_files = self.get_img_man_files()
+        if docker_file_path not in img_man_files:
+            raise FileNotFoundError(f'{docker_file_path} not found in fake executor')
+        return img_man_files[docker_file_path]
+
+    def run(self, get_host_path: Callable[[str], str], log: Callable[[str], None],
+            stop_event: threading.Event) -> int:
+        """run the task in /in/env.yaml, return the exit code, 137 if stopped by stop_event
+        get_host_path: convert the path in container to host path
+        log: write one line to container log
+        """
+        with open(get_host_path('/in/env.yaml'), 'r') as fp:
+            env = yaml.safe_load(fp)
+        with open(get_host_path(env['input']['config_file']), 'r') as fp:
+            config = yaml.safe_load(fp) or {}
+
+        if env.get('run_training', False):
+            task = 'training'
+            index_keys = ['training_index_file', 'val_index_file']
+        elif env.get('run_infer', False):
+            task = 'infer'
+            index_keys = ['candidate_index_file']
+        elif env.get('run_mining', False):
+            task = 'mining'
+            index_keys = ['candidate_index_file']
+        else:
+            log('no task to run in /in/env.yaml')
+            return 1
+
+        monitor_file = get_host_path(env['output']['monitor_file'])
+        task_id = env.get('task_id', 'fake')
+        self.write_monitor(monitor_file, task_id, 0.0, 2)
+        log(f'fake executor run {task} task {task_id}, mode {self.mode}')
+
+        lines: List[List[str]] = []
+        for key in index_keys:
+            with open(get_host_path(env['input'][key]), 'r') as fp:
+                lines.append([line.strip() for line in fp if line.strip()])
+        log(f'loading dataset with {sum(len(x) for x in lines)} images')
+
+        if self.mode == 'crash':
+            log('RuntimeError: fake executor crash')
+            return 1
+        elif self.mode == 'stall':
+            stop_event.wait()
+            return 137
+
+        class_names: List[str] = config.get('class_names', None) or ['object']
+        epochs = int(config.get('epochs', self.epochs)) if task == 'training' else 1
+        writer = None
+        if task == 'training':
+            tensorboard_dir = get_host_path(env['output']['tensorboard_dir'])
+            os.makedirs(tensorboard_dir, exist_ok=True)
+            writer = EventWriter(osp.join(tensorboard_dir, f'events.out.tfevents.{int(time.time())}.fake-executor'))
+        try:
+            # split each epoch into 10 iterations at most
+            step_num = min(10, max(len(lines[0]), 1))
+            for epoch in range(epochs):
+                for step in range(step_num):
+                    if stop_event.wait(len(lines[0]) / step_num / self.speed):
+                        return 137
+                    percent = (epoch + (step + 1) / step_num) / epochs
+                    loss = 1 / (epoch + step + 1)
+                    log(f'epoch {epoch + 1}/{epochs} iter {step + 1}/{step_num}, loss {loss:.4f}')
+                    self.write_monitor(monitor_file, task_id, 0.99 * percent, 2)
+                    if writer is not None:
+                        writer.add_scalar('train/loss', loss, epoch * step_num + step + 1)
+                if writer is not None:
+                    writer.add_scalar('val/mAP', self.get_metric(epoch, epochs), (epoch + 1) * step_num)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if self.mode != 'missing_output':
+            if task == 'training':
+                log(f'evaluating with {len(lines[1])} images')
+                self.write_training_output(env, get_host_path, epochs)
+            elif task == 'infer':
+                self.write_infer_output(env, get_host_path, lines[0], class_names)
+            else:
+                self.write_mining_output(env, get_host_path, lines[0])
+        self.write_monitor(monitor_file, task_id, 1.0, 3)
+        log(f'{task} task finished')
+        return 0
+
+    def write_monitor(self, monitor_file: str, task_id: str, percent: float, state: int) -> None:
+        with open(monitor_file, 'w') as fw:
+            fw.write(f'{task_id}\t{time.time()}\t{percent:.2f}\t{state}\n')
+
+    def get_metric(self, epoch: int, epochs: int) -> float:
+        return round(0.5 * (epoch + 1) / epochs, 4)
+
+    def write_training_output(self, env: Dict, get_host_path: Callable[[str], str], epochs: int) -> None:
+        models_dir = get_host_path(env['output']['models_dir'])
+        metric = {2: 'mAP', 3: 'mIoU', 4: 'maskAP'}[self.object_type]
+        model_stages = {}
+        for epoch in range(epochs):
+            stage_name = f'epoch_{epoch + 1}'
+            write_weights_file(osp.join(models_dir, stage_name, f'{stage_name}.pt'), self.weights_size,
+                               f'{env.get("task_id", "")}-{stage_name}')
+            files = [f'{stage_name}.pt']
+            if self.mode == 'bad_output':
+                files.append(f'{stage_name}-missing.pt')
+            model_stages[stage_name] = {
+                'stage_name': stage_name,
+                'files': files,
+                'timestamp': int(time.time()),
+                metric: self.get_metric(epoch, epochs)
+            }
+
+        best_stage_name = f'epoch_{epochs}'
+        result = dict(best_stage_name=best_stage_name, model_stages=model_stages)
+        result[metric] = model_stages[best_stage_name][metric]
+        if self.object_type == 2:
+            result['map'] = result[metric]
+        with open(get_host_path(env['output']['training_result_file']), 'w') as fw:
+            yaml.safe_dump(result, fw)
+
+    def write_infer_output(self, env: Dict, get_host_path: Callable[[str], str], lines: List[str],
+                           class_names: List[str]) -> None:
+        infer_result_file = get_host_path(env['output']['infer_result_file'])
+        image_files = [line.split('\t')[0] for line in lines]
+        if self.mode == 'bad_output' and image_files:
+            image_files[-1] = osp.join(osp.dirname(image_files[-1]), f'unknown-{osp.basename(image_files[-1])}')
+
+        if self.object_type == 2:
+            # write the detection result image by image, the same as large infer result
+            with open(infer_result_file, 'w') as fw:
+                fw.write('{"detection": {')
+                for idx, image_file in enumerate(image_files):
+                    annotations = []
+                    for box_idx in range(self.boxes_per_image):
+                        annotations.append(
+                            dict(box=dict(x=10 * box_idx, y=10 * box_idx, w=20, h=20, rotate_angle=0.0),
+                                 class_name=class_names[box_idx % len(class_names)],
+                                 score=round(get_score(f'{image_file}-{box_idx}'), 4)))
+                    fw.write(('' if idx == 0 else ', ') +
+                             f'{json.dumps(osp.basename(image_file))}: {json.dumps(dict(annotations=annotations))}')
+                fw.write('}}')
+            return
+
+        images = []
+        annotations = []
+        for idx, image_file in enumerate(image_files):
+            host_image_file = get_host_path(image_file)
+            image_size = get_image_size(host_image_file) if osp.isfile(host_image_file) else None
+            height, width = image_size or (1, 1)
+            images.append(dict(id=idx, file_name=osp.basename(image_file), height=height, width=width))
+            for box_idx in range(self.boxes_per_image):
+                area = height * width
+                counts = [area // 2, area - area // 2]
+                if self.mode == 'bad_output':
+                    counts[-1] += 1
+                annotations.append(
+                    dict(id=len(annotations),
+                         image_id=idx,
+                         category_id=box_idx % len(class_names),
+                         segmentation=dict(size=[height, width], counts=counts),
+                         score=round(get_score(f'{image_file}-{box_idx}'), 4)))
+        categories = [dict(id=idx, name=name) for idx, name in enumerate(class_names)]
+        with open(infer_result_file, 'w') as fw:
+            json.dump(dict(images=images, annotations=annotations, categories=categories), fw)
+
+    def write_mining_output(self, env: Dict, get_host_path: Callable[[str], str], lines: List[str]) -> None:
+        with open(get_host_path(env['output']['mining_result_file']), 'w') as fw:
+            for idx, line in enumerate(lines):
+                score = 'nan' if self.mode == 'bad_output' and idx == 0 else f'{get_score(line):.6f}'
+                fw.write(f'{line}\t{score}\n')
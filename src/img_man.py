@@ -0,0 +1,172 @@
+"""cache the /img-man directory of docker image on host
+
+reading /img-man/*.yaml with `docker run --rm` start a container for every read,
+which is slow for large cuda images. here we copy the whole /img-man directory once
+with `docker create` + `docker cp` (the container is never started), and save it to
+
+<cache_root>/img-man/<image_id>/img-man
+
+the image id is the content digest of the image, so the cache is invalid once the
+image is rebuilt or pulled again with the same name. the image id of name is reused
+in process for IMAGE_ID_TTL seconds only, the long running matrix or sweep see the retagged image.
+"""
+import json
+import os
+import os.path as osp
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, Tuple
+
+from .utils import get_cache_root, run_cmd
+
+IMAGE_ID_TTL = 10
+# the error message of docker cp for the path not exist in image
+MISSING_PATH_PATTERN = r'could not find the file|no such container:path'
+# the error message of docker image inspect for the image not pulled
+MISSING_IMAGE_PATTERN = r'no such image'
+
+_cache_lock = threading.Lock()
+# docker image name --> (image id, inspect time)
+_image_id_dict: Dict[str, Tuple[str, float]] = {}
+
+
+def get_image_id(docker_image_name: str) -> str:
+    """get the image id (sha256 digest) without start container, the result is cached in process for IMAGE_ID_TTL
+    pull the image if not exist in local, like `docker run`
+    """
+    with _cache_lock:
+        if docker_image_name in _image_id_dict:
+            image_id, inspect_time = _image_id_dict[docker_image_name]
+            if time.monotonic() - inspect_time < IMAGE_ID_TTL:
+                return image_id
+
+    cmd = ['docker', 'image', 'inspect', '--format', '{{.Id}}', docker_image_name]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+    if result.returncode == 0:
+        image_id = result.stdout.decode('utf-8').strip()
+    elif re.search(MISSING_IMAGE_PATTERN, result.stderr.decode('utf-8', errors='replace'), re.IGNORECASE):
+        run_cmd(['docker', 'pull', docker_image_name])
+        image_id = run_cmd(cmd, need_output=True).strip()
+    else:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+    with _cache_lock:
+        _image_id_dict[docker_image_name] = (image_id, time.monotonic())
+    return image_id
+
+
+class ImgManCache(object):
+    """the host copy of /img-man for one docker image
+    """
+
+    def __init__(self, docker_image_name: str, cache_root: str = ''):
+        self.docker_image = docker_image_name
+        self.cache_root = osp.join(cache_root or get_cache_root(), 'img-man')
+        self.image_id = get_image_id(docker_image_name)
+        # sha256:xxx --> xxx
+        self.cache_dir = osp.join(self.cache_root, self.image_id.split(':')[-1])
+        self.img_man_dir = osp.join(self.cache_dir, 'img-man')
+
+    def is_valid(self) -> bool:
+        return osp.isdir(self.img_man_dir)
+
+    def update(self) -> None:
+        """copy /img-man from docker image to host, remove the outdated cache for the same image name
+        """
+        if self.is_valid():
+            return
+
+        os.makedirs(self.cache_root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_root, prefix='.tmp-')
+        container_id = run_cmd(['docker', 'create', self.docker_image, 'true'], need_output=True).strip()
+        try:
+            self.copy_img_man(container_id, osp.join(tmp_dir, 'img-man'))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        finally:
+            run_cmd(['docker', 'rm', container_id], need_output=True)
+
+        with open(osp.join(tmp_dir, 'image.json'), 'w') as fw:
+            json.dump(dict(docker_image=self.docker_image, image_id=self.image_id), fw)
+
+        try:
+            os.rename(tmp_dir, self.cache_dir)
+        except OSError:
+            # other process finished the cache first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.remove_outdated()
+
+    def copy_img_man(self, container_id: str, des_dir: str) -> None:
+        """copy /img-man from the created container, create the empty des_dir if /img-man not exist in image
+        raise subprocess.CalledProcessError for other errors, eg: the docker daemon not available
+        """
+        cmd = ['docker', 'cp', f'{container_id}:/img-man', des_dir]
+        print(f'run cmd: {" ".join(cmd)}')
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        if result.returncode == 0:
+            return
+
+        stderr = result.stderr.decode('utf-8', errors='replace')
+        if re.search(MISSING_PATH_PATTERN, stderr, re.IGNORECASE):
+            # no /img-man in docker image, cache the empty directory to avoid copy again
+            os.makedirs(des_dir, exist_ok=True)
+            return
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout, stderr=result.stderr)
+
+    def remove_outdated(self) -> None:
+        """remove cache directory for the same image name but different image id
+        """
+        for name in os.listdir(self.cache_root):
+            cache_dir = osp.join(self.cache_root, name)
+            image_file = osp.join(cache_dir, 'image.json')
+            if cache_dir == self.cache_dir or not osp.isfile(image_file):
+                continue
+
+            with open(image_file, 'r') as fp:
+                image_info = json.load(fp)
+
+            if image_info['docker_image'] == self.docker_image and image_info['image_id'] != self.image_id:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def get_host_path(self, docker_file_path: str) -> str:
+        """convert /img-man/xxx to host path in cache directory
+        """
+        self.update()
+        relative_path = osp.relpath(docker_file_path, start='/img-man')
+        if relative_path.startswith('..'):
+            raise Exception(f'{docker_file_path} not in /img-man')
+        return osp.join(self.img_man_dir, relative_path)
+
+    def read(self, docker_file_path: str) -> str:
+        """read the file in /img-man, eg: /img-man/training-template.yaml
+        """
+        host_file_path = self.get_host_path(docker_file_path)
+        if not osp.isfile(host_file_path):
+            raise FileNotFoundError(f'{docker_file_path} not found in docker image {self.docker_image}')
+
+        with open(host_file_path, 'r') as fp:
+            return fp.read()
+
+
+def read_img_man_file(docker_image_name: str, docker_file_path: str) -> str:
+    """read /img-man/xxx.yaml from cache without start container
+
+    Parameters
+    ----------
+    docker_image_name : str
+        eg: youdaoyzbx/ymir-executor:ymir2.1.0-mmyolo-cu113-tmi
+    docker_file_path : str
+        eg: /img-man/training-template.yaml
+
+    Returns
+    -------
+    str
+        eg: the training template config
+    """
+    return ImgManCache(docker_image_name).read(docker_file_path)
+
@@ -0,0 +1,133 @@
+"""verify multiple docker images and configs concurrently
+
+matrix file example:
+
+gpu_id: '0,1,2,3'  # all devices for the matrix
+gpus_per_job: 2  # the device slot size, the number of device slots is 4 // 2 = 2
+cpus_per_job: 4  # the number of worker is bounded by cpu_count // cpus_per_job
+report_file: matrix-report.yaml
+jobs:
+  - config: tests/configs/all-in-one.yaml
+    docker_image:  # verify multiple docker images with the same config
+      - youdaoyzbx/ymir-executor:ymir2.0.0-yolov5-cu111-tmi
+      - youdaoyzbx/ymir-executor:ymir2.1.0-mmyolo-cu113-tmi
+    tasks: tmi
+  - config: tests/configs/mmseg.yaml
+    tasks: ttmi
+"""
+import copy
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import yaml
+from easydict import EasyDict as edict
+
+from .pipeline import PipeLine
+from .scheduler import DevicePool
+from .utils import get_task_list
+
+
+def load_matrix_jobs(matrix_cfg: dict) -> List[edict]:
+    """expand the jobs in matrix file, each job contains one docker image and one config
+    """
+    jobs = []
+    for job in matrix_cfg['jobs']:
+        with open(job['config'], 'r') as fp:
+            cfg = edict(yaml.safe_load(fp))
+
+        docker_images = job.get('docker_image', cfg.docker_image)
+        if isinstance(docker_images, str):
+            docker_images = [docker_images]
+
+        for docker_image in docker_images:
+            job_cfg = copy.deepcopy(cfg)
+            job_cfg.docker_image = docker_image
+            if job.get('tasks'):
+                job_cfg.tasks = get_task_list(job['tasks'])
+            job_cfg.matrix_config_file = job['config']
+            jobs.append(job_cfg)
+    return jobs
+
+
+def get_worker_num(gpu_id: str, gpus_per_job: int, cpus_per_job: int, max_workers: int = 0) -> int:
+    """the number of worker is bounded by device slots and cpu count
+    """
+    cpu_worker_num = max(1, (os.cpu_count() or 1) // cpus_per_job)
+    devices = [d for d in str(gpu_id or '').split(',') if d.strip()]
+    if devices:
+        worker_num = min(len(devices) // gpus_per_job, cpu_worker_num)
+    else:
+        worker_num = cpu_worker_num
+
+    if max_workers > 0:
+        worker_num = min(worker_num, max_workers)
+
+    assert worker_num > 0, f'no enough devices in {gpu_id} for {gpus_per_job} gpus per job'
+    return worker_num
+
+
+def print_matrix_report(results: List[Dict]) -> None:
+    print(f'{"state":<6} {"time(s)":>8}  {"docker image":<60} config')
+    for result in results:
+        print(f'{result["state"]:<6} {result["time"]:>8.1f}  {result["docker_image"]:<60} {result["config"]}')
+        if result['error']:
+            print(f'    {result["error"]}')
+
+    pass_count = sum(result['state'] == 'pass' for result in results)
+    print(f'{pass_count} / {len(results)} jobs pass')
+
+
+def run_matrix(matrix_file: str) -> bool:
+    """run all jobs in matrix file, return True if all job pass
+    """
+    with open(matrix_file, 'r') as fp:
+        matrix_cfg = yaml.safe_load(fp)
+
+    jobs = load_matrix_jobs(matrix_cfg)
+    gpu_id = str(matrix_cfg.get('gpu_id', '0'))
+    worker_num = get_worker_num(gpu_id,
+                                gpus_per_job=matrix_cfg.get('gpus_per_job', 1),
+                                cpus_per_job=matrix_cfg.get('cpus_per_job', 4),
+                                max_workers=matrix_cfg.get('max_workers', 0))
+    device_pool = DevicePool.from_gpu_id(gpu_id, worker_num)
+
+    matrix_id = str(round(time.time()))
+    print(f'run {len(jobs)} jobs with {worker_num} workers, device slots {device_pool.slots}')
+
+    def run_job(idx: int, job_cfg: edict) -> Dict:
+        slot = device_pool.acquire()
+        job_cfg.gpu_id = slot
+        job_cfg.task_id = f'{matrix_id}-{idx}'
+        result = dict(docker_image=job_cfg.docker_image,
+                      config=job_cfg.matrix_config_file,
+                      tasks=list(job_cfg.tasks),
+                      task_id=job_cfg.task_id,
+                      gpu_id=slot,
+                      error='')
+        tic = time.time()
+        try:
+            PipeLine(job_cfg).run()
+            result['state'] = 'pass'
+        except Exception as e:
+            traceback.print_exc()
+            result['state'] = 'fail'
+            result['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            device_pool.release(slot)
+        result['time'] = time.time() - tic
+        return result
+
+    with ThreadPoolExecutor(max_workers=worker_num) as executor:
+        futures = [executor.submit(run_job, idx, job_cfg) for idx, job_cfg in enumerate(jobs)]
+        results = [future.result() for future in futures]
+
+    print_matrix_report(results)
+    report_file = matrix_cfg.get('report_file', 'matrix-report.yaml')
+    with open(report_file, 'w') as fw:
+        yaml.safe_dump(dict(matrix_id=matrix_id, results=results), fw, sort_keys=False)
+    print(f'matrix report saved to {report_file}')
+
+    return all(result['state'] == 'pass' for result in results)
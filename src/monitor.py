@@ -0,0 +1,148 @@
+"""follow the monitor file while the docker container is running
+
+ymir monitor file format: `<task_id>\t<timestamp>\t<percent>\t<state>`, eg:
+t00000020000029d077c1662111056	1662111056.123	0.50	2
+
+state: 1 pending, 2 running, 3 done, 4 error
+"""
+import os.path as osp
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# poll quickly before the first monitor write, the first write time is accurate to this interval
+FIRST_WRITE_INTERVAL = 0.2
+
+
+def parse_monitor_file(monitor_file: str) -> Optional[Tuple[float, float, int]]:
+    """return (timestamp, percent, state) of the first line, None if not exist or not valid
+    """
+    if not osp.isfile(monitor_file):
+        return None
+
+    with open(monitor_file, 'r') as fp:
+        line = fp.readline()
+
+    items = line.strip().split()
+    if len(items) < 4:
+        return None
+
+    try:
+        return float(items[1]), float(items[2]), int(items[3])
+    except ValueError:
+        return None
+
+
+def format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60}m'
+    elif seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60}s'
+    else:
+        return f'{seconds}s'
+
+
+class MonitorFollower(threading.Thread):
+    """poll the monitor file in host, print the progress rate and ETA,
+    kill the container if the progress not change for stall_timeout seconds.
+    the stall window start from the first monitor write, eg: not count the image pull and dataset loading,
+    and stop once the task is done, eg: not count the result writing.
+    kill the container if the monitor file is not written in first_write_timeout seconds after the start,
+    eg: the executor hang in the image pull or dataset loading
+    """
+
+    def __init__(self,
+                 monitor_file: str,
+                 container_name: str,
+                 kill: Callable[[str], None],
+                 interval: float = 10,
+                 stall_timeout: float = 0,
+                 first_write_timeout: float = 0):
+        """kill: kill the container by name, eg: Runtime.kill
+        """
+        super().__init__(daemon=True)
+        self.monitor_file = monitor_file
+        self.container_name = container_name
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.first_write_timeout = first_write_timeout
+        self.kill = kill
+
+        self.start_time = time.time()
+        # (timestamp in monitor file, percent) when the progress changed
+        self.records: List[Tuple[float, float]] = []
+        # the host time when the progress changed, None before the first monitor write
+        self.last_change_time: Optional[float] = None
+        # the progress reach 100% or the state is done
+        self.done = False
+        self.stalled = False
+        # why the container is killed, None if not stalled
+        self.stall_reason: Optional[str] = None
+        # the host time when the monitor file is first found written, the executor write it in startup
+        self.first_write_time: Optional[float] = None
+        # the stale monitor file before the container start is not the first write
+        self._initial_mtime = osp.getmtime(monitor_file) if osp.isfile(monitor_file) else None
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def get_eta(self) -> Optional[float]:
+        """the remaining seconds estimate by the average progress rate
+        """
+        if len(self.records) < 2:
+            return None
+
+        (t0, p0), (t1, p1) = self.records[0], self.records[-1]
+        if p1 <= p0 or t1 <= t0:
+            return None
+        return (1 - p1) * (t1 - t0) / (p1 - p0)
+
+    def poll(self) -> None:
+        now = time.time()
+        result = parse_monitor_file(self.monitor_file)
+        if result is not None and self.first_write_time is None:
+            if osp.getmtime(self.monitor_file) == self._initial_mtime:
+                result = None
+            else:
+                self.first_write_time = now
+        if result is not None:
+            timestamp, percent, state = result
+            self.done = self.done or percent >= 1 or state == 3
+            if not self.records or percent != self.records[-1][1]:
+                self.records.append((timestamp, percent))
+                self.last_change_time = now
+                eta = self.get_eta()
+                rate = ''
+                (t0, p0), (t1, p1) = self.records[0], self.records[-1]
+                if t1 > t0:
+                    rate = f', {100 * (p1 - p0) / (t1 - t0):.3f}%/s'
+                eta_str = f', eta {format_seconds(eta)}' if eta is not None else ''
+                print(f'monitor {self.container_name}: {100 * percent:.1f}%{rate}{eta_str}, state {state}')
+
+        if self.first_write_timeout > 0 and self.first_write_time is None:
+            if now - self.start_time > self.first_write_timeout:
+                self.stop_stalled(f'no monitor write in {self.first_write_timeout}s')
+
+        if self.stall_timeout > 0 and self.last_change_time is not None and not self.done:
+            if now - self.last_change_time > self.stall_timeout:
+                self.stop_stalled(f'no progress in {self.stall_timeout}s')
+
+    def stop_stalled(self, reason: str) -> None:
+        print(f'monitor {self.container_name}: {reason}, kill the container')
+        self.stalled = True
+        self.stall_reason = reason
+        self._stop_event.set()
+        self.kill(self.container_name)
+
+    def run(self) -> None:
+        while True:
+            interval = self.interval if self.first_write_time is not None else min(self.interval, FIRST_WRITE_INTERVAL)
+            if self._stop_event.wait(interval):
+                break
+            try:
+                self.poll()
+            except Exception as e:
+                print(f'monitor {self.container_name}: {e}')
@@ -1,15 +1,29 @@
 import copy
+import os
 import os.path as osp
+import re
 import shutil
+import threading
 import time
 from pathlib import Path
+from typing import Dict
 
 import yaml
 from easydict import EasyDict as edict
 
-from .utils import run_docker_cmd
+from .config import resolve_config
+from .dataset_index import check_index_files
+from .result_cache import get_weights_digest
+from .runtime import get_runtime
+from .scheduler import TaskNode, TaskScheduler, build_task_graph
+from .subset import SubsetBuilder
+from .timing import TimingTrace
+from .utils import add_extra_binds, append_binds
 from .verifier_detection import VerifierDetection
 from .verifier_segmentation import VerifierSegmentation
+from .warm_container import WarmContainer
+from .weights_audit import compare_weights_dirs
+from .workspace import CopyStats, materialize_tree
 
 
 class PipeLine(object):
@@ -26,7 +40,8 @@ class PipeLine(object):
         in_dir = <work_dir>/task_id/<task>/in which contains [<data_dir>/assets, <data_dir>/annotations, ...]
         out_dir = <work_dir>/task_id/<task>/in
         """
-        self.cfg = copy.deepcopy(cfg)
+        # resolve the config once, the tasks share it, see src/config.py
+        self.cfg = resolve_config(cfg)
         self.task_id = self.cfg.get('task_id', None) or str(round(time.time()))
 
         self.data_dir = self.cfg.data_dir
@@ -43,7 +58,23 @@ class PipeLine(object):
         # use in check data dir for get_host_path
         self.host_in_dir = ''
         self.host_out_dir = ''
-        self.check_data_dir()
+        # record the time of each stage for all tasks
+        self.trace = TimingTrace()
+        # the runtime shared by all tasks, replaced by the warm container in warm container mode
+        self.runtime = get_runtime(self.cfg)
+        # the state and artifacts of each stage, saved in <work_dir>/<task_id>/run-manifest.yaml
+        self.manifest_file = osp.join(self.work_dir, self.task_id, 'run-manifest.yaml')
+        self.manifest: Dict = dict(task_id=self.task_id, docker_image=self.docker_image, tasks=list(self.cfg.tasks),
+                                   stages={})
+        self._manifest_lock = threading.Lock()
+        if self.cfg.get('resume', False):
+            self.load_manifest()
+        with self.trace.span('check_data_dir'):
+            self.check_data_dir()
+        # the smoke dataset is written to work_dir, build it when run
+        if self.cfg.get('smoke_size', None) and not self.cfg.get('dry_run', False):
+            with self.trace.span('build_smoke_dataset'):
+                self.build_smoke_dataset()
 
     def check_data_dir(self):
         """check image directory and annotations directory
@@ -57,19 +88,44 @@ class PipeLine(object):
         assert osp.isdir(assets_dir)
         assert osp.isdir(annotations_dir)
 
+        index_files = []
         for task in self.cfg.tasks:
             if task == 'training':
                 training_index_file = self.get_host_path(self.cfg.env_config.input.training_index_file)
                 val_index_file = self.get_host_path(self.cfg.env_config.input.val_index_file)
                 assert osp.isfile(training_index_file)
                 assert osp.isfile(val_index_file)
+                index_files.extend([training_index_file, val_index_file])
             elif task in ['mining', 'infer']:
                 candidate_index_file = self.get_host_path(self.cfg.env_config.input.candidate_index_file)
 
                 assert osp.isfile(candidate_index_file)
+                index_files.append(candidate_index_file)
+
+        # check the asset and annotation files in index files before loading the docker image
+        if self.cfg.get('check_index_files', True):
+            check_index_files(sorted(set(index_files)),
+                              docker_in_dir=self.docker_in_dir,
+                              host_in_dir=self.data_dir,
+                              num_workers=self.cfg.get('num_workers', None))
 
         self.host_in_dir = ''
 
+    def build_smoke_dataset(self) -> None:
+        """use a deterministic subset of data_dir for smoke verification, see src/subset.py for detail
+        the subset is <work_dir>/<task_id>/smoke-data, which contains the symlinks of selected files
+        """
+        builder = SubsetBuilder(self.data_dir,
+                                osp.join(self.work_dir, self.task_id, 'smoke-data'),
+                                docker_in_dir=self.docker_in_dir,
+                                size=float(self.cfg.smoke_size),
+                                seed=int(self.cfg.get('smoke_seed', 0)),
+                                num_workers=self.cfg.get('num_workers', None))
+        smoke_dir, bind_dirs = builder.build_tasks(self.cfg.env_config.input, self.cfg.tasks)
+        self.data_dir = self.cfg.data_dir = smoke_dir
+        # the symlinks in smoke_dir point to the original dataset
+        add_extra_binds(self.cfg, bind_dirs)
+
     def get_host_path(self, docker_file_path: str):
         """
         convert the input/output file path from docker to host
@@ -93,43 +149,256 @@ class PipeLine(object):
         semantic segmenation: object_type = 3
         instance_segmantation: object_type = 4
         """
-        command = 'cat /img-man/manifest.yaml'
+        return self.runtime.get_object_type(self.docker_image)
+
+    def run(self):
+        """
+        support tmi and ttmi, the independent tasks run in parallel if there are enough gpu devices
+        eg: for tmi with gpu_id='0,1', mining and infer run at the same time after training
+        """
+        with self.trace.span('get_object_type'):
+            self.object_type = self.get_object_type()
+        self.restore_training_weights()
+
+        # the tasks share one container and run one by one in warm container mode
+        self.warm_container = None
+        parallel = self.cfg.get('parallel', True)
+        if self.cfg.get('warm_container', False):
+            os.makedirs(osp.join(self.work_dir, self.task_id), exist_ok=True)
+            self.warm_container = self.get_warm_container()
+            parallel = False
+
+        nodes = build_task_graph(self.cfg.tasks)
+        scheduler = TaskScheduler(nodes, gpu_id=self.gpu_id, parallel=parallel)
         try:
-            output = run_docker_cmd(self.docker_image, command.split())
-            manifest = yaml.safe_load(output)
-        except:
-            return 2
+            if self.warm_container is not None:
+                with self.trace.span('warm_container_start'):
+                    self.warm_container.start()
+            scheduler.run(self.run_node)
+        finally:
+            if self.warm_container is not None:
+                self.warm_container.stop()
+                report = self.warm_container.get_report()
+                print(f'warm container saved {report["saved_seconds"]}s startup: {report}')
+                with self._manifest_lock:
+                    self.manifest['warm_container'] = report
+                    self.save_manifest()
+            self.save_trace()
 
-        return manifest['object_type']
+    def restore_training_weights(self) -> None:
+        """the weights directory and digest offer by first training task, restore from manifest to resume
+        """
+        self.training_weights_dir = ''
+        # the digest of training weights, check the weights not changed before mining and infer
+        self.training_weights_digest = ''
+        for stage in self.manifest['stages'].values():
+            if stage['state'] == 'pass' and osp.isdir(stage.get('weights_dir', '')):
+                self.training_weights_dir = stage['weights_dir']
+                self.training_weights_digest = stage.get('weights_digest', '')
 
-    def run(self):
+    def get_warm_container(self) -> WarmContainer:
+        """the warm container mount the workspace root, the dataset, pretrain weights and extra binds
         """
-        support tmi and ttmi
+        workspace_root = osp.abspath(osp.join(self.work_dir, self.task_id))
+        binds = [f'-v{workspace_root}:{workspace_root}:rw']
+        for docker_dir in [self.env_config.input.assets_dir, self.env_config.input.annotations_dir]:
+            append_binds(binds, osp.join(osp.abspath(self.data_dir), osp.relpath(docker_dir, self.docker_in_dir)),
+                         mode='ro')
+        pretrain_weights_dir = self.cfg.get('pretrain_weights_dir', '')
+        if pretrain_weights_dir and osp.isdir(pretrain_weights_dir):
+            append_binds(binds, osp.abspath(pretrain_weights_dir), mode='ro')
+        for bind_dir in self.cfg.get('extra_binds', None) or []:
+            append_binds(binds, bind_dir, mode='ro')
+
+        task_id = re.sub('[^a-zA-Z0-9_.-]', '-', str(self.task_id))
+        return WarmContainer(self.runtime,
+                             self.docker_image,
+                             binds=[v[2:] for v in binds],
+                             gpu_id=str(self.gpu_id or ''),
+                             name=f'ymir-verifier-{task_id}-warm')
+
+    def save_trace(self) -> None:
+        """save the timing trace to <work_dir>/<task_id>/timing.json and timing-trace.json
+        """
+        trace_dir = osp.join(self.work_dir, self.task_id)
+        os.makedirs(trace_dir, exist_ok=True)
+        self.trace.save_json(osp.join(trace_dir, 'timing.json'))
+        self.trace.save_chrome_trace(osp.join(trace_dir, 'timing-trace.json'))
+        print(f'timing summary: {self.trace.get_summary()["categories"]}, view {trace_dir}/timing.json for detail')
+
+    def load_manifest(self) -> None:
+        """load the manifest of previous run to resume, the passed stages will be skipped
         """
-        for idx, task in enumerate(self.cfg.tasks):
-            object_type = self.get_object_type()
+        if not osp.isfile(self.manifest_file):
+            raise Exception(f'cannot resume {self.task_id}, {self.manifest_file} not found')
+
+        with open(self.manifest_file, 'r') as fp:
+            manifest = yaml.safe_load(fp)
+        for key in ['docker_image', 'tasks']:
+            if manifest[key] != self.manifest[key]:
+                raise Exception(f'cannot resume {self.task_id} with different {key}: '
+                                f'{manifest[key]} != {self.manifest[key]}')
+
+        self.manifest = manifest
+        passed = [name for name, stage in manifest['stages'].items() if stage['state'] == 'pass']
+        print(f'resume {self.task_id} from {self.manifest_file}, skip passed stages {passed}')
+
+    def save_stage(self, node: TaskNode, result: Dict) -> None:
+        with self._manifest_lock:
+            self.manifest['stages'][node.workspace] = result
+            self.save_manifest()
+
+    def save_manifest(self) -> None:
+        os.makedirs(osp.dirname(self.manifest_file), exist_ok=True)
+        with open(self.manifest_file, 'w') as fw:
+            yaml.safe_dump(self.manifest, fw, sort_keys=False)
 
-            if idx > 0 and task == 'training':
-                self.cfg.in_dir = osp.join(self.work_dir, self.task_id, 'pretrain', 'in')
-                self.cfg.out_dir = osp.join(self.work_dir, self.task_id, 'pretrain', 'out')
-            else:
-                self.cfg.in_dir = osp.join(self.work_dir, self.task_id, task, 'in')
-                self.cfg.out_dir = osp.join(self.work_dir, self.task_id, task, 'out')
+    def run_node(self, node: TaskNode, gpu_id: str) -> None:
+        """run single task in its own workspace and device subset, record the state in run manifest
+        """
+        stage = self.manifest['stages'].get(node.workspace, {})
+        if stage.get('state', '') == 'pass':
+            print(f'skip {node.workspace}, passed in previous run')
+            return
+
+        # remove the workspace of interrupted or failed run
+        workspace_dir = osp.join(self.work_dir, self.task_id, node.workspace)
+        if stage:
+            shutil.rmtree(workspace_dir, ignore_errors=True)
+
+        result = dict(task=node.task, gpu_id=gpu_id, workspace_dir=workspace_dir, error='')
+        self.save_stage(node, dict(result, state='running'))
+        tic = time.time()
+        try:
+            result.update(self.run_stage(node, gpu_id))
+            result['state'] = 'pass'
+        except Exception as e:
+            result['state'] = 'fail'
+            result['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            result['time'] = round(time.time() - tic, 1)
+            self.save_stage(node, result)
+
+    def run_stage(self, node: TaskNode, gpu_id: str) -> Dict:
+        """run single task in its own workspace and device subset, return the artifacts
+        """
+        task = node.task
+        # show the parallel tasks in different rows of chrome trace
+        threading.current_thread().name = node.workspace
+        cfg = self.get_stage_config(node, gpu_id)
+        if node.depends and self.training_weights_dir:
+            with self.trace.span('check_weights_digest', task=task):
+                weights_digest = get_weights_digest(cfg.pretrain_weights_dir, self.cfg.get('num_workers', None))
+            if self.training_weights_digest and weights_digest != self.training_weights_digest:
+                raise Exception(f'weights in {cfg.pretrain_weights_dir} changed after training, '
+                                f'digest {weights_digest} != {self.training_weights_digest}')
+
+        v = self.get_verifier(cfg)
+        v.trace = self.trace
+        if self.warm_container is not None:
+            v.runtime = self.warm_container
+        task_result = v.verify_task(docker_image_name=self.docker_image, task=task)
+        artifacts = dict(out_dir=cfg.out_dir, log_file=task_result.get('log_file', ''))
+
+        if node.idx == 0 and task == 'training':
+            new_weights_dir = osp.join(self.work_dir, self.task_id, task, 'models')
+
+            # reflink weights file to other path to mount in docker, copy if not possible
+            # not hardlink, the handoff weights must not change with the training output
+            relative_models_dir = osp.relpath(self.env_config.output.models_dir, start=self.docker_out_dir)
+            host_weights_dir = osp.join(cfg.out_dir, relative_models_dir)
+            copy_stats = CopyStats()
+            with self.trace.span('copy_weights', task=task):
+                materialize_tree(host_weights_dir, new_weights_dir, copy_stats, hardlink=False)
+            print(f'weights handoff to {new_weights_dir}, {copy_stats.copied_bytes} bytes copied: '
+                  f'{copy_stats.to_dict()}')
+
+            # the handoff weights must be byte-identical, the digests are cached for the result cache key
+            with self.trace.span('check_weights', task=task):
+                mismatches = compare_weights_dirs(host_weights_dir, new_weights_dir, self.cfg.get('num_workers', None))
+                weights_digest = get_weights_digest(new_weights_dir, self.cfg.get('num_workers', None))
+            if mismatches:
+                raise Exception(f'{len(mismatches)} weight files in {new_weights_dir} not byte-identical to '
+                                f'{host_weights_dir}: {mismatches[0:10]}')
+
+            self.training_weights_dir = new_weights_dir
+            self.training_weights_digest = weights_digest
+            artifacts['weights_dir'] = new_weights_dir
+            artifacts['weights_digest'] = weights_digest
+        return artifacts
+
+    def get_stage_config(self, node: TaskNode, gpu_id: str) -> edict:
+        """the config of single task, a copy of the resolved pipeline config
+        """
+        cfg = copy.deepcopy(self.cfg)
+        cfg.gpu_id = gpu_id
+        cfg.object_type = self.object_type
+        cfg.in_dir = osp.join(self.work_dir, self.task_id, node.workspace, 'in')
+        cfg.out_dir = osp.join(self.work_dir, self.task_id, node.workspace, 'out')
+        if node.depends and self.training_weights_dir:
+            cfg.pretrain_weights_dir = self.training_weights_dir
+        return cfg
+
+    def get_verifier(self, cfg: edict) -> VerifierDetection:
+        if self.object_type == 2:
+            v = VerifierDetection(cfg)
+        else:
+            v = VerifierSegmentation(cfg)
+        v.runtime = self.runtime
+        return v
+
+    def plan(self) -> Dict:
+        """the plan of all tasks without starting any container or writing work_dir, use for --dry_run
+
+        the plan contains the task order, devices, workspaces, mounts, rendered /in/config.yaml and
+        /in/env.yaml for each task. the templates are read from the /img-man cache, see src/img_man.py
+        """
+        self.object_type = self.get_object_type()
+        self.restore_training_weights()
+        nodes = build_task_graph(self.cfg.tasks)
+        warm_container = self.cfg.get('warm_container', False)
+        parallel = self.cfg.get('parallel', True) and not warm_container
+        scheduler = TaskScheduler(nodes, gpu_id=self.gpu_id, parallel=parallel)
 
-            if object_type == 2:
-                v = VerifierDetection(self.cfg)
-            else:
-                v = VerifierSegmentation(self.cfg)
+        # the weights offer by first training task not exist before run
+        handoff_weights_dir = ''
+        if not self.training_weights_dir and self.cfg.tasks[0] == 'training':
+            handoff_weights_dir = osp.abspath(osp.join(self.work_dir, self.task_id, 'training', 'models'))
 
-            if idx == 0 and task == 'training':
-                v.verify_task(docker_image_name=self.docker_image, task=task)
-                new_weights_dir = osp.join(self.work_dir, self.task_id, task, 'models')
+        plan: Dict = dict(task_id=self.task_id,
+                          docker_image=self.docker_image,
+                          object_type=self.object_type,
+                          runtime=self.runtime.name,
+                          data_dir=self.data_dir,
+                          work_dir=osp.join(self.work_dir, self.task_id),
+                          max_workers=scheduler.max_workers)
+        if self.cfg.get('smoke_size', None):
+            plan['smoke_data_dir'] = osp.join(self.work_dir, self.task_id, 'smoke-data')
+        if warm_container:
+            plan['warm_container'] = dict(binds=self.get_warm_container().binds)
 
-                # copy weights file to other path to mount in docker
-                self.host_out_dir = self.cfg.out_dir
-                host_weights_dir = self.get_host_path(self.env_config.output.models_dir)
-                shutil.copytree(host_weights_dir, new_weights_dir)
+        plan['tasks'] = []
+        for node in nodes:
+            cfg = self.get_stage_config(node, scheduler.node_devices[node.idx])
+            if node.depends and handoff_weights_dir:
+                cfg.pretrain_weights_dir = handoff_weights_dir
+            v = self.get_verifier(cfg)
+            volumes = [volume[2:] for volume in v.get_volumes(v.pretrain_weights_dir)]
+            if node.depends and handoff_weights_dir:
+                volumes.append(f'{handoff_weights_dir}:{handoff_weights_dir}:ro')
 
-                self.cfg.pretrain_weights_dir = new_weights_dir
-            else:
-                v.verify_task(docker_image_name=self.docker_image, task=task)
+            plan['tasks'].append(
+                dict(idx=node.idx,
+                     task=node.task,
+                     workspace=node.workspace,
+                     depends=node.depends,
+                     state=self.manifest['stages'].get(node.workspace, {}).get('state', 'pending'),
+                     gpu_id=cfg.gpu_id,
+                     in_dir=cfg.in_dir,
+                     out_dir=cfg.out_dir,
+                     pretrain_weights_dir=v.pretrain_weights_dir,
+                     volumes=volumes,
+                     config=v.get_hyperparameter_config(node.task),
+                     env=v.get_env_config(node.task)))
+        return plan
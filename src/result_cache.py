@@ -0,0 +1,167 @@
+"""cache the output of successful tasks, skip the docker container if nothing changed
+
+the cache key is the sha256 of:
+- the docker image id
+- the rendered config.yaml and env.yaml, without task_id
+- the dataset fingerprint: the index files and the size, mtime of each file in them
+- the content hash of pretrained weights files
+
+the cache is saved in <cache_root>/results/<key[0:2]>/<key>, the out directory is reflinked if possible,
+not hardlinked, the cache must not change with the task output.
+if the key matches, the out directory is restored and only the verify_*_output checks run again.
+"""
+import hashlib
+import json
+import mmap
+import os
+import os.path as osp
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from .dataset_index import COLUMNS, get_host_path
+from .utils import get_cache_root
+from .workspace import CopyStats, materialize_tree
+
+_digest_lock = threading.Lock()
+# (device, inode, size, mtime_ns) -> sha256, the hardlinks share the same digest
+_digest_cache: Dict[Tuple[int, int, int, int], str] = {}
+
+
+def get_file_digest(file_path: str, chunk_size: int = 8 << 20) -> str:
+    """the sha256 of file with memory mapped read, cached in process until the file changed
+    hashlib release the gil for large chunk, so the digests can be computed in thread pool
+    """
+    stat = os.stat(file_path)
+    key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if key in _digest_cache:
+            return _digest_cache[key]
+
+    sha256 = hashlib.sha256()
+    if stat.st_size > 0:
+        with open(file_path, 'rb') as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    sha256.update(view[offset:offset + chunk_size])
+            finally:
+                view.release()
+    digest = sha256.hexdigest()
+
+    with _digest_lock:
+        _digest_cache[key] = digest
+    return digest
+
+
+def set_file_digest(file_path: str, digest: str) -> None:
+    """cache the known digest of file, eg: the copy of hashed file, get_file_digest() will not read it again
+    """
+    stat = os.stat(file_path)
+    with _digest_lock:
+        _digest_cache[(stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)] = digest
+
+
+def get_file_digests(file_paths: List[str], num_workers: Optional[int] = None) -> Dict[str, str]:
+    """the sha256 of files in thread pool, {file path: digest}
+    """
+    with ThreadPoolExecutor(max_workers=num_workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        return dict(zip(file_paths, executor.map(get_file_digest, file_paths)))
+
+
+def get_config_digest(config_file: str, exclude_keys: List[str] = ['task_id']) -> str:
+    """the digest of yaml file without exclude keys
+    """
+    with open(config_file, 'r') as fp:
+        config = yaml.safe_load(fp) or {}
+    for key in exclude_keys:
+        config.pop(key, None)
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def get_dataset_fingerprint(index_files: List[str], docker_in_dir: str, host_in_dir: str) -> str:
+    """the digest of index files, and the size and mtime of all files in index files
+    the content of image and annotation files are not read for speed
+    """
+    sha256 = hashlib.sha256()
+    for index_file in sorted(index_files):
+        with open(index_file, 'r') as fp:
+            for line in fp:
+                sha256.update(line.encode('utf-8'))
+                for item in line.strip().split('\t')[0:len(COLUMNS)]:
+                    try:
+                        stat = os.stat(get_host_path(item, docker_in_dir, host_in_dir))
+                        sha256.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode('utf-8'))
+                    except OSError:
+                        sha256.update(b'missing')
+    return sha256.hexdigest()
+
+
+def get_weights_digest(weights_dir: str, num_workers: Optional[int] = None) -> str:
+    """the digest of all files in weights directory, empty string for no weights
+    """
+    if not weights_dir or not osp.isdir(weights_dir):
+        return ''
+
+    file_paths = []
+    for root, _, files in sorted(os.walk(weights_dir, followlinks=True)):
+        file_paths.extend(osp.join(root, f) for f in sorted(files))
+    digests = get_file_digests(file_paths, num_workers)
+
+    sha256 = hashlib.sha256()
+    for file_path in file_paths:
+        sha256.update(osp.relpath(file_path, start=weights_dir).encode('utf-8'))
+        sha256.update(digests[file_path].encode('utf-8'))
+    return sha256.hexdigest()
+
+
+class ResultCache(object):
+    """the content addressed cache of task output
+    """
+
+    def __init__(self, cache_root: str = ''):
+        self.cache_root = osp.join(cache_root or get_cache_root(), 'results')
+
+    def get_cache_dir(self, key: str) -> str:
+        return osp.join(self.cache_root, key[0:2], key)
+
+    def get_key(self, components: Dict[str, str]) -> str:
+        return hashlib.sha256(json.dumps(components, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def restore(self, key: str, out_dir: str) -> Optional[Dict]:
+        """restore the out directory for key, return the cached task result, None if not found
+        """
+        cache_dir = self.get_cache_dir(key)
+        result_file = osp.join(cache_dir, 'result.json')
+        if not osp.isfile(result_file):
+            return None
+
+        with open(result_file, 'r') as fp:
+            result = json.load(fp)
+
+        if osp.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.makedirs(out_dir)
+        materialize_tree(osp.join(cache_dir, 'out'), out_dir, CopyStats(), hardlink=False)
+        return result
+
+    def save(self, key: str, out_dir: str, components: Dict[str, str], task_result: Dict) -> None:
+        """save the out directory and task result for key, replace the old one
+        """
+        cache_dir = self.get_cache_dir(key)
+        tmp_dir = f'{cache_dir}.{os.getpid()}.tmp'
+        if osp.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        materialize_tree(out_dir, osp.join(tmp_dir, 'out'), CopyStats(), hardlink=False)
+        with open(osp.join(tmp_dir, 'result.json'), 'w') as fw:
+            json.dump(dict(task_result, key=components, timestamp=time.time()), fw, indent=2, default=str)
+
+        if osp.exists(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.rename(tmp_dir, cache_dir)
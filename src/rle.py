@@ -0,0 +1,114 @@
+"""decode and check the coco rle mask in segmentation infer result
+
+the compressed rle counts string follows pycocotools (maskApi.c rleFrString),
+each run length is encoded as 5-bit groups in chars with offset 48, and the run
+length after the second one is stored as difference to the run two steps before.
+"""
+import struct
+from array import array
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .utils import get_image_size
+
+# (annotation index, segmentation, the expected image size [height, width])
+SegmentationItem = Tuple[int, Union[dict, list], Optional[Tuple[int, int]]]
+
+
+def decode_rle_counts(counts: Union[str, bytes, Sequence[int]]) -> array:
+    """decode compressed or uncompressed rle counts to run lengths
+    """
+    if not isinstance(counts, (str, bytes)):
+        return array('q', counts)
+
+    data = counts.encode('ascii') if isinstance(counts, str) else counts
+    runs = array('q')
+    p = 0
+    n = len(data)
+    while p < n:
+        x = 0
+        k = 0
+        more = True
+        while more:
+            if p >= n:
+                raise ValueError('truncated rle counts')
+            c = data[p] - 48
+            x |= (c & 0x1f) << (5 * k)
+            more = bool(c & 0x20)
+            p += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << (5 * k)
+        if len(runs) > 2:
+            x += runs[-2]
+        runs.append(x)
+    return runs
+
+
+def check_rle(segmentation: dict, image_size: Optional[Tuple[int, int]] = None) -> str:
+    """return the error message for invalid rle, empty string for valid one
+    """
+    for key in ['size', 'counts']:
+        if key not in segmentation:
+            return f'no {key} in segmentation'
+
+    size = segmentation['size']
+    if not (isinstance(size, (list, tuple)) and len(size) == 2 and all(isinstance(v, int) and v > 0 for v in size)):
+        return f'invalid size {size}'
+
+    height, width = size
+    if image_size is not None and (height, width) != tuple(image_size):
+        return f'rle size {size} != image size {list(image_size)}'
+
+    try:
+        runs = decode_rle_counts(segmentation['counts'])
+    except (ValueError, TypeError, OverflowError) as e:
+        return f'invalid counts: {e}'
+
+    if len(runs) > 0 and min(runs) < 0:
+        return 'negative run length in counts'
+
+    total = sum(runs)
+    if total != height * width:
+        return f'sum of run length {total} != height x width {height * width}'
+    return ''
+
+
+def check_polygon(segmentation: list) -> str:
+    for polygon in segmentation:
+        if not isinstance(polygon, list) or len(polygon) < 6 or len(polygon) % 2 != 0:
+            return f'invalid polygon with {len(polygon) if isinstance(polygon, list) else polygon} points'
+    return ''
+
+
+def check_segmentation_chunk(items: List[SegmentationItem]) -> List[str]:
+    """the worker function for process pool, return the error messages
+    """
+    errors = []
+    for idx, segmentation, image_size in items:
+        if isinstance(segmentation, dict):
+            msg = check_rle(segmentation, image_size)
+        elif isinstance(segmentation, list):
+            msg = check_polygon(segmentation)
+        else:
+            msg = f'unknown segmentation type {type(segmentation)}'
+
+        if msg:
+            errors.append(f'annotations[{idx}]: {msg}')
+    return errors
+
+
+def check_image_size_chunk(items: List[Tuple[str, int, int]]) -> List[str]:
+    """the worker function for process pool, check the image size in infer result with the image file
+    items: [(host image file, height, width), ...]
+    """
+    errors = []
+    for image_file, height, width in items:
+        try:
+            image_size = get_image_size(image_file)
+        except (OSError, struct.error) as e:
+            errors.append(f'cannot read image size of {image_file}: {e}')
+            continue
+
+        if image_size is not None and image_size != (height, width):
+            errors.append(f'image size {[height, width]} != real size {list(image_size)} for {image_file}')
+    return errors
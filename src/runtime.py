@@ -0,0 +1,429 @@
+"""the container runtime to run ymir executor, selected by `runtime` in config
+
+runtime: docker-cli  # optional, docker-cli, docker-sdk or fake
+
+- docker-cli: run the container with docker command line, the default
+- docker-sdk: run the container with docker sdk, the client and its connection pool are shared in process
+- fake: run the fake executor in local process without docker, see src/fake_executor.py
+
+all runtimes record the same timing events in LogCapture, and raise subprocess.CalledProcessError
+if the executor exit with non-zero code. start(), exec() and remove() keep one container running
+for multiple tasks, see src/warm_container.py
+"""
+import hashlib
+import json
+import shlex
+import subprocess
+import threading
+import traceback
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+from easydict import EasyDict as edict
+
+from .container import LogCapture, get_device_requests, get_docker_client, run_container
+from .fake_executor import FakeExecutor
+from .img_man import get_image_id, read_img_man_file
+from .telemetry import ResourceSampler
+from .utils import run_cmd
+
+RUNTIMES = ['docker-cli', 'docker-sdk', 'fake']
+
+
+class Runtime(object):
+    """the interface of container runtime
+    """
+    name = ''
+
+    def image_exists(self, docker_image: str) -> bool:
+        raise NotImplementedError()
+
+    def get_image_id(self, docker_image: str) -> str:
+        return get_image_id(docker_image)
+
+    def get_image_size(self, docker_image: str) -> int:
+        output = run_cmd(['docker', 'image', 'inspect', '--format', '{{.Size}}', docker_image], need_output=True)
+        return int(output.strip())
+
+    def read_img_man_file(self, docker_image: str, docker_file_path: str) -> str:
+        return read_img_man_file(docker_image, docker_file_path)
+
+    def get_object_type(self, docker_image: str) -> int:
+        """
+        get the object_type in /img-man/manifest.yaml
+        object detection: object_type = 2
+        semantic segmenation: object_type = 3
+        instance_segmantation: object_type = 4
+        """
+        try:
+            manifest = yaml.safe_load(self.read_img_man_file(docker_image, '/img-man/manifest.yaml'))
+        except FileNotFoundError:
+            # the image without manifest.yaml is detection image
+            return 2
+
+        return manifest['object_type']
+
+    def run(self,
+            docker_image: str,
+            command: List[str],
+            volumes: List[str],
+            gpu_id: str,
+            name: str,
+            log_capture: LogCapture,
+            ipc_mode: str = 'host',
+            resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        """run the container until exit, see container.run_container() for the arguments
+        """
+        raise NotImplementedError()
+
+    def kill(self, name: str) -> None:
+        run_cmd(['docker', 'kill', name], need_output=True)
+
+    def start(self, docker_image: str, volumes: List[str], gpu_id: str, name: str, ipc_mode: str = 'host') -> str:
+        """start the container with `sleep infinity` in background, return the container id
+        """
+        raise NotImplementedError()
+
+    def exec(self,
+             container_id: str,
+             command: List[str],
+             links: Dict[str, str],
+             environment: Dict[str, str],
+             log_capture: LogCapture,
+             resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        """run the command in started container until exit, the events are the same as run()
+        links: the symlinks created before command, {path in container: target path}, eg: {'/in': '/host/in'}
+        """
+        raise NotImplementedError()
+
+    def remove(self, container_id: str) -> None:
+        run_cmd(['docker', 'rm', '--force', container_id], need_output=True)
+
+
+def get_link_command(command: List[str], links: Dict[str, str]) -> List[str]:
+    """replace the path in container with symlink to target path, then run the command
+    """
+    if not links:
+        return command
+
+    script = ' && '.join(f'rm -rf {shlex.quote(path)} && ln -s {shlex.quote(target)} {shlex.quote(path)}'
+                         for path, target in links.items())
+    return ['bash', '-c', f'{script} && exec "$@"', 'bash'] + command
+
+
+class DockerSDKRuntime(Runtime):
+    name = 'docker-sdk'
+
+    def image_exists(self, docker_image: str) -> bool:
+        import docker
+
+        try:
+            get_docker_client().images.get(docker_image)
+        except docker.errors.ImageNotFound:
+            return False
+        return True
+
+    def get_image_size(self, docker_image: str) -> int:
+        return get_docker_client().images.get(docker_image).attrs['Size']
+
+    def run(self,
+            docker_image: str,
+            command: List[str],
+            volumes: List[str],
+            gpu_id: str,
+            name: str,
+            log_capture: LogCapture,
+            ipc_mode: str = 'host',
+            resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        return run_container(docker_image,
+                             command=command,
+                             volumes=volumes,
+                             gpu_id=gpu_id,
+                             name=name,
+                             log_capture=log_capture,
+                             ipc_mode=ipc_mode,
+                             resource_sampler=resource_sampler)
+
+    def kill(self, name: str) -> None:
+        get_docker_client().containers.get(name).kill()
+
+    def start(self, docker_image: str, volumes: List[str], gpu_id: str, name: str, ipc_mode: str = 'host') -> str:
+        container = get_docker_client().containers.run(image=docker_image,
+                                                       command=['sleep', 'infinity'],
+                                                       name=name,
+                                                       volumes=volumes,
+                                                       device_requests=get_device_requests(gpu_id),
+                                                       ipc_mode=ipc_mode,
+                                                       detach=True)
+        return container.id
+
+    def exec(self,
+             container_id: str,
+             command: List[str],
+             links: Dict[str, str],
+             environment: Dict[str, str],
+             log_capture: LogCapture,
+             resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        api = get_docker_client().api
+        try:
+            exec_id = api.exec_create(container_id, get_link_command(command, links), environment=environment)['Id']
+            log_capture.add_event('container_create')
+            try:
+                stream = api.exec_start(exec_id, stream=True)
+                log_capture.add_event('container_start')
+                if resource_sampler is not None:
+                    resource_sampler.start_sampling(get_docker_client().containers.get(container_id))
+                for data in stream:
+                    log_capture.feed_host_time(data)
+                exit_code = api.exec_inspect(exec_id)['ExitCode']
+                log_capture.add_event('container_exit')
+            finally:
+                if resource_sampler is not None:
+                    resource_sampler.stop()
+        finally:
+            log_capture.close()
+
+        if exit_code != 0:
+            raise subprocess.CalledProcessError(exit_code, command)
+        return log_capture.get_durations()
+
+    def remove(self, container_id: str) -> None:
+        get_docker_client().containers.get(container_id).remove(force=True)
+
+
+class ContainerRef(object):
+    """the container for ResourceSampler in docker-cli runtime, only the cgroup filesystem is supported
+    """
+
+    def __init__(self, container_id: str):
+        self.id = container_id
+
+    def stats(self, stream: bool = False) -> Dict:
+        raise Exception('docker stats api is not supported in docker-cli runtime')
+
+
+class DockerCLIRuntime(Runtime):
+    name = 'docker-cli'
+
+    def image_exists(self, docker_image: str) -> bool:
+        result = subprocess.run(['docker', 'image', 'inspect', docker_image],
+                                stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+
+    def run(self,
+            docker_image: str,
+            command: List[str],
+            volumes: List[str],
+            gpu_id: str,
+            name: str,
+            log_capture: LogCapture,
+            ipc_mode: str = 'host',
+            resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        """docker create + docker start --attach, the log lines are timestamped in host
+        """
+        try:
+            container_id = run_cmd(self.get_create_cmd(docker_image, command, volumes, gpu_id, name, ipc_mode),
+                                   need_output=True).strip()
+            log_capture.add_event('container_create')
+            try:
+                exit_code = self.attach(['docker', 'start', '--attach', container_id], container_id, log_capture,
+                                        resource_sampler)
+            finally:
+                self.remove(container_id)
+        finally:
+            log_capture.close()
+
+        if exit_code != 0:
+            raise subprocess.CalledProcessError(exit_code, command)
+        return log_capture.get_durations()
+
+    def get_create_cmd(self, docker_image: str, command: List[str], volumes: List[str], gpu_id: str, name: str,
+                       ipc_mode: str) -> List[str]:
+        cmd = ['docker', 'create', '--name', name, '--ipc', ipc_mode]
+        for volume in volumes:
+            cmd.extend(['-v', volume])
+        if gpu_id:
+            cmd.extend(['--gpus', f'"device={gpu_id}"'])
+        cmd.append(docker_image)
+        cmd.extend(command)
+        return cmd
+
+    def attach(self, cmd: List[str], container_id: str, log_capture: LogCapture,
+               resource_sampler: Optional[ResourceSampler]) -> int:
+        """run the docker command and stream its output to log_capture, return the exit code
+        """
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            log_capture.add_event('container_start')
+            if resource_sampler is not None:
+                resource_sampler.start_sampling(ContainerRef(container_id))
+            for line in process.stdout:
+                log_capture.feed_host_time(line)
+            exit_code = process.wait()
+            log_capture.add_event('container_exit')
+        finally:
+            if resource_sampler is not None:
+                resource_sampler.stop()
+        return exit_code
+
+    def start(self, docker_image: str, volumes: List[str], gpu_id: str, name: str, ipc_mode: str = 'host') -> str:
+        container_id = run_cmd(self.get_create_cmd(docker_image, ['sleep', 'infinity'], volumes, gpu_id, name,
+                                                   ipc_mode),
+                               need_output=True).strip()
+        run_cmd(['docker', 'start', container_id], need_output=True)
+        return container_id
+
+    def exec(self,
+             container_id: str,
+             command: List[str],
+             links: Dict[str, str],
+             environment: Dict[str, str],
+             log_capture: LogCapture,
+             resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        cmd = ['docker', 'exec']
+        for key, value in environment.items():
+            cmd.extend(['--env', f'{key}={value}'])
+        cmd.append(container_id)
+        cmd.extend(get_link_command(command, links))
+        try:
+            log_capture.add_event('container_create')
+            exit_code = self.attach(cmd, container_id, log_capture, resource_sampler)
+        finally:
+            log_capture.close()
+
+        if exit_code != 0:
+            raise subprocess.CalledProcessError(exit_code, command)
+        return log_capture.get_durations()
+
+
+class FakeRuntime(Runtime):
+    """run the fake executor in current thread, the volumes map the container path to host path
+    """
+    name = 'fake'
+
+    def __init__(self, fake_cfg: Dict):
+        self.fake_cfg = dict(fake_cfg)
+        self.executor = FakeExecutor(self.fake_cfg)
+        self._lock = threading.Lock()
+        # the stop event for running containers by name
+        self._stop_events: Dict[str, threading.Event] = {}
+        # the mounts of started containers by id
+        self._containers: Dict[str, List[Tuple[str, str]]] = {}
+
+    def image_exists(self, docker_image: str) -> bool:
+        return True
+
+    def get_image_id(self, docker_image: str) -> str:
+        content = json.dumps(dict(docker_image=docker_image, fake_cfg=self.fake_cfg), sort_keys=True)
+        return 'fake:' + hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get_image_size(self, docker_image: str) -> int:
+        return 0
+
+    def read_img_man_file(self, docker_image: str, docker_file_path: str) -> str:
+        return self.executor.read_img_man_file(docker_file_path)
+
+    def run(self,
+            docker_image: str,
+            command: List[str],
+            volumes: List[str],
+            gpu_id: str,
+            name: str,
+            log_capture: LogCapture,
+            ipc_mode: str = 'host',
+            resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        """run the task for `bash /usr/bin/start.sh`, the other commands exit immediately
+        the resource usage is not sampled
+        """
+        log_capture.add_event('container_create')
+        return self.run_executor(command, get_mounts(volumes), name, log_capture)
+
+    def start(self, docker_image: str, volumes: List[str], gpu_id: str, name: str, ipc_mode: str = 'host') -> str:
+        with self._lock:
+            self._containers[name] = get_mounts(volumes)
+        return name
+
+    def exec(self,
+             container_id: str,
+             command: List[str],
+             links: Dict[str, str],
+             environment: Dict[str, str],
+             log_capture: LogCapture,
+             resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        with self._lock:
+            if container_id not in self._containers:
+                raise Exception(f'fake container {container_id} not started')
+            # the symlinks in container work as the mounts
+            mounts = self._containers[container_id] + [(path.rstrip('/'), target) for path, target in links.items()]
+        mounts.sort(key=lambda x: len(x[0]), reverse=True)
+        log_capture.add_event('container_create')
+        return self.run_executor(command, mounts, container_id, log_capture)
+
+    def remove(self, container_id: str) -> None:
+        with self._lock:
+            self._containers.pop(container_id, None)
+
+    def run_executor(self, command: List[str], mounts: List[Tuple[str, str]], name: str,
+                     log_capture: LogCapture) -> Dict:
+        def get_host_path(path: str) -> str:
+            for container_path, host_path in mounts:
+                if path == container_path or path.startswith(container_path + '/'):
+                    return host_path + path[len(container_path):]
+            return path
+
+        def log(message: str) -> None:
+            log_capture.feed_host_time(f'{message}\n'.encode('utf-8'))
+
+        stop_event = threading.Event()
+        with self._lock:
+            self._stop_events[name] = stop_event
+        try:
+            log_capture.add_event('container_start')
+            exit_code = 0
+            if command[-1:] == ['/usr/bin/start.sh']:
+                try:
+                    exit_code = self.executor.run(get_host_path, log, stop_event)
+                except Exception:
+                    for line in traceback.format_exc().splitlines():
+                        log(line)
+                    exit_code = 1
+            log_capture.add_event('container_exit')
+        finally:
+            with self._lock:
+                self._stop_events.pop(name, None)
+            log_capture.close()
+
+        if exit_code != 0:
+            raise subprocess.CalledProcessError(exit_code, command)
+        return log_capture.get_durations()
+
+    def kill(self, name: str) -> None:
+        with self._lock:
+            stop_event = self._stop_events.get(name, None)
+        if stop_event is None:
+            raise Exception(f'no running fake container {name}')
+        stop_event.set()
+
+
+def get_mounts(volumes: List[str]) -> List[Tuple[str, str]]:
+    """the (container path, host path) of bind volumes, the longer container path first
+    """
+    mounts = []
+    for volume in volumes:
+        host_path, container_path = volume.split(':')[0:2]
+        mounts.append((container_path.rstrip('/'), host_path.rstrip('/')))
+    mounts.sort(key=lambda x: len(x[0]), reverse=True)
+    return mounts
+
+
+def get_runtime(cfg: edict) -> Runtime:
+    name = cfg.get('runtime', None) or 'docker-cli'
+    if name == 'docker-cli':
+        return DockerCLIRuntime()
+    elif name == 'docker-sdk':
+        return DockerSDKRuntime()
+    elif name == 'fake':
+        return FakeRuntime(cfg.get('fake_executor', None) or {})
+    else:
+        raise Exception(f'unknown runtime {name}, supported runtimes: {RUNTIMES}')
@@ -0,0 +1,213 @@
+"""measure how infer and mining task scale with the number of candidate images
+
+scaling:
+  task: infer  # optional, infer or mining
+  sizes: [100, 1000, 10000, 100000]  # optional, the number of candidate images
+  max_time_exponent: 1.2  # optional, flag superlinear if steady time ~ size ^ exponent with larger exponent
+  max_memory_growth: 0.5  # optional, flag if the peak memory grows more than 50% from the smallest size
+
+the candidate images are taken from all index files in data_dir, repeat them if size is larger than dataset.
+each image is symlinked with a unique name, eg: <scaling_dir>/assets/00000012-xxx.jpg, because the infer
+result is indexed by image basename.
+
+the wall time is fitted as fixed cost + per image cost * size.
+the results are saved in <work_dir>/scaling-<scaling_id>/scaling-result.yaml
+"""
+import copy
+import math
+import os
+import os.path as osp
+import shutil
+import time
+import traceback
+from typing import Dict, List, Sequence, Tuple
+
+import yaml
+from easydict import EasyDict as edict
+
+from .benchmark import get_trial_seconds
+from .dataset_index import read_index_file
+from .runtime import get_runtime
+from .utils import add_extra_binds
+from .verifier_detection import VerifierDetection
+from .verifier_segmentation import VerifierSegmentation
+
+
+def fit_linear(xs: Sequence[float], ys: Sequence[float]) -> Tuple[float, float]:
+    """least squares fit of y = a + b * x, return (a, b)
+    """
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    var_x = sum((x - mean_x)**2 for x in xs)
+    if var_x == 0:
+        return mean_y, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    return mean_y - b * mean_x, b
+
+
+def fit_exponent(xs: Sequence[float], ys: Sequence[float]) -> float:
+    """the exponent k of y ~ x ^ k, fit in log-log space, the non-positive values are ignored
+    """
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) < 2:
+        return 0.0
+    return fit_linear([p[0] for p in points], [p[1] for p in points])[1]
+
+
+class Scaling(object):
+
+    def __init__(self, cfg: edict, scaling_id: str = ''):
+        self.cfg = copy.deepcopy(cfg)
+        self.cfg.result_cache = False
+        self.scaling_id = scaling_id or str(round(time.time()))
+        self.scaling_dir = osp.join(self.cfg.work_dir, f'scaling-{self.scaling_id}')
+        self.result_file = osp.join(self.scaling_dir, 'scaling-result.yaml')
+        # the common directory of original asset files
+        self.source_dir = ''
+
+        scaling_cfg = self.cfg.get('scaling', None) or {}
+        self.task: str = scaling_cfg.get('task', 'infer')
+        self.sizes: List[int] = sorted(int(s) for s in scaling_cfg.get('sizes', [100, 1000, 10000, 100000]))
+        self.max_time_exponent: float = scaling_cfg.get('max_time_exponent', 1.2)
+        self.max_memory_growth: float = scaling_cfg.get('max_memory_growth', 0.5)
+
+        self.cfg.object_type = get_runtime(self.cfg).get_object_type(self.cfg.docker_image)
+        if self.cfg.object_type == 2:
+            self.verifier_class = VerifierDetection
+        else:
+            self.verifier_class = VerifierSegmentation
+
+    def get_asset_files(self) -> List[str]:
+        """the unique asset files in all index files of data_dir
+        """
+        docker_in_dir = self.cfg.env_config.input.root_dir
+        asset_files: Dict[str, None] = {}
+        for key in ['training_index_file', 'val_index_file', 'candidate_index_file']:
+            index_file = self.cfg.env_config.input[key].replace(docker_in_dir, self.cfg.data_dir)
+            if osp.isfile(index_file):
+                for paths in read_index_file(index_file, docker_in_dir, self.cfg.data_dir):
+                    asset_files[osp.realpath(paths[0])] = None
+        return list(asset_files)
+
+    def build_data_dirs(self) -> Dict[int, str]:
+        """generate the data_dir for each size, they share the same assets directory
+        <scaling_dir>/assets/<idx>-<basename> -> <asset file>
+        <scaling_dir>/data-<size>/assets -> <scaling_dir>/assets
+        <scaling_dir>/data-<size>/annotations -> <data_dir>/annotations
+        <scaling_dir>/data-<size>/candidate-index.tsv
+        """
+        asset_files = self.get_asset_files()
+        if not asset_files:
+            raise Exception(f'no asset file found in index files of {self.cfg.data_dir}')
+        # the symlinks in assets directory point to the original dataset, bind it in docker container
+        self.source_dir = osp.commonpath(asset_files) if len(asset_files) > 1 else osp.dirname(asset_files[0])
+
+        input_cfg = self.cfg.env_config.input
+        docker_in_dir = input_cfg.root_dir
+        assets_dir = osp.join(self.scaling_dir, 'assets')
+        os.makedirs(assets_dir, exist_ok=True)
+        names = []
+        for idx in range(self.sizes[-1]):
+            asset_file = asset_files[idx % len(asset_files)]
+            name = f'{idx:08d}-{osp.basename(asset_file)}'
+            if not osp.lexists(osp.join(assets_dir, name)):
+                os.symlink(asset_file, osp.join(assets_dir, name))
+            names.append(name)
+
+        data_dirs = {}
+        annotations_dir = osp.abspath(input_cfg.annotations_dir.replace(docker_in_dir, self.cfg.data_dir))
+        for size in self.sizes:
+            data_dir = osp.join(self.scaling_dir, f'data-{size}')
+            os.makedirs(data_dir, exist_ok=True)
+            for docker_dir, src_dir in [(input_cfg.assets_dir, assets_dir),
+                                        (input_cfg.annotations_dir, annotations_dir)]:
+                des_dir = docker_dir.replace(docker_in_dir, data_dir)
+                if not osp.lexists(des_dir):
+                    os.makedirs(osp.dirname(des_dir), exist_ok=True)
+                    os.symlink(src_dir, des_dir)
+
+            index_file = input_cfg.candidate_index_file.replace(docker_in_dir, data_dir)
+            with open(index_file, 'w') as fw:
+                for name in names[0:size]:
+                    fw.write(f'{input_cfg.assets_dir}/{name}\n')
+            data_dirs[size] = data_dir
+        return data_dirs
+
+    def run_size(self, size: int, data_dir: str) -> Dict:
+        cfg = copy.deepcopy(self.cfg)
+        cfg.task_id = f'{self.scaling_id}-{self.task}-{size}'
+        cfg.data_dir = data_dir
+        cfg.in_dir = osp.join(self.scaling_dir, f'{self.task}-{size}', 'in')
+        cfg.out_dir = osp.join(self.scaling_dir, f'{self.task}-{size}', 'out')
+        add_extra_binds(cfg, [self.source_dir])
+        shutil.rmtree(osp.dirname(cfg.in_dir), ignore_errors=True)
+
+        v = self.verifier_class(cfg)
+        task_result = v.verify_task(docker_image_name=cfg.docker_image, task=self.task)
+        result: Dict = get_trial_seconds(task_result['events']['events'])
+        # None if the resource usage is not sampled, eg: resource_interval is 0 or the task exits too quickly
+        result['rss_peak'] = task_result.get('resources', {}).get('rss_peak', None)
+        return result
+
+    def analyze(self, results: Dict[int, Dict]) -> Dict:
+        """fit the cost model and flag the superlinear behavior
+        """
+        sizes = sorted(results)
+        summary: Dict = dict(flags=[])
+        if len(sizes) < 2:
+            return summary
+
+        fixed, per_image = fit_linear(sizes, [results[s]['total'] for s in sizes])
+        summary['fixed_seconds'] = round(fixed, 3)
+        summary['per_image_seconds'] = round(per_image, 6)
+        summary['time_exponent'] = round(fit_exponent(sizes, [results[s]['steady'] for s in sizes]), 3)
+        if summary['time_exponent'] > self.max_time_exponent:
+            summary['flags'].append(f'superlinear time: steady time ~ size ^ {summary["time_exponent"]}')
+
+        memory = [results[s]['rss_peak'] for s in sizes]
+        unknown_sizes = [s for s, m in zip(sizes, memory) if m is None]
+        if unknown_sizes:
+            # unknown is not zero, the memory growth is not checked instead of passed
+            summary['memory_growth'] = None
+            summary['memory_unknown_sizes'] = unknown_sizes
+        elif memory[0] > 0:
+            summary['memory_exponent'] = round(fit_exponent(sizes, memory), 3)
+            summary['memory_growth'] = round(memory[-1] / memory[0] - 1, 3)
+            if summary['memory_growth'] > self.max_memory_growth:
+                summary['flags'].append(f'peak memory grows {100 * summary["memory_growth"]:.0f}% from size '
+                                        f'{sizes[0]} to {sizes[-1]}, eg: hold all results in memory before writing')
+        return summary
+
+    def run(self) -> bool:
+        os.makedirs(self.scaling_dir, exist_ok=True)
+        data_dirs = self.build_data_dirs()
+        print(f'run scaling {self.scaling_id} for {self.cfg.docker_image} {self.task} with sizes {self.sizes}')
+
+        results: Dict[int, Dict] = {}
+        error = ''
+        for size in self.sizes:
+            try:
+                results[size] = self.run_size(size, data_dirs[size])
+                print(f'scaling {self.task} size {size}: {results[size]}')
+            except Exception as e:
+                traceback.print_exc()
+                error = f'size {size}: {type(e).__name__}: {e}'
+                break
+
+        summary = self.analyze(results)
+        for flag in summary['flags']:
+            print(f'scaling {self.task} warning: {flag}')
+        if summary.get('memory_unknown_sizes'):
+            print(f'scaling {self.task}: peak memory unknown for sizes {summary["memory_unknown_sizes"]}, '
+                  'memory growth is not checked')
+        with open(self.result_file, 'w') as fw:
+            yaml.safe_dump(dict(docker_image=self.cfg.docker_image,
+                                task=self.task,
+                                results=results,
+                                summary=summary,
+                                error=error),
+                           fw,
+                           sort_keys=False)
+        print(f'scaling result saved to {self.result_file}')
+        return not error and not summary['flags']
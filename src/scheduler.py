@@ -0,0 +1,214 @@
+"""run pipeline tasks as a dependency graph
+
+the task in cfg.tasks depends on
+- the first training task, if the first task is training, which offers the weights for pretrain/mining/infer
+- the previous task with the same workspace, eg: the second and third training task in `ttt`
+
+independent tasks run at the same time if there are enough gpu devices, each task use its own device subset.
+the tasks in the same level split the devices, the task alone in its level (eg: the first training) use all devices.
+"""
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set
+
+
+class TaskNode(object):
+
+    def __init__(self, idx: int, task: str, workspace: str, depends: List[int]):
+        """
+        idx: the index in cfg.tasks
+        task: training, mining or infer
+        workspace: the workspace name, eg: training, pretrain, mining, infer
+        depends: the index of tasks must finished before this task
+        """
+        self.idx = idx
+        self.task = task
+        self.workspace = workspace
+        self.depends = depends
+
+    def __repr__(self) -> str:
+        return f'TaskNode(idx={self.idx}, task={self.task}, workspace={self.workspace}, depends={self.depends})'
+
+
+def get_workspace_name(idx: int, task: str) -> str:
+    """the training task except the first one use the weights from first one, save in pretrain workspace
+    """
+    if idx > 0 and task == 'training':
+        return 'pretrain'
+    else:
+        return task
+
+
+def build_task_graph(tasks: List[str]) -> List[TaskNode]:
+    nodes: List[TaskNode] = []
+    last_workspace_idx: Dict[str, int] = {}
+    for idx, task in enumerate(tasks):
+        workspace = get_workspace_name(idx, task)
+        depends = []
+        if idx > 0 and tasks[0] == 'training':
+            depends.append(0)
+
+        if workspace in last_workspace_idx and last_workspace_idx[workspace] not in depends:
+            depends.append(last_workspace_idx[workspace])
+
+        last_workspace_idx[workspace] = idx
+        nodes.append(TaskNode(idx=idx, task=task, workspace=workspace, depends=depends))
+    return nodes
+
+
+def get_levels(nodes: List[TaskNode]) -> Dict[int, int]:
+    """the level of each task, the level of task is the longest dependency path to it
+    """
+    levels: Dict[int, int] = {}
+    for node in nodes:
+        levels[node.idx] = max([levels[i] + 1 for i in node.depends], default=0)
+    return levels
+
+
+def get_graph_width(nodes: List[TaskNode]) -> int:
+    """the max number of tasks in the same level
+    """
+    levels = get_levels(nodes)
+    level_count: Dict[int, int] = {}
+    for level in levels.values():
+        level_count[level] = level_count.get(level, 0) + 1
+    return max(level_count.values(), default=1)
+
+
+def split_gpu_id(gpu_id: str, slot_num: int) -> List[str]:
+    """split gpu_id into slot_num device subset, the remaining devices are given to the first slot
+
+    eg: split_gpu_id('0,1,2,3,4', 2) = ['0,1,4', '2,3']
+    """
+    devices = [d.strip() for d in str(gpu_id).split(',') if d.strip()]
+    device_num = len(devices) // slot_num
+    assert device_num > 0, f'no enough devices in {gpu_id} for {slot_num} slots'
+
+    slots = [devices[i * device_num:(i + 1) * device_num] for i in range(slot_num)]
+    slots[0] += devices[slot_num * device_num:]
+    return [','.join(slot) for slot in slots]
+
+
+class DevicePool(object):
+    """a pool of device subset, each running task hold one subset
+    """
+
+    def __init__(self, slots: List[str]):
+        self.slots = slots
+        self._queue: queue.Queue = queue.Queue()
+        for slot in slots:
+            self._queue.put(slot)
+
+    @classmethod
+    def from_gpu_id(cls, gpu_id: str, slot_num: int) -> 'DevicePool':
+        if not gpu_id:
+            # cpu only, no device to split
+            return cls([''] * slot_num)
+        return cls(split_gpu_id(gpu_id, slot_num))
+
+    def acquire(self) -> str:
+        return self._queue.get()
+
+    def release(self, slot: str) -> None:
+        self._queue.put(slot)
+
+
+class DeviceLock(object):
+    """hold the devices of running tasks, the task wait until all its devices are free
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._busy: Set[str] = set()
+
+    def acquire(self, gpu_id: str) -> None:
+        devices = set(d.strip() for d in gpu_id.split(',') if d.strip())
+        with self._cond:
+            self._cond.wait_for(lambda: not (self._busy & devices))
+            self._busy |= devices
+
+    def release(self, gpu_id: str) -> None:
+        devices = set(d.strip() for d in gpu_id.split(',') if d.strip())
+        with self._cond:
+            self._busy -= devices
+            self._cond.notify_all()
+
+
+class TaskScheduler(object):
+
+    def __init__(self, nodes: List[TaskNode], gpu_id: str, parallel: bool = True):
+        self.nodes = nodes
+        self.gpu_id = str(gpu_id or '')
+
+        device_num = len([d for d in self.gpu_id.split(',') if d.strip()])
+        width = get_graph_width(nodes)
+        if parallel and width > 1 and device_num >= width:
+            self.max_workers = width
+        else:
+            self.max_workers = 1
+        # node idx --> gpu_id
+        self.node_devices = self.get_node_devices()
+
+    def get_node_devices(self) -> Dict[int, str]:
+        """split the devices among the tasks in the same level, the serial tasks use all devices
+        eg: for ttmi with gpu_id='0,1,2,3', training use '0,1,2,3', pretrain, mining and infer use '0,3', '1', '2'
+        """
+        if self.max_workers == 1 or not self.gpu_id:
+            return {node.idx: self.gpu_id for node in self.nodes}
+
+        level_nodes: Dict[int, List[int]] = {}
+        for idx, level in get_levels(self.nodes).items():
+            level_nodes.setdefault(level, []).append(idx)
+
+        node_devices: Dict[int, str] = {}
+        for indexes in level_nodes.values():
+            for idx, slot in zip(indexes, split_gpu_id(self.gpu_id, len(indexes))):
+                node_devices[idx] = slot
+        return node_devices
+
+    def run(self, run_fn: Callable[[TaskNode, str], None]) -> None:
+        """run_fn(node, gpu_id) for all nodes, stop submit new task once any task failed
+        """
+        print(f'run {len(self.nodes)} tasks with {self.max_workers} workers, devices {self.node_devices}')
+
+        finished: Dict[int, bool] = {}
+        pending = list(self.nodes)
+        running: Dict[Future, TaskNode] = {}
+        error: Optional[BaseException] = None
+
+        # the task in next level may start before the tasks in previous level finished
+        device_lock = DeviceLock()
+
+        def run_with_device(node: TaskNode) -> None:
+            gpu_id = self.node_devices[node.idx]
+            device_lock.acquire(gpu_id)
+            try:
+                run_fn(node, gpu_id)
+            finally:
+                device_lock.release(gpu_id)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    for node in list(pending):
+                        if all(finished.get(i, False) for i in node.depends):
+                            pending.remove(node)
+                            running[executor.submit(run_with_device, node)] = node
+                elif not running:
+                    break
+
+                if not running:
+                    # the dependency failed or not exist
+                    raise Exception(f'cannot schedule tasks {pending}')
+
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    exception = future.exception()
+                    finished[node.idx] = exception is None
+                    if exception is not None and error is None:
+                        error = exception
+
+        if error is not None:
+            raise error
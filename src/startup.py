@@ -0,0 +1,200 @@
+"""profile the container startup latency of ymir executor, compare the first (cold) run with repeated (warm) runs
+
+startup:
+  task: mining  # optional, the task to profile
+  runs: 3  # optional, the first run is cold if the image is not used recently, the others are warm
+  smoke_size: 10  # optional, the number of images for task, see src/subset.py
+  import_modules: [ymir_exc, torch, cv2]  # optional, the modules for python import time profile
+
+the profile contains:
+- image_size: the size of docker image in bytes
+- bare_cpu, bare_gpu: the create-to-start and start-to-exit seconds of `true` command, without and with gpu
+- imports: the top modules of `python3 -X importtime` in the image by cumulative time
+- runs: the seconds from container create to start, first log line, first monitor.txt write and exit
+
+the profile is saved in <work_dir>/startup-<profile_id>/startup-profile.yaml
+"""
+import copy
+import os
+import os.path as osp
+import shutil
+import statistics
+import time
+import traceback
+from typing import Dict, List
+
+import yaml
+from easydict import EasyDict as edict
+
+from .container import LogCapture
+from .runtime import get_runtime
+from .subset import SubsetBuilder
+from .utils import add_extra_binds
+from .verifier_detection import VerifierDetection
+from .verifier_segmentation import VerifierSegmentation
+
+DEFAULT_IMPORT_MODULES = ['ymir_exc', 'torch', 'torchvision', 'cv2', 'numpy', 'mmcv', 'mmdet', 'ultralytics']
+
+# import all modules even some of them not exist
+IMPORT_SCRIPT = '''import importlib
+for name in {modules}:
+    try:
+        importlib.import_module(name)
+    except Exception as e:
+        print(f'import {{name}} failed: {{e}}')
+'''
+
+
+def parse_importtime(lines: List[str], top: int = 20) -> Dict:
+    """parse the stderr of python -X importtime, return the total and top packages by cumulative microseconds
+    eg: import time:       352 |      12345 | torch
+    """
+    packages = []
+    for line in lines:
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        items = line[len('import time:'):].split('|')
+        if len(items) != 3:
+            continue
+        name = items[2].rstrip()
+        # the nested level by the leading spaces, 0 for top level package
+        level = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        packages.append(dict(name=name.strip(), self_us=int(items[0]), cumulative_us=int(items[1]), level=level))
+
+    top_level = [p for p in packages if p['level'] == 0]
+    return dict(total_seconds=round(sum(p['cumulative_us'] for p in top_level) / 1e6, 3),
+                package_num=len(packages),
+                top=sorted(top_level, key=lambda p: p['cumulative_us'], reverse=True)[0:top])
+
+
+def get_startup_seconds(events: Dict[str, float]) -> Dict[str, float]:
+    """the seconds relative to container create
+    """
+    create = events['container_create']
+    seconds = {}
+    for name in ['container_start', 'first_log', 'first_monitor', 'container_exit']:
+        if name in events:
+            seconds[name] = round(events[name] - create, 3)
+    return seconds
+
+
+class StartupProfiler(object):
+
+    def __init__(self, cfg: edict, profile_id: str = ''):
+        self.cfg = copy.deepcopy(cfg)
+        self.cfg.result_cache = False
+        # poll the monitor file frequently for the first write time
+        self.cfg.monitor_interval = 0.2
+        self.profile_id = profile_id or str(round(time.time()))
+        self.profile_dir = osp.join(self.cfg.work_dir, f'startup-{self.profile_id}')
+        self.profile_file = osp.join(self.profile_dir, 'startup-profile.yaml')
+
+        startup_cfg = self.cfg.get('startup', None) or {}
+        self.task: str = startup_cfg.get('task', 'mining')
+        self.runs: int = startup_cfg.get('runs', 3)
+        self.smoke_size: float = startup_cfg.get('smoke_size', 10)
+        self.import_modules: List[str] = startup_cfg.get('import_modules', DEFAULT_IMPORT_MODULES)
+
+        self.runtime = get_runtime(self.cfg)
+        self.cfg.object_type = self.runtime.get_object_type(self.cfg.docker_image)
+        if self.cfg.object_type == 2:
+            self.verifier_class = VerifierDetection
+        else:
+            self.verifier_class = VerifierSegmentation
+
+    def run_command(self, name: str, command: List[str], gpu_id: str = '') -> LogCapture:
+        """run the command in docker image without workspace, return the log capture
+        """
+        log_capture = LogCapture(osp.join(self.profile_dir, f'{name}.log'))
+        self.runtime.run(self.cfg.docker_image,
+                         command=command,
+                         volumes=[],
+                         gpu_id=gpu_id,
+                         name=f'ymir-verifier-startup-{self.profile_id}-{name}',
+                         log_capture=log_capture)
+        return log_capture
+
+    def run_bare(self, gpu_id: str) -> Dict[str, float]:
+        """the container overhead without executor, the gpu runtime hooks cost if gpu_id offered
+        """
+        name = 'bare-gpu' if gpu_id else 'bare'
+        events = self.run_command(name, ['true'], gpu_id).events
+        return dict(create_to_start=round(events['container_start'] - events['container_create'], 3),
+                    start_to_exit=round(events['container_exit'] - events['container_start'], 3))
+
+    def run_import_profile(self) -> Dict:
+        script = IMPORT_SCRIPT.format(modules=repr(list(self.import_modules)))
+        log_capture = self.run_command('importtime', ['python3', '-X', 'importtime', '-c', script])
+        with open(log_capture.log_file, 'r') as fp:
+            lines = [line.rstrip('\n').partition(' ')[2] for line in fp]
+        result = parse_importtime(lines)
+        result['errors'] = [line for line in lines if line.startswith('import ') and ' failed: ' in line]
+        return result
+
+    def build_data_dir(self) -> None:
+        """use a small subset of dataset, the startup cost is the major part of task
+        """
+        builder = SubsetBuilder(self.cfg.data_dir,
+                                osp.join(self.profile_dir, 'data'),
+                                docker_in_dir=self.cfg.env_config.input.root_dir,
+                                size=self.smoke_size)
+        self.cfg.data_dir, bind_dirs = builder.build_tasks(self.cfg.env_config.input, [self.task])
+        add_extra_binds(self.cfg, bind_dirs)
+
+    def run_task(self, run_idx: int) -> Dict[str, float]:
+        cfg = copy.deepcopy(self.cfg)
+        cfg.task_id = f'{self.profile_id}-{self.task}-{run_idx}'
+        cfg.in_dir = osp.join(self.profile_dir, f'{self.task}-{run_idx}', 'in')
+        cfg.out_dir = osp.join(self.profile_dir, f'{self.task}-{run_idx}', 'out')
+        shutil.rmtree(osp.dirname(cfg.in_dir), ignore_errors=True)
+
+        v = self.verifier_class(cfg)
+        task_result = v.verify_task(docker_image_name=cfg.docker_image, task=self.task)
+        return get_startup_seconds(task_result['events']['events'])
+
+    def compare(self, runs: List[Dict[str, float]]) -> Dict:
+        """the first run and the median of repeated runs for each event
+        """
+        result = {}
+        for name in runs[0]:
+            warm = [run[name] for run in runs[1:] if name in run]
+            result[name] = dict(cold=runs[0][name], warm=statistics.median(warm) if warm else None)
+        return result
+
+    def run(self) -> bool:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        profile: Dict = dict(docker_image=self.cfg.docker_image, task=self.task)
+        success = True
+        gpu_id = str(self.cfg.get('gpu_id', '') or '')
+        steps = [('image_size', lambda: self.runtime.get_image_size(self.cfg.docker_image)),
+                 ('bare_cpu', lambda: self.run_bare('')),
+                 ('bare_gpu', lambda: self.run_bare(gpu_id) if gpu_id else {}),
+                 ('imports', self.run_import_profile)]
+        for key, step in steps:
+            try:
+                profile[key] = step()
+            except Exception as e:
+                traceback.print_exc()
+                profile[key] = dict(error=f'{type(e).__name__}: {e}')
+                success = False
+            print(f'startup {key}: {profile[key]}')
+
+        runs = []
+        try:
+            self.build_data_dir()
+            for run_idx in range(self.runs):
+                runs.append(self.run_task(run_idx))
+                print(f'startup {self.task} run {run_idx}: {runs[-1]}')
+        except Exception as e:
+            traceback.print_exc()
+            profile['error'] = f'{type(e).__name__}: {e}'
+            success = False
+        profile['runs'] = runs
+        if runs:
+            profile['cold_vs_warm'] = self.compare(runs)
+            print(f'startup {self.task} cold vs warm: {profile["cold_vs_warm"]}')
+
+        with open(self.profile_file, 'w') as fw:
+            yaml.safe_dump(profile, fw, sort_keys=False)
+        print(f'startup profile saved to {self.profile_file}')
+        return success
@@ -0,0 +1,170 @@
+"""bounded memory readers for large executor output files
+
+- iter_json_items(): parse the json object incrementally, yield the items of top level object or nested object
+- HashIndex: compact index of strings, 8 bytes for each string, use to check candidate membership
+- get_score_distribution(): the statistics of scores in array
+"""
+import bisect
+import hashlib
+import json
+import math
+from array import array
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+# the chars end a number or literal, the decode error before them is not caused by the truncated buffer
+_delimiters = _whitespace + ',:[]{}"'
+
+
+class _JsonStream(object):
+    """a growing text buffer over file object, decode json value one by one
+    """
+
+    def __init__(self, fp: IO[str], chunk_size: int = 1 << 20):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self) -> None:
+        # drop the consumed part of buffer, keep the memory bounded
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.fp.read(max(self.chunk_size, len(self.buf)))
+        if chunk:
+            self.buf += chunk
+        else:
+            self.eof = True
+
+    def peek(self) -> str:
+        """skip whitespace and return next char, return '' at the end of file
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._read_more()
+
+    def expect(self, char: str) -> None:
+        c = self.peek()
+        if c != char:
+            raise ValueError(f'invalid json, expect {repr(char)} but get {repr(c)} at {self.pos}')
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """decode next json value, the value must be complete in buffer
+        read more only if the decode error is at the end of buffer, eg: truncated string, number or literal,
+        raise the error in middle of buffer at once, do not buffer the whole invalid file
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # number at the end of buffer may be truncated, eg: 12 of 123
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith('Unterminated string') or not any(c in _delimiters
+                                                                                  for c in self.buf[e.pos:])
+                if self.eof or not truncated:
+                    raise
+            self._read_more()
+
+
+def _iter_object(stream: _JsonStream) -> Iterator[Tuple[str, Any]]:
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+        return
+
+    while True:
+        key = stream.decode()
+        if not isinstance(key, str):
+            raise ValueError(f'invalid json, object key {key} is not string')
+        stream.expect(':')
+        yield key, stream
+
+        c = stream.peek()
+        stream.pos += 1
+        if c == '}':
+            return
+        elif c != ',':
+            raise ValueError(f'invalid json, expect , or }} but get {repr(c)}')
+
+
+def iter_json_items(fp: IO[str], key: Optional[str] = None, chunk_size: int = 1 << 20) -> Iterator[Tuple[str, Any]]:
+    """yield (name, value) in top level json object, or in the nested object top_level[key]
+
+    only one value is kept in memory, eg: the annotations for one image in infer-result.json
+    raise ValueError if the json is invalid, or key is offered but not found in top level object
+    """
+    stream = _JsonStream(fp, chunk_size)
+    found = key is None
+    for name, _ in _iter_object(stream):
+        if key is None:
+            yield name, stream.decode()
+        elif name == key and stream.peek() == '{':
+            found = True
+            for sub_name, _ in _iter_object(stream):
+                yield sub_name, stream.decode()
+        else:
+            # skip other top level values
+            stream.decode()
+
+    if not found:
+        raise ValueError(f'{key} not found in json object')
+
+
+class HashIndex(object):
+    """a sorted array of 64-bit string hashes, use 8 bytes for each string
+    """
+
+    def __init__(self, keys: Iterable[str]):
+        self.hashes = array('Q')
+        for h in sorted(self.hash(key) for key in keys):
+            if not self.hashes or self.hashes[-1] != h:
+                self.hashes.append(h)
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def index(self, key: str) -> int:
+        """return the position of key in index, -1 if not found
+        """
+        h = self.hash(key)
+        idx = bisect.bisect_left(self.hashes, h)
+        if idx < len(self.hashes) and self.hashes[idx] == h:
+            return idx
+        return -1
+
+    def __contains__(self, key: str) -> bool:
+        return self.index(key) >= 0
+
+
+def get_score_distribution(scores: array, bins: int = 10) -> Dict:
+    """min, max, mean, std and histogram of scores, no extra copy of scores
+    """
+    n = len(scores)
+    if n == 0:
+        return dict(count=0)
+
+    min_score = min(scores)
+    max_score = max(scores)
+    mean = math.fsum(scores) / n
+    std = math.sqrt(math.fsum((x - mean)**2 for x in scores) / n)
+
+    histogram = [0] * bins
+    width = (max_score - min_score) / bins
+    for x in scores:
+        idx = int((x - min_score) / width) if width > 0 else 0
+        histogram[min(idx, bins - 1)] += 1
+
+    return dict(count=n, min=min_score, max=max_score, mean=mean, std=std, histogram=histogram)
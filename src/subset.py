@@ -0,0 +1,227 @@
+"""build a small deterministic subset of the dataset for smoke verification
+
+smoke_size: the number of images (>= 1) or the fraction of images (< 1) for each index file
+smoke_seed: the same seed always gives the same subset
+
+the images are stratified by class, each image is grouped by its rarest class,
+then each group is sampled in proportion to its size and at least one image if possible.
+
+the subset data_dir only contains the symlinks of selected files, eg:
+<smoke_dir>
+- assets/train/xxx.jpg -> <real data_dir>/assets/train/xxx.jpg
+- annotations/train/xxx.txt -> <real data_dir>/annotations/train/xxx.txt
+- train-index.tsv  # the selected lines
+- val-index.tsv
+- candidate-index.tsv
+
+the coco annotation file shared by all images is filtered instead of symlinked.
+"""
+import json
+import math
+import os
+import os.path as osp
+import random
+import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from .dataset_index import get_host_path
+
+
+def read_class_names(annotation_file: str) -> List[str]:
+    """the classes in ymir txt annotation or voc xml annotation, empty list for unknown format
+    ymir txt annotation: class_id, xmin, ymin, xmax, ymax[, ...] for each line
+    """
+    try:
+        if annotation_file.endswith('.xml'):
+            return [obj.text or '' for obj in ET.parse(annotation_file).getroot().iter('name')]
+        elif annotation_file.endswith('.txt'):
+            with open(annotation_file, 'r') as fp:
+                return [line.split(',')[0].strip() for line in fp if line.strip()]
+    except (OSError, ET.ParseError):
+        pass
+    return []
+
+
+def get_sample_num(total: int, size: Union[int, float]) -> int:
+    if size < 1:
+        return min(total, max(1, math.ceil(total * size)))
+    return min(total, int(size))
+
+
+def select_stratified(labels: List[List[str]], size: Union[int, float], seed: int = 0) -> List[int]:
+    """return the sorted index of selected items
+    labels: the class names of each item, empty list for background image
+    """
+    total = len(labels)
+    sample_num = get_sample_num(total, size)
+    if sample_num >= total:
+        return list(range(total))
+
+    frequency = Counter(name for names in labels for name in set(names))
+    groups: Dict[str, List[int]] = {}
+    for idx, names in enumerate(labels):
+        # the rarest class of image, the background image in group ''
+        key = min(set(names), key=lambda x: (frequency[x], x)) if names else ''
+        groups.setdefault(key, []).append(idx)
+
+    rng = random.Random(seed)
+    keys = sorted(groups)
+    for key in keys:
+        rng.shuffle(groups[key])
+
+    # proportional allocation with at least one item for each group if possible
+    quotas = {key: sample_num * len(groups[key]) / total for key in keys}
+    alloc = {key: int(quotas[key]) for key in keys}
+    if sample_num >= len(keys):
+        for key in keys:
+            alloc[key] = max(alloc[key], 1)
+    while sum(alloc.values()) > sample_num:
+        key = max(keys, key=lambda x: (alloc[x], x))
+        alloc[key] -= 1
+    remainder_keys = sorted(keys, key=lambda x: (alloc[x] - quotas[x], x))
+    while sum(alloc.values()) < sample_num:
+        for key in remainder_keys:
+            if sum(alloc.values()) < sample_num and alloc[key] < len(groups[key]):
+                alloc[key] += 1
+
+    return sorted(idx for key in keys for idx in groups[key][0:alloc[key]])
+
+
+class SubsetBuilder(object):
+    """build the smoke dataset in smoke_dir from data_dir
+    """
+
+    def __init__(self,
+                 data_dir: str,
+                 smoke_dir: str,
+                 docker_in_dir: str = '/in',
+                 size: Union[int, float] = 100,
+                 seed: int = 0,
+                 num_workers: Optional[int] = None):
+        self.data_dir = osp.abspath(data_dir)
+        self.real_data_dir = osp.realpath(data_dir)
+        self.smoke_dir = osp.abspath(smoke_dir)
+        self.docker_in_dir = docker_in_dir
+        self.size = size
+        self.seed = seed
+        self.num_workers = num_workers or min(32, (os.cpu_count() or 1) + 4)
+        # the symlink targets, need to bind in docker container
+        self.source_dirs = [self.real_data_dir]
+        # the coco annotation file and its selected asset files
+        self.coco_assets: Dict[str, List[str]] = {}
+
+    def get_smoke_path(self, host_path: str) -> str:
+        return osp.join(self.smoke_dir, osp.relpath(host_path, start=self.data_dir))
+
+    def symlink(self, host_path: str) -> None:
+        relative_path = osp.relpath(host_path, start=self.data_dir)
+        if relative_path.startswith('..'):
+            # not in data_dir, use the original path
+            return
+
+        smoke_path = osp.join(self.smoke_dir, relative_path)
+        if not osp.lexists(smoke_path):
+            os.makedirs(osp.dirname(smoke_path), exist_ok=True)
+            os.symlink(osp.join(self.real_data_dir, relative_path), smoke_path)
+
+    def filter_coco_file(self, coco_file: str, asset_files: List[str]) -> None:
+        """write the coco annotation for selected images only
+        """
+        with open(coco_file, 'r') as fp:
+            coco = json.load(fp)
+
+        basenames = set(osp.basename(f) for f in asset_files)
+        images = [img for img in coco.get('images', []) if osp.basename(img['file_name']) in basenames]
+        image_ids = set(img['id'] for img in images)
+        coco['images'] = images
+        coco['annotations'] = [ann for ann in coco.get('annotations', []) if ann['image_id'] in image_ids]
+
+        smoke_path = self.get_smoke_path(coco_file)
+        os.makedirs(osp.dirname(smoke_path), exist_ok=True)
+        with open(smoke_path, 'w') as fw:
+            json.dump(coco, fw)
+
+    def get_coco_labels(self, coco_file: str, asset_files: List[str]) -> List[List[str]]:
+        with open(coco_file, 'r') as fp:
+            coco = json.load(fp)
+
+        image_ids = {osp.basename(img['file_name']): img['id'] for img in coco.get('images', [])}
+        image_labels: Dict[int, List[str]] = {}
+        for ann in coco.get('annotations', []):
+            image_labels.setdefault(ann['image_id'], []).append(str(ann['category_id']))
+        return [image_labels.get(image_ids.get(osp.basename(f), -1), []) for f in asset_files]
+
+    def build_index_file(self, index_file: str) -> Dict:
+        """write the selected lines to smoke index file, symlink the selected files
+        """
+        with open(index_file, 'r') as fp:
+            lines = [line.rstrip('\n') for line in fp if line.strip()]
+        paths = [[get_host_path(item, self.docker_in_dir, self.data_dir) for item in line.split('\t')]
+                 for line in lines]
+        asset_files = [items[0] for items in paths]
+        annotation_files = [items[1] for items in paths if len(items) > 1]
+
+        # the coco annotation file shared by all images
+        coco_file = ''
+        shared = len(annotation_files) == len(paths) and len(set(annotation_files)) == 1
+        if shared and annotation_files[0].endswith('.json'):
+            coco_file = annotation_files[0]
+            labels = self.get_coco_labels(coco_file, asset_files)
+        else:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                labels = list(executor.map(read_class_names, [items[1] if len(items) > 1 else '' for items in paths]))
+
+        selected = select_stratified(labels, self.size, self.seed)
+        for idx in selected:
+            for host_path in paths[idx][0:2]:
+                if host_path != coco_file:
+                    self.symlink(host_path)
+        if coco_file:
+            # the coco file may shared by train-index.tsv and val-index.tsv, filter it after all index files
+            self.coco_assets.setdefault(coco_file, []).extend(asset_files[idx] for idx in selected)
+
+        smoke_index_file = self.get_smoke_path(index_file)
+        os.makedirs(osp.dirname(smoke_index_file), exist_ok=True)
+        with open(smoke_index_file, 'w') as fw:
+            for idx in selected:
+                fw.write(lines[idx] + '\n')
+
+        class_num = len(set(name for names in labels for name in names))
+        return dict(image_num=len(lines), selected_num=len(selected), class_num=class_num)
+
+    def build(self, index_files: List[str], subdirs: List[str]) -> Dict:
+        """index_files: the host path of index files in data_dir
+        subdirs: the relative path of assets and annotations directory, created even if no file selected
+        """
+        for subdir in subdirs:
+            os.makedirs(osp.join(self.smoke_dir, subdir), exist_ok=True)
+            # the symlink directory should be bind in docker container too
+            if osp.islink(osp.join(self.real_data_dir, subdir)):
+                self.source_dirs.append(osp.join(self.real_data_dir, subdir))
+
+        result = {osp.basename(f): self.build_index_file(f) for f in index_files}
+        for coco_file, asset_files in self.coco_assets.items():
+            self.filter_coco_file(coco_file, asset_files)
+        with open(osp.join(self.smoke_dir, 'smoke.json'), 'w') as fw:
+            json.dump(dict(data_dir=self.data_dir, size=self.size, seed=self.seed, index_files=result), fw, indent=2)
+        return result
+
+    def build_tasks(self, input_cfg: Dict, tasks: List[str]) -> Tuple[str, List[str]]:
+        """build the index files used by tasks, input_cfg is the input of env config, eg: cfg.env_config.input
+        return the smoke data_dir, and the directories to bind in docker container for the symlinks
+        """
+        index_keys = []
+        for task in tasks:
+            if task == 'training':
+                index_keys.extend(['training_index_file', 'val_index_file'])
+            else:
+                index_keys.append('candidate_index_file')
+        index_files = sorted(set(get_host_path(input_cfg[key], self.docker_in_dir, self.data_dir)
+                                 for key in index_keys))
+        subdirs = [osp.relpath(input_cfg[key], start=self.docker_in_dir) for key in ['assets_dir', 'annotations_dir']]
+
+        result = self.build(index_files, subdirs)
+        print(f'smoke dataset {self.smoke_dir}: {result}')
+        return self.smoke_dir, list(self.source_dirs)
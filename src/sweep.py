@@ -0,0 +1,201 @@
+"""batch test hyper-parameters of ymir executor
+
+the hyper_parameters in config file will be expanded as grid for each task
+
+hyper_parameters:
+  training:
+    batch_size_per_gpu: [4, 8]
+    image_size: [320, 640]  # 2 x 2 = 4 points for training
+  mining:
+    mining_algorithm: ['random', 'entropy']
+
+the points render to the same /in/config.yaml will run only once.
+the state of each point is saved in <work_dir>/sweep-<sweep_id>/sweep-state.yaml,
+run the sweep again with the same sweep_id will skip the passed points.
+the mining and infer points after training use the weights of first passed training point,
+they are marked as skip if no training point passed, instead of running with pretrain_weights_dir.
+"""
+import copy
+import hashlib
+import itertools
+import os
+import os.path as osp
+import shutil
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import yaml
+from easydict import EasyDict as edict
+
+from .runtime import get_runtime
+from .scheduler import DevicePool
+from .verifier_detection import VerifierDetection
+from .verifier_segmentation import VerifierSegmentation
+
+
+def expand_grid(task_hyper_parameters: Dict[str, list]) -> List[dict]:
+    """expand {a: [1, 2], b: [3]} to [{a: 1, b: 3}, {a: 2, b: 3}]
+    """
+    if not task_hyper_parameters:
+        return [dict()]
+
+    keys = list(task_hyper_parameters.keys())
+    values = [v if isinstance(v, list) else [v] for v in task_hyper_parameters.values()]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def get_config_hash(in_config: dict) -> str:
+    """the hash of rendered config.yaml, task_id is ignored
+    """
+    config = {key: value for key, value in in_config.items() if key != 'task_id'}
+    return hashlib.sha1(yaml.safe_dump(config, sort_keys=True).encode('utf-8')).hexdigest()[0:10]
+
+
+class SweepPoint(object):
+
+    def __init__(self, task: str, params: dict, config_hash: str):
+        self.task = task
+        self.params = params
+        self.point_id = f'{task}-{config_hash}'
+
+
+class Sweep(object):
+
+    def __init__(self, cfg: edict, sweep_id: str = ''):
+        self.cfg = copy.deepcopy(cfg)
+        self.sweep_id = sweep_id or str(round(time.time()))
+        self.sweep_dir = osp.join(self.cfg.work_dir, f'sweep-{self.sweep_id}')
+        self.state_file = osp.join(self.sweep_dir, 'sweep-state.yaml')
+        self.result_file = osp.join(self.sweep_dir, 'sweep-result.tsv')
+        self.hyper_parameters = self.cfg.get('hyper_parameters', None) or {}
+        self.gpus_per_point = self.cfg.get('gpus_per_point', 1)
+
+        self.state: Dict[str, dict] = {}
+        if osp.exists(self.state_file):
+            with open(self.state_file, 'r') as fp:
+                self.state = yaml.safe_load(fp) or {}
+        self._lock = threading.Lock()
+
+        self.cfg.object_type = get_runtime(self.cfg).get_object_type(self.cfg.docker_image)
+        if self.cfg.object_type == 2:
+            self.verifier_class = VerifierDetection
+        else:
+            self.verifier_class = VerifierSegmentation
+
+    def get_point_cfg(self, point: SweepPoint, gpu_id: str = '') -> edict:
+        cfg = copy.deepcopy(self.cfg)
+        cfg.task_id = f'{self.sweep_id}-{point.point_id}'
+        cfg.in_dir = osp.join(self.sweep_dir, point.point_id, 'in')
+        cfg.out_dir = osp.join(self.sweep_dir, point.point_id, 'out')
+        if gpu_id:
+            cfg.gpu_id = gpu_id
+        cfg.setdefault('param_config', edict())
+        cfg.param_config.setdefault(point.task, edict())
+        cfg.param_config[point.task].update(point.params)
+        return cfg
+
+    def get_points(self, task: str, gpu_id: str) -> List[SweepPoint]:
+        """expand the grid and remove the points with same config.yaml
+        """
+        points: Dict[str, SweepPoint] = {}
+        for params in expand_grid(self.hyper_parameters.get(task, {})):
+            cfg = self.get_point_cfg(SweepPoint(task, params, ''), gpu_id)
+            in_config = self.verifier_class(cfg).get_hyperparameter_config(task)
+            point = SweepPoint(task, params, get_config_hash(in_config))
+            if point.point_id in points:
+                print(f'skip {task} {params}, the same config with {points[point.point_id].params}')
+            else:
+                points[point.point_id] = point
+        return list(points.values())
+
+    def save_state(self, point: SweepPoint, result: dict) -> None:
+        with self._lock:
+            self.state[point.point_id] = result
+            with open(self.state_file, 'w') as fw:
+                yaml.safe_dump(self.state, fw, sort_keys=False)
+
+    def run_point(self, point: SweepPoint, device_pool: DevicePool) -> dict:
+        slot = device_pool.acquire()
+        cfg = self.get_point_cfg(point, slot)
+        # remove the output of interrupted or failed run
+        shutil.rmtree(cfg.out_dir, ignore_errors=True)
+
+        result = dict(task=point.task, params=point.params, gpu_id=slot, error='')
+        self.save_state(point, dict(result, state='running'))
+        tic = time.time()
+        try:
+            v = self.verifier_class(cfg)
+            v.verify_task(docker_image_name=cfg.docker_image, task=point.task)
+            result['state'] = 'pass'
+        except Exception as e:
+            traceback.print_exc()
+            result['state'] = 'fail'
+            result['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            device_pool.release(slot)
+
+        result['time'] = round(time.time() - tic, 1)
+        self.save_state(point, result)
+        return result
+
+    def skip_point(self, point: SweepPoint, reason: str) -> dict:
+        print(f'skip {point.task} {point.params}: {reason}')
+        result = dict(task=point.task, params=point.params, gpu_id='', error=reason, state='skip')
+        self.save_state(point, result)
+        return result
+
+    def run(self) -> bool:
+        """run training points first, then mining and infer points with the weights of first passed training point
+        """
+        os.makedirs(self.sweep_dir, exist_ok=True)
+        devices = [d for d in str(self.cfg.get('gpu_id', '0')).split(',') if d.strip()]
+        slot_num = max(1, len(devices) // self.gpus_per_point)
+        device_pool = DevicePool.from_gpu_id(','.join(devices), slot_num)
+        print(f'run sweep {self.sweep_id} in {self.sweep_dir} with device slots {device_pool.slots}')
+
+        all_points = []
+        # the reason to skip the points after training, eg: no training point passed
+        skip_reason = ''
+        for task in self.cfg.tasks:
+            points = self.get_points(task, device_pool.slots[0])
+            all_points += points
+            todo_points = [p for p in points if self.state.get(p.point_id, {}).get('state') != 'pass']
+            print(f'{task}: {len(points)} points, {len(points) - len(todo_points)} finished')
+            if skip_reason:
+                for p in todo_points:
+                    self.skip_point(p, skip_reason)
+                continue
+
+            with ThreadPoolExecutor(max_workers=slot_num) as executor:
+                list(executor.map(lambda p: self.run_point(p, device_pool), todo_points))
+
+            if task == 'training':
+                for p in points:
+                    if self.state[p.point_id]['state'] == 'pass':
+                        relative_models_dir = osp.relpath(self.cfg.env_config.output.models_dir,
+                                                          start=self.cfg.env_config.output.root_dir)
+                        self.cfg.pretrain_weights_dir = osp.join(self.sweep_dir, p.point_id, 'out',
+                                                                 relative_models_dir)
+                        break
+                else:
+                    skip_reason = 'no training point passed, no weights to test'
+
+        self.write_result(all_points)
+        return all(self.state[p.point_id]['state'] == 'pass' for p in all_points)
+
+    def write_result(self, points: List[SweepPoint]) -> None:
+        lines = ['point_id\ttask\tstate\ttime\tparams\terror']
+        for p in points:
+            result = self.state[p.point_id]
+            params = ','.join([f'{k}={v}' for k, v in p.params.items()])
+            lines.append(f'{p.point_id}\t{p.task}\t{result["state"]}\t{result.get("time", "")}\t{params}\t'
+                         f'{result["error"]}')
+
+        with open(self.result_file, 'w') as fw:
+            fw.write('\n'.join(lines) + '\n')
+
+        print('\n'.join(lines))
+        print(f'sweep result saved to {self.result_file}')
@@ -0,0 +1,284 @@
+"""generate synthetic dataset with the ymir input layout, for load and stress test
+
+<out_dir>
+├── assets
+│   ├── train/0000/000000000.png  # shard directory for each shard_size images
+│   └── val/0000/000000004.png
+├── annotations
+│   ├── train/0000/000000000.xml  # voc format
+│   ├── val/0000/000000004.xml
+│   └── coco-annotations.json  # coco format, shared by train and val
+├── train-index.tsv
+├── val-index.tsv
+└── candidate-index.tsv  # the val images
+
+the images are png with random boxes filled by class color, generated without any image library.
+payload:
+- unique: each image has its own content
+- dedup: the images with the same content are hardlinked, only one file is written for each class
+- sparse: the same as unique, extend each file to payload_size with a hole, the png decoder ignore the tail
+
+usage: ymir-verifier-dataset --out_dir tests/data/synthetic/in --num_images 1000000 --payload dedup
+"""
+import argparse
+import collections
+import json
+import os
+import os.path as osp
+import random
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+Box = Tuple[int, int, int, int, int]  # class_id, xmin, ymin, xmax, ymax
+
+
+def get_class_color(class_id: int) -> bytes:
+    rng = random.Random(class_id)
+    return bytes([rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)])
+
+
+def encode_png(width: int, height: int, boxes: List[Box], background: bytes) -> bytes:
+    """encode rgb png with background color and filled boxes
+    """
+    colors = {class_id: get_class_color(class_id) for class_id, *_ in boxes}
+    # the rows between two box edges are the same, build each band once
+    edges = sorted(set([0, height] + [y for box in boxes for y in box[2:5:2]]))
+    rows = []
+    for y0, y1 in zip(edges[:-1], edges[1:]):
+        row = bytearray(b'\x00' + background * width)
+        for class_id, xmin, ymin, xmax, ymax in boxes:
+            if ymin <= y0 < ymax:
+                row[1 + 3 * xmin:1 + 3 * xmax] = colors[class_id] * (xmax - xmin)
+        rows.append(bytes(row) * (y1 - y0))
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack(
+            '>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b''.join(rows), 1)) +
+            chunk(b'IEND', b''))
+
+
+def get_voc_xml(filename: str, width: int, height: int, boxes: List[Box], class_names: List[str]) -> str:
+    objects = ''.join(f'<object><name>{escape(class_names[c])}</name><difficult>0</difficult>'
+                      f'<bndbox><xmin>{x1}</xmin><ymin>{y1}</ymin><xmax>{x2}</xmax><ymax>{y2}</ymax></bndbox></object>'
+                      for c, x1, y1, x2, y2 in boxes)
+    return (f'<annotation><filename>{filename}</filename>'
+            f'<size><width>{width}</width><height>{height}</height><depth>3</depth></size>{objects}</annotation>\n')
+
+
+class SyntheticDataset(object):
+
+    def __init__(self,
+                 out_dir: str,
+                 num_images: int = 1000,
+                 class_names: List[str] = ['dog', 'cat', 'person'],
+                 val_ratio: float = 0.2,
+                 annotation_format: str = 'voc',
+                 image_size: Tuple[int, int] = (640, 480),
+                 max_objects: int = 5,
+                 payload: str = 'unique',
+                 payload_size: int = 0,
+                 shard_size: int = 10000,
+                 seed: int = 0):
+        self.out_dir = osp.abspath(out_dir)
+        self.num_images = num_images
+        self.class_names = class_names
+        self.val_ratio = val_ratio
+        self.annotation_format = annotation_format
+        self.width, self.height = image_size
+        self.max_objects = max_objects
+        self.payload = payload
+        self.payload_size = payload_size
+        self.shard_size = shard_size
+        self.seed = seed
+
+        if annotation_format not in ['voc', 'coco']:
+            raise Exception(f'unknown annotation format {annotation_format}')
+        if payload not in ['unique', 'dedup', 'sparse']:
+            raise Exception(f'unknown payload {payload}')
+
+    def get_split(self, idx: int) -> str:
+        """the val images are evenly spread, eg: every 5th image for val_ratio=0.2
+        """
+        return 'val' if int((idx + 1) * self.val_ratio) > int(idx * self.val_ratio) else 'train'
+
+    def get_relative_path(self, idx: int, suffix: str) -> str:
+        return osp.join(self.get_split(idx), f'{idx // self.shard_size:04d}', f'{idx:09d}{suffix}')
+
+    def get_boxes(self, idx: int) -> List[Box]:
+        rng = random.Random(self.seed * 1000003 + idx)
+        boxes = []
+        for _ in range(rng.randint(1, self.max_objects)):
+            w = rng.randint(self.width // 10, self.width // 2)
+            h = rng.randint(self.height // 10, self.height // 2)
+            x = rng.randint(0, self.width - w)
+            y = rng.randint(0, self.height - h)
+            boxes.append((rng.randrange(len(self.class_names)), x, y, x + w, y + h))
+        return boxes
+
+    def get_dedup_file(self, class_id: int) -> str:
+        return osp.join(self.out_dir, 'payload', f'{class_id}.png')
+
+    def write_dedup_payloads(self) -> None:
+        """one image for each class, the box covers the center of image
+        """
+        os.makedirs(osp.join(self.out_dir, 'payload'), exist_ok=True)
+        for class_id in range(len(self.class_names)):
+            box = (class_id, self.width // 4, self.height // 4, 3 * self.width // 4, 3 * self.height // 4)
+            with open(self.get_dedup_file(class_id), 'wb') as fw:
+                fw.write(encode_png(self.width, self.height, [box], b'\x80\x80\x80'))
+
+    def generate_chunk(self, start: int, end: int) -> Tuple[List[Dict], List[Dict]]:
+        """write the images and voc annotations in [start, end), return coco images and annotations
+        """
+        coco_images = []
+        coco_annotations = []
+        for idx in range(start, end):
+            asset_file = osp.join(self.out_dir, 'assets', self.get_relative_path(idx, '.png'))
+            os.makedirs(osp.dirname(asset_file), exist_ok=True)
+            if self.payload == 'dedup':
+                # use the payload of the first box class, the box is the center of image
+                class_id = self.get_boxes(idx)[0][0]
+                boxes = [(class_id, self.width // 4, self.height // 4, 3 * self.width // 4, 3 * self.height // 4)]
+                if osp.lexists(asset_file):
+                    os.remove(asset_file)
+                os.link(self.get_dedup_file(class_id), asset_file)
+            else:
+                boxes = self.get_boxes(idx)
+                background = get_class_color(-1 - idx % 1000)
+                with open(asset_file, 'wb') as fw:
+                    fw.write(encode_png(self.width, self.height, boxes, background))
+                    if self.payload == 'sparse' and self.payload_size > fw.tell():
+                        fw.truncate(self.payload_size)
+
+            if self.annotation_format == 'voc':
+                annotation_file = osp.join(self.out_dir, 'annotations', self.get_relative_path(idx, '.xml'))
+                os.makedirs(osp.dirname(annotation_file), exist_ok=True)
+                with open(annotation_file, 'w') as fw:
+                    fw.write(get_voc_xml(osp.basename(asset_file), self.width, self.height, boxes, self.class_names))
+            else:
+                coco_images.append(dict(id=idx, file_name=osp.basename(asset_file), width=self.width,
+                                        height=self.height))
+                for box_idx, (class_id, x1, y1, x2, y2) in enumerate(boxes):
+                    coco_annotations.append(
+                        dict(id=idx * self.max_objects + box_idx,
+                             image_id=idx,
+                             category_id=class_id + 1,
+                             bbox=[x1, y1, x2 - x1, y2 - y1],
+                             area=(x2 - x1) * (y2 - y1),
+                             iscrowd=0,
+                             segmentation=[[x1, y1, x2, y1, x2, y2, x1, y2]]))
+        return coco_images, coco_annotations
+
+    def write_index_files(self) -> None:
+        annotation_suffix = '.xml' if self.annotation_format == 'voc' else ''
+        with open(osp.join(self.out_dir, 'train-index.tsv'), 'w') as fw_train, \
+                open(osp.join(self.out_dir, 'val-index.tsv'), 'w') as fw_val, \
+                open(osp.join(self.out_dir, 'candidate-index.tsv'), 'w') as fw_candidate:
+            for idx in range(self.num_images):
+                asset_path = f'/in/assets/{self.get_relative_path(idx, ".png")}'
+                if annotation_suffix:
+                    annotation_path = f'/in/annotations/{self.get_relative_path(idx, annotation_suffix)}'
+                else:
+                    annotation_path = '/in/annotations/coco-annotations.json'
+
+                if self.get_split(idx) == 'train':
+                    fw_train.write(f'{asset_path}\t{annotation_path}\n')
+                else:
+                    fw_val.write(f'{asset_path}\t{annotation_path}\n')
+                    fw_candidate.write(f'{asset_path}\n')
+
+    def generate(self, num_workers: int = 0, chunk_size: int = 1000) -> None:
+        os.makedirs(osp.join(self.out_dir, 'assets'), exist_ok=True)
+        os.makedirs(osp.join(self.out_dir, 'annotations'), exist_ok=True)
+        if self.payload == 'dedup':
+            self.write_dedup_payloads()
+
+        # write the coco annotations to temporary file to save memory
+        tmp_fp = tempfile.TemporaryFile('w+', dir=self.out_dir)
+        coco_file = osp.join(self.out_dir, 'annotations', 'coco-annotations.json')
+        tic = time.time()
+        num_workers = num_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=num_workers) as executor, tmp_fp:
+            chunks = [(start, min(start + chunk_size, self.num_images))
+                      for start in range(0, self.num_images, chunk_size)]
+            # bound the in-flight chunks, the finished chunk results are written in order and dropped
+            futures: collections.deque = collections.deque()
+            next_chunk_idx = 0
+
+            fw = open(coco_file, 'w') if self.annotation_format == 'coco' else None
+            try:
+                if fw is not None:
+                    fw.write('{"images": [')
+                for chunk_idx in range(len(chunks)):
+                    while next_chunk_idx < len(chunks) and len(futures) < 2 * num_workers:
+                        futures.append(executor.submit(self.generate_chunk, *chunks[next_chunk_idx]))
+                        next_chunk_idx += 1
+                    coco_images, coco_annotations = futures.popleft().result()
+                    if fw is not None:
+                        for image in coco_images:
+                            fw.write(('' if image['id'] == 0 else ', ') + json.dumps(image))
+                        for annotation in coco_annotations:
+                            tmp_fp.write(json.dumps(annotation) + '\n')
+                    print(f'generate {chunks[chunk_idx][1]}/{self.num_images} images, {time.time() - tic:.1f}s')
+
+                if fw is not None:
+                    fw.write('], "annotations": [')
+                    tmp_fp.seek(0)
+                    for line_idx, line in enumerate(tmp_fp):
+                        fw.write(('' if line_idx == 0 else ', ') + line.strip())
+                    categories = [dict(id=i + 1, name=name) for i, name in enumerate(self.class_names)]
+                    fw.write(f'], "categories": {json.dumps(categories)}}}')
+            finally:
+                if fw is not None:
+                    fw.close()
+
+        self.write_index_files()
+        print(f'synthetic dataset saved to {self.out_dir}, class_names: {self.class_names}')
+
+
+def get_args():
+    parser = argparse.ArgumentParser(prog='ymir verifier synthetic dataset')
+    parser.add_argument('--out_dir', required=True, help='the dataset directory, use as data_dir in config file')
+    parser.add_argument('--num_images', type=int, default=1000)
+    parser.add_argument('--num_classes', type=int, default=3, help='the class names will be class_0, class_1, ...')
+    parser.add_argument('--class_names', nargs='*', default=None, help='overwrite --num_classes if offered')
+    parser.add_argument('--val_ratio', type=float, default=0.2)
+    parser.add_argument('--format', default='voc', choices=['voc', 'coco'], help='the annotation format')
+    parser.add_argument('--image_size', default='640x480', help='width x height')
+    parser.add_argument('--max_objects', type=int, default=5, help='the max number of objects in each image')
+    parser.add_argument('--payload', default='unique', choices=['unique', 'dedup', 'sparse'])
+    parser.add_argument('--payload_size', type=int, default=0, help='the file size in bytes for sparse payload')
+    parser.add_argument('--shard_size', type=int, default=10000, help='the number of images in each sub directory')
+    parser.add_argument('--num_workers', type=int, default=0, help='the number of process, 0 for cpu count')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    width, height = [int(x) for x in args.image_size.lower().split('x')]
+    class_names = args.class_names or [f'class_{i}' for i in range(args.num_classes)]
+    dataset = SyntheticDataset(out_dir=args.out_dir,
+                               num_images=args.num_images,
+                               class_names=class_names,
+                               val_ratio=args.val_ratio,
+                               annotation_format=args.format,
+                               image_size=(width, height),
+                               max_objects=args.max_objects,
+                               payload=args.payload,
+                               payload_size=args.payload_size,
+                               shard_size=args.shard_size,
+                               seed=args.seed)
+    dataset.generate(num_workers=args.num_workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""sample the cpu, memory and block io usage of running container
+
+read the cgroup filesystem directly if possible (cgroup v1 and v2, cgroupfs and systemd driver),
+otherwise use the docker stats api.
+
+each sample contains:
+- cpu_percent: the cpu usage since last sample, 100 for one cpu core, None for the first sample
+- rss: the anonymous memory in bytes
+- cache: the page cache in bytes
+- shmem: the shared memory in bytes
+- blkio_read, blkio_write: the total block io in bytes
+"""
+import json
+import os.path as osp
+import threading
+import time
+from typing import Dict, List, Optional
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+METRICS = ['cpu_percent', 'rss', 'cache', 'shmem', 'blkio_read', 'blkio_write']
+
+
+def read_key_value_file(path: str) -> Dict[str, int]:
+    result = {}
+    with open(path, 'r') as fp:
+        for line in fp:
+            items = line.split()
+            if len(items) == 2 and items[1].isdigit():
+                result[items[0]] = int(items[1])
+    return result
+
+
+def find_cgroup_dirs(container_id: str) -> Optional[Dict[str, str]]:
+    """return the cgroup directory of container, None if not found
+    {'version': 'v2', 'dir': xxx} or {'version': 'v1', 'cpuacct': xxx, 'memory': xxx, 'blkio': xxx}
+    """
+    for d in [f'system.slice/docker-{container_id}.scope', f'docker/{container_id}']:
+        if osp.isfile(osp.join(CGROUP_ROOT, d, 'cgroup.controllers')):
+            return dict(version='v2', dir=osp.join(CGROUP_ROOT, d))
+
+    dirs = dict(version='v1')
+    for subsystem in ['cpuacct', 'memory', 'blkio']:
+        for d in [f'{subsystem}/system.slice/docker-{container_id}.scope', f'{subsystem}/docker/{container_id}']:
+            if osp.isdir(osp.join(CGROUP_ROOT, d)):
+                dirs[subsystem] = osp.join(CGROUP_ROOT, d)
+        if subsystem not in dirs:
+            return None
+    return dirs
+
+
+def read_cgroup_stats(cgroup_dirs: Dict[str, str]) -> Dict[str, int]:
+    """return cpu_usage in nanoseconds, and the other metrics in bytes
+    """
+    if cgroup_dirs['version'] == 'v2':
+        cgroup_dir = cgroup_dirs['dir']
+        cpu_usage = read_key_value_file(osp.join(cgroup_dir, 'cpu.stat'))['usage_usec'] * 1000
+        memory = read_key_value_file(osp.join(cgroup_dir, 'memory.stat'))
+        rss, cache, shmem = memory.get('anon', 0), memory.get('file', 0), memory.get('shmem', 0)
+
+        blkio_read = blkio_write = 0
+        io_stat_file = osp.join(cgroup_dir, 'io.stat')
+        if osp.isfile(io_stat_file):
+            with open(io_stat_file, 'r') as fp:
+                for line in fp:
+                    for item in line.split()[1:]:
+                        key, _, value = item.partition('=')
+                        if key == 'rbytes':
+                            blkio_read += int(value)
+                        elif key == 'wbytes':
+                            blkio_write += int(value)
+    else:
+        with open(osp.join(cgroup_dirs['cpuacct'], 'cpuacct.usage'), 'r') as fp:
+            cpu_usage = int(fp.read().strip())
+        memory = read_key_value_file(osp.join(cgroup_dirs['memory'], 'memory.stat'))
+        rss, cache, shmem = memory.get('rss', 0), memory.get('cache', 0), memory.get('shmem', 0)
+
+        blkio_read = blkio_write = 0
+        with open(osp.join(cgroup_dirs['blkio'], 'blkio.throttle.io_service_bytes'), 'r') as fp:
+            for line in fp:
+                items = line.split()
+                if len(items) == 3 and items[1] == 'Read':
+                    blkio_read += int(items[2])
+                elif len(items) == 3 and items[1] == 'Write':
+                    blkio_write += int(items[2])
+
+    return dict(cpu_usage=cpu_usage, rss=rss, cache=cache, shmem=shmem, blkio_read=blkio_read, blkio_write=blkio_write)
+
+
+def read_docker_stats(container) -> Dict[str, int]:
+    """the same as read_cgroup_stats, but use docker stats api, slower than cgroup filesystem
+    """
+    stats = container.stats(stream=False)
+    memory = stats.get('memory_stats', {}).get('stats', {})
+    blkio_read = blkio_write = 0
+    for item in stats.get('blkio_stats', {}).get('io_service_bytes_recursive', None) or []:
+        if item['op'].lower() == 'read':
+            blkio_read += item['value']
+        elif item['op'].lower() == 'write':
+            blkio_write += item['value']
+
+    return dict(cpu_usage=stats['cpu_stats']['cpu_usage']['total_usage'],
+                rss=memory.get('anon', memory.get('rss', 0)),
+                cache=memory.get('file', memory.get('cache', 0)),
+                shmem=memory.get('shmem', 0),
+                blkio_read=blkio_read,
+                blkio_write=blkio_write)
+
+
+class ResourceSampler(threading.Thread):
+    """poll the container resource usage every interval seconds until stop()
+    """
+
+    def __init__(self, interval: float = 2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self.container = None
+        self._cgroup_dirs: Optional[Dict[str, str]] = None
+        self._last_cpu: Optional[tuple] = None
+        self._stop_event = threading.Event()
+
+    def start_sampling(self, container) -> None:
+        """start sampling after the container started
+        """
+        self.container = container
+        self._cgroup_dirs = find_cgroup_dirs(container.id)
+        self.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def sample(self) -> None:
+        now = time.time()
+        if self._cgroup_dirs is not None:
+            stats = read_cgroup_stats(self._cgroup_dirs)
+        else:
+            stats = read_docker_stats(self.container)
+
+        cpu_usage = stats.pop('cpu_usage')
+        # the first sample is the cpu baseline, but its memory and blkio are kept for the short tasks
+        stats['cpu_percent'] = None
+        if self._last_cpu is not None:
+            last_time, last_cpu_usage = self._last_cpu
+            stats['cpu_percent'] = round(100 * (cpu_usage - last_cpu_usage) / 1e9 / (now - last_time), 2)
+        stats['time'] = now
+        self.samples.append(stats)
+        self._last_cpu = (now, cpu_usage)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.sample()
+            except Exception:
+                # the container exit or the cgroup removed
+                pass
+            if self._stop_event.wait(self.interval):
+                break
+
+    def get_summary(self) -> Dict:
+        """the peak and average value of each metric, the blkio is the total bytes
+        the value is None if unknown, eg: no sample
+        """
+        summary: Dict = dict(sample_count=len(self.samples))
+        for key in METRICS:
+            values = [s[key] for s in self.samples if s[key] is not None]
+            if key.startswith('blkio'):
+                summary[key] = max(values) if values else None
+            else:
+                summary[f'{key}_peak'] = max(values) if values else None
+                summary[f'{key}_avg'] = round(sum(values) / len(values), 2) if values else None
+        return summary
+
+    def save(self, resource_file: str) -> None:
+        with open(resource_file, 'w') as fw:
+            json.dump(dict(summary=self.get_summary(), samples=self.samples), fw, indent=2)
@@ -0,0 +1,378 @@
+"""read tensorboard event files without tensorflow, check the records and summarize the scalar curves
+
+the event file is a sequence of tfrecord:
+- uint64 length, uint32 masked crc32c of length
+- byte data[length], uint32 masked crc32c of data
+
+each data is a serialized tensorflow Event protobuf, only the fields for scalar are decoded:
+- Event: wall_time = 1 (double), step = 2 (int64), summary = 5 (Summary)
+- Summary: value = 1 (repeated Value)
+- Value: tag = 1 (string), simple_value = 2 (float), tensor = 8 (TensorProto)
+- TensorProto: dtype = 1, tensor_content = 4, float_val = 5, double_val = 6, int_val = 7, int64_val = 10,
+  half_val = 13, the scalar tensor is written by torch.utils.tensorboard and tf2 summary api
+
+the crc32c of record data is computed by the `crc32c` or `google_crc32c` package if installed. the pure python
+fallback is slow (about 3MB/s), then only the records with scalars are checked, the large histogram and image
+records are skipped.
+
+the speed is computed from the wall time of scalar events:
+- steps_per_sec: the step delta / the wall time delta of the scalar tag with most points
+- seconds_per_epoch: the median wall time interval of the epoch tag or the evaluation metric tag, which
+  is written once per epoch, the per-iteration tags are excluded, eg: val_loss_step
+"""
+import glob
+import os.path as osp
+import re
+import statistics
+import struct
+import time
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import crc32c as crc32c_lib
+except ImportError:  # optional
+    crc32c_lib = None  # type: ignore
+
+try:
+    import google_crc32c
+except ImportError:  # optional
+    google_crc32c = None  # type: ignore
+
+# (step, wall_time, value)
+ScalarPoint = Tuple[int, float, float]
+
+# the tag written once per epoch, eg: epoch, val/mAP, metrics/mAP_0.5, mIoU
+EPOCH_TAG_PATTERN = r'(^|\W|_)(epoch|map|miou|maskap|metric|val)'
+# the tag written each iteration, eg: val_loss_step, train/batch_loss
+ITERATION_TAG_PATTERN = r'(^|\W|_)(step|steps|iter|iteration|batch)(\W|_|$)'
+
+# the struct format of DataType in TensorProto.tensor_content
+DTYPE_FORMATS = {1: 'f', 2: 'd', 3: 'i', 9: 'q', 19: 'e', 4: 'B', 5: 'h', 6: 'b', 10: '?'}
+
+
+def get_crc32c_table() -> List[int]:
+    """the lookup table of crc32c (castagnoli) polynomial, reversed 0x82f63b78
+    """
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82f63b78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = get_crc32c_table()
+
+
+def get_native_crc32c() -> Optional[Callable[[bytes, int], int]]:
+    if crc32c_lib is not None:
+        return lambda data, crc: crc32c_lib.crc32c(data, crc)
+    if google_crc32c is not None:
+        return lambda data, crc: google_crc32c.extend(crc, data)
+    return None
+
+
+_NATIVE_CRC32C = get_native_crc32c()
+
+
+def py_crc32c(data: bytes, crc: int = 0) -> int:
+    crc ^= 0xffffffff
+    table = _CRC32C_TABLE
+    for b in data:
+        crc = table[(crc ^ b) & 0xff] ^ (crc >> 8)
+    return crc ^ 0xffffffff
+
+
+def crc32c(data: bytes, crc: int = 0) -> int:
+    if _NATIVE_CRC32C is not None:
+        return _NATIVE_CRC32C(data, crc)
+    return py_crc32c(data, crc)
+
+
+def masked_crc32c(data: bytes) -> int:
+    crc = crc32c(data)
+    return (((crc >> 15) | (crc << 17)) + 0xa282ead8) & 0xffffffff
+
+
+def read_records(fp: BinaryIO, check_crc: bool = True) -> Iterator[bytes]:
+    """yield the data of each record, raise ValueError for truncated or corrupt record
+    """
+    for offset, data, data_crc in iter_records(fp, check_crc=check_crc):
+        if check_crc:
+            check_data_crc(data, data_crc, offset)
+        yield data
+
+
+def check_data_crc(data: bytes, data_crc: int, offset: int) -> None:
+    if masked_crc32c(data) != data_crc:
+        raise ValueError(f'data crc mismatch at offset {offset}')
+
+
+def iter_records(fp: BinaryIO, check_crc: bool = True) -> Iterator[Tuple[int, bytes, int]]:
+    """yield (offset, data, masked crc32c of data) of each record, the data crc is not checked
+    raise ValueError for truncated record or the length crc mismatch
+    """
+    offset = 0
+    while True:
+        header = fp.read(12)
+        if not header:
+            return
+        if len(header) < 12:
+            raise ValueError(f'truncated record header at offset {offset}')
+
+        length, length_crc = struct.unpack('<QI', header)
+        if check_crc and masked_crc32c(header[0:8]) != length_crc:
+            raise ValueError(f'length crc mismatch at offset {offset}')
+
+        data = fp.read(length)
+        footer = fp.read(4)
+        if len(data) < length or len(footer) < 4:
+            raise ValueError(f'truncated record data at offset {offset}, expect {length} bytes')
+
+        yield offset, data, struct.unpack('<I', footer)[0]
+        offset += 12 + length + 4
+
+
+def encode_record(data: bytes) -> bytes:
+    header = struct.pack('<Q', len(data))
+    return header + struct.pack('<I', masked_crc32c(header)) + data + struct.pack('<I', masked_crc32c(data))
+
+
+def read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError('truncated varint')
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(data: bytes) -> Iterator[Tuple[int, int, object]]:
+    """yield (field number, wire type, value) of protobuf message
+    the value is int for varint, bytes for fixed64, fixed32 and length delimited
+    """
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f'unsupported wire type {wire_type} for field {field}')
+        if pos > len(data):
+            raise ValueError(f'truncated field {field}')
+        yield field, wire_type, value
+
+
+def to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def decode_repeated(wire_type: int, value, fmt: str) -> List[float]:
+    """decode the packed or unpacked repeated number field
+    """
+    if fmt in 'iq':
+        if wire_type == 0:
+            return [to_signed(value)]
+        values = []
+        pos = 0
+        while pos < len(value):
+            v, pos = read_varint(value, pos)
+            values.append(to_signed(v))
+        return values
+    size = struct.calcsize(fmt)
+    return list(struct.unpack(f'<{len(value) // size}{fmt}', value[0:len(value) // size * size]))
+
+
+def decode_tensor_scalar(data: bytes) -> Optional[float]:
+    """the first value of TensorProto, None for non-number tensor
+    """
+    dtype = 0
+    tensor_content = b''
+    values: List[float] = []
+    for field, wire_type, value in iter_fields(data):
+        if field == 1:
+            dtype = value
+        elif field == 4:
+            tensor_content = value
+        elif field == 5:
+            values += decode_repeated(wire_type, value, 'f')
+        elif field == 6:
+            values += decode_repeated(wire_type, value, 'd')
+        elif field in (7, 10, 13):
+            values += decode_repeated(wire_type, value, 'q')
+
+    if dtype == 19 and values:
+        # half_val stores the bits of float16 in int32
+        return struct.unpack('<e', struct.pack('<H', int(values[0]) & 0xffff))[0]
+    if values:
+        return float(values[0])
+    fmt = DTYPE_FORMATS.get(dtype, '')
+    if tensor_content and fmt and len(tensor_content) >= struct.calcsize(fmt):
+        return float(struct.unpack_from(f'<{fmt}', tensor_content)[0])
+    return None
+
+
+def decode_event(data: bytes) -> Dict:
+    """return dict(wall_time, step, scalars={tag: value})
+    """
+    event: Dict = dict(wall_time=0.0, step=0, scalars={})
+    for field, _, value in iter_fields(data):
+        if field == 1:
+            event['wall_time'] = struct.unpack('<d', value)[0]
+        elif field == 2:
+            event['step'] = to_signed(value)
+        elif field == 5:
+            for summary_field, _, summary_value in iter_fields(value):
+                if summary_field != 1:
+                    continue
+                tag = ''
+                scalar = None
+                for value_field, _, v in iter_fields(summary_value):
+                    if value_field == 1:
+                        tag = v.decode('utf-8', errors='replace')
+                    elif value_field == 2:
+                        scalar = struct.unpack('<f', v)[0]
+                    elif value_field == 8:
+                        scalar = decode_tensor_scalar(v)
+                if tag and scalar is not None:
+                    event['scalars'][tag] = scalar
+    return event
+
+
+def encode_varint(value: int) -> bytes:
+    value &= (1 << 64) - 1
+    result = bytearray()
+    while True:
+        b = value & 0x7f
+        value >>= 7
+        if value:
+            result.append(b | 0x80)
+        else:
+            result.append(b)
+            return bytes(result)
+
+
+def encode_event(wall_time: float, step: int = 0, scalars: Optional[Dict[str, float]] = None,
+                 file_version: str = '') -> bytes:
+    """encode the Event with simple_value scalars, the same as tensorboard SummaryWriter.add_scalar()
+    """
+    data = b'\x09' + struct.pack('<d', wall_time)
+    if step:
+        data += b'\x10' + encode_varint(step)
+    if file_version:
+        version = file_version.encode('utf-8')
+        data += b'\x1a' + encode_varint(len(version)) + version
+    if scalars:
+        summary = b''
+        for tag, scalar in scalars.items():
+            tag_bytes = tag.encode('utf-8')
+            value = b'\x0a' + encode_varint(len(tag_bytes)) + tag_bytes + b'\x15' + struct.pack('<f', scalar)
+            summary += b'\x0a' + encode_varint(len(value)) + value
+        data += b'\x2a' + encode_varint(len(summary)) + summary
+    return data
+
+
+class EventWriter(object):
+    """write scalars to tensorboard event file, for the fake executor and tests
+    """
+
+    def __init__(self, event_file: str):
+        self._fw = open(event_file, 'wb')
+        self._fw.write(encode_record(encode_event(time.time(), file_version='brain.Event:2')))
+
+    def add_scalar(self, tag: str, value: float, step: int, wall_time: Optional[float] = None) -> None:
+        self._fw.write(encode_record(encode_event(time.time() if wall_time is None else wall_time, step, {tag: value})))
+
+    def close(self) -> None:
+        self._fw.close()
+
+
+def read_scalars(event_file: str, check_crc: bool = True) -> Dict[str, List[ScalarPoint]]:
+    """the scalar curves in event file, {tag: [(step, wall_time, value)]}
+    the data crc of the records without scalar is checked only with the native crc32c
+    """
+    scalars: Dict[str, List[ScalarPoint]] = {}
+    with open(event_file, 'rb') as fp:
+        for offset, data, data_crc in iter_records(fp, check_crc=check_crc):
+            try:
+                event = decode_event(data)
+            except (ValueError, TypeError, struct.error):
+                # report the crc mismatch for the corrupt record
+                if check_crc:
+                    check_data_crc(data, data_crc, offset)
+                raise
+            if check_crc and (_NATIVE_CRC32C is not None or event['scalars']):
+                check_data_crc(data, data_crc, offset)
+            for tag, value in event['scalars'].items():
+                scalars.setdefault(tag, []).append((event['step'], event['wall_time'], value))
+    return scalars
+
+
+def get_steps_per_sec(points: List[ScalarPoint]) -> float:
+    points = sorted(points, key=lambda x: x[1])
+    if len(points) < 2 or points[-1][1] <= points[0][1]:
+        return 0.0
+    return (points[-1][0] - points[0][0]) / (points[-1][1] - points[0][1])
+
+
+def get_seconds_per_epoch(scalars: Dict[str, List[ScalarPoint]]) -> float:
+    """the median interval of the tag written once per epoch, prefer the tag named epoch
+    """
+    tags = [
+        tag for tag in scalars if re.search(EPOCH_TAG_PATTERN, tag, re.IGNORECASE)
+        and not re.search(ITERATION_TAG_PATTERN, tag, re.IGNORECASE) and len(scalars[tag]) >= 2
+    ]
+    if not tags:
+        return 0.0
+    tag = sorted(tags, key=lambda t: (not re.search(r'epoch', t, re.IGNORECASE), -len(scalars[t])))[0]
+    wall_times = sorted(p[1] for p in scalars[tag])
+    return statistics.median(b - a for a, b in zip(wall_times[0:-1], wall_times[1:]))
+
+
+def summarize_tensorboard_dir(tensorboard_dir: str, check_crc: bool = True) -> Dict:
+    """check all event files in tensorboard directory, return the errors, the scalar curves and speed
+
+    errors: {event file: error message} for truncated or corrupt files
+    scalars: {tag: dict(num, first, last, min, max)}
+    """
+    event_files = sorted(glob.glob(osp.join(tensorboard_dir, '**', '*tfevents*'), recursive=True))
+    errors: Dict[str, str] = {}
+    scalars: Dict[str, List[ScalarPoint]] = {}
+    for event_file in event_files:
+        if not osp.isfile(event_file):
+            continue
+        try:
+            file_scalars = read_scalars(event_file, check_crc=check_crc)
+        except (ValueError, TypeError, struct.error) as e:
+            errors[osp.relpath(event_file, tensorboard_dir)] = str(e)
+            continue
+        for tag, points in file_scalars.items():
+            scalars.setdefault(tag, []).extend(points)
+
+    summary: Dict = dict(event_files=len(event_files), errors=errors, scalars={})
+    for tag, points in sorted(scalars.items()):
+        values = [p[2] for p in sorted(points, key=lambda x: (x[0], x[1]))]
+        summary['scalars'][tag] = dict(num=len(values),
+                                       first=values[0],
+                                       last=values[-1],
+                                       min=min(values),
+                                       max=max(values))
+
+    if scalars:
+        main_tag = max(scalars, key=lambda t: len(scalars[t]))
+        summary['steps_per_sec'] = round(get_steps_per_sec(scalars[main_tag]), 3)
+        summary['seconds_per_epoch'] = round(get_seconds_per_epoch(scalars), 3)
+    return summary
@@ -0,0 +1,91 @@
+"""record the time of each stage, export as json and chrome trace
+
+view the chrome trace file in chrome://tracing or https://ui.perfetto.dev
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class TimingTrace(object):
+    """thread safe span recorder, the span of parallel tasks are shown in different rows
+    """
+
+    def __init__(self):
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+        self._thread_ids: Dict[str, int] = {}
+
+    def _get_thread_id(self) -> int:
+        """the row id in chrome trace for each thread name
+        """
+        name = threading.current_thread().name
+        if name not in self._thread_ids:
+            self._thread_ids[name] = len(self._thread_ids) + 1
+        return self._thread_ids[name]
+
+    def add_span(self, name: str, start: float, end: float, category: str = 'verifier', **args) -> None:
+        """
+        category: verifier for the verifier overhead, executor for the time in docker container
+        """
+        with self._lock:
+            self.spans.append(
+                dict(name=name,
+                     category=category,
+                     start=start,
+                     duration=end - start,
+                     tid=self._get_thread_id(),
+                     args=args))
+
+    @contextmanager
+    def span(self, name: str, category: str = 'verifier', **args) -> Iterator[None]:
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.time(), category, **args)
+
+    def get_summary(self) -> Dict:
+        """the total seconds for each span name and each category, eg: verifier overhead and executor time
+        """
+        names: Dict[str, float] = {}
+        categories: Dict[str, float] = {}
+        # the end time of current top level span in each thread, the nested spans are not count for categories
+        top_level_end: Dict[int, float] = {}
+        for span in sorted(self.spans, key=lambda x: (x['start'], -x['duration'])):
+            names[span['name']] = names.get(span['name'], 0) + span['duration']
+
+            end = span['start'] + span['duration']
+            if span['start'] >= top_level_end.get(span['tid'], 0):
+                categories[span['category']] = categories.get(span['category'], 0) + span['duration']
+                top_level_end[span['tid']] = end
+
+        return dict(names={k: round(v, 3) for k, v in names.items()},
+                    categories={k: round(v, 3) for k, v in categories.items()})
+
+    def save_json(self, json_file: str) -> None:
+        with open(json_file, 'w') as fw:
+            json.dump(dict(spans=self.spans, summary=self.get_summary()), fw, indent=2)
+
+    def save_chrome_trace(self, trace_file: str) -> None:
+        """chrome trace event format, use complete event (ph=X) with microseconds
+        """
+        events = []
+        for thread_name, tid in self._thread_ids.items():
+            events.append(dict(name='thread_name', ph='M', pid=1, tid=tid, args=dict(name=thread_name)))
+
+        for span in self.spans:
+            events.append(
+                dict(name=span['name'],
+                     cat=span['category'],
+                     ph='X',
+                     ts=round(span['start'] * 1e6),
+                     dur=round(span['duration'] * 1e6),
+                     pid=1,
+                     tid=span['tid'],
+                     args=span['args']))
+
+        with open(trace_file, 'w') as fw:
+            json.dump(dict(traceEvents=events, displayTimeUnit='ms'), fw)
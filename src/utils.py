@@ -1,8 +1,9 @@
 import os
+import struct
 import subprocess
 import warnings
 from pprint import pprint
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 
 def print_error(result: Dict):
@@ -16,40 +17,56 @@ def print_error(result: Dict):
         print('nice, no error found')
 
 
-def append_binds(cmd: List[str], bind_path: str) -> None:
+def get_task_list(tasks: str) -> List[str]:
+    """convert the abbreviation of tasks to task list, eg: tmi --> ['training', 'mining', 'infer']
+    """
+    if tasks in ['t', 'training']:
+        return ['training']
+    elif tasks in ['m', 'mining']:
+        return ['mining']
+    elif tasks in ['i', 'infer']:
+        return ['infer']
+    elif tasks in ['tmi']:
+        return ['training', 'mining', 'infer']
+    elif tasks in ['mi']:
+        return ['mining', 'infer']
+    elif tasks in ['ttmi']:
+        return ['training', 'training', 'mining', 'infer']
+    else:
+        raise Exception(f'unknown task {tasks}')
+
+
+def get_cache_root() -> str:
+    """the root directory for host side cache, overwrite by environment variable YMIR_VERIFIER_CACHE_DIR
+    """
+    default_cache_root = os.path.join(os.path.expanduser('~'), '.cache', 'ymir-verifier')
+    return os.environ.get('YMIR_VERIFIER_CACHE_DIR', default_cache_root)
+
+
+def add_extra_binds(cfg: Dict, bind_dirs: List[str]) -> None:
+    """append the directories to cfg.extra_binds, which are bind in docker container read-only
+    """
+    cfg['extra_binds'] = (cfg.get('extra_binds', None) or []) + list(bind_dirs)
+
+
+def append_binds(cmd: List[str], bind_path: str, mode: str = '') -> None:
+    """bind the actual path of bind_path to the same path in docker container
+    mode: optional, ro for read-only bind, rw for read-write bind
+    """
     if os.path.exists(bind_path):
         if os.path.islink(bind_path):
             actual_bind_path = os.path.abspath(os.readlink(bind_path))
         else:
             actual_bind_path = os.path.abspath(bind_path)
 
-        cmd.append(f"-v{actual_bind_path}:{actual_bind_path}")
+        if mode:
+            cmd.append(f"-v{actual_bind_path}:{actual_bind_path}:{mode}")
+        else:
+            cmd.append(f"-v{actual_bind_path}:{actual_bind_path}")
     else:
         warnings.warn(f'bind path {bind_path} not exist')
 
 
-def run_docker_cmd(docker_image_name: str, command: List[str]) -> str:
-    """simple run the docker command without mount volumes
-
-    Parameters
-    ----------
-    docker_image_name : str
-        eg: youdaoyzbx/ymir-executor:ymir2.1.0-mmyolo-cu113-tmi
-    command : List[str]
-        eg: cat /img-man/training-template.yaml
-
-    Returns
-    -------
-    str
-        eg: the training template config
-    """
-    cmd = 'docker run --rm'.split()
-    cmd.append(docker_image_name)
-    cmd += command
-
-    return run_cmd(cmd, need_output=True)
-
-
 def run_cmd(command: List[str], need_output: bool = False) -> str:
     cmd = ' '.join(command)
     print(f'run cmd: {cmd}')
@@ -61,3 +78,30 @@ def run_cmd(command: List[str], need_output: bool = False) -> str:
         # run it with 60s timeout, fetch the output
         result = subprocess.check_output(command, timeout=60)
         return result.decode('utf-8')
+
+
+def get_image_size(image_file: str) -> Optional[Tuple[int, int]]:
+    """read (height, width) from png, jpeg or bmp header, return None for unknown format
+    """
+    with open(image_file, 'rb') as fp:
+        head = fp.read(26)
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            width, height = struct.unpack('>II', head[16:24])
+            return height, width
+        elif head.startswith(b'BM'):
+            width, height = struct.unpack('<ii', head[18:26])
+            return abs(height), width
+        elif head.startswith(b'\xff\xd8'):
+            fp.seek(2)
+            while True:
+                marker = fp.read(2)
+                if len(marker) < 2 or marker[0] != 0xff:
+                    return None
+                # SOF0 - SOF15, except DHT, JPG and DAC
+                if 0xc0 <= marker[1] <= 0xcf and marker[1] not in (0xc4, 0xc8, 0xcc):
+                    fp.read(3)
+                    height, width = struct.unpack('>HH', fp.read(4))
+                    return height, width
+                length = struct.unpack('>H', fp.read(2))[0]
+                fp.seek(length - 2, 1)
+    return None
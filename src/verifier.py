@@ -1,21 +1,29 @@
 import copy
-import glob
 import logging
 import os
 import os.path as osp
-import shutil
+import re
+import subprocess
 import time
 import unittest
+import uuid
 import warnings
 from pathlib import Path
 from pprint import pprint
-from typing import List
+from typing import Dict, List
 
-import docker
 import yaml
 from easydict import EasyDict as edict
 
-from .utils import append_binds, run_cmd, run_docker_cmd
+from .config import SUPPORTED_TASKS, get_default_env_config, get_pretrain_files, resolve_config
+from .container import DEFAULT_LOG_MILESTONES, LogCapture
+from .monitor import MonitorFollower
+from .result_cache import ResultCache, get_config_digest, get_dataset_fingerprint, get_weights_digest
+from .runtime import get_runtime
+from .telemetry import ResourceSampler
+from .timing import TimingTrace
+from .utils import append_binds
+from .workspace import CopyStats, materialize_file
 
 
 def todict(cfg):
@@ -41,65 +49,36 @@ class Verifier(unittest.TestCase):
         super().__init__()
         warnings.simplefilter('ignore', ResourceWarning)
 
-        self.supported_tasks = ['training', 'mining', 'infer']
+        self.supported_tasks = SUPPORTED_TASKS
         self.supported_algorithms = ['detection', 'segmentation', 'classification']
-        # docker image config
-        self.cfg = copy.deepcopy(cfg)
+        # docker image config, the resolved config is shared without copy, see src/config.py
+        self.cfg = resolve_config(cfg)
         self.task_id = self.cfg.get('task_id', str(round(time.time())))
         self.gpu_id = self.cfg.get('gpu_id', '0')
         self.class_names = self.cfg.class_names
 
         in_dir = self.cfg.in_dir
         out_dir = self.cfg.out_dir
-        if self.cfg.get('data_dir', None):
-            os.makedirs(self.cfg.in_dir, exist_ok=True)
-            os.makedirs(self.cfg.out_dir, exist_ok=True)
-        else:
+        # the in_dir and out_dir will be created in create_workspace() if data_dir offered
+        if not self.cfg.get('data_dir', None):
             assert osp.isdir(in_dir)
             assert out_dir
             os.makedirs(out_dir, exist_ok=True)
         self.host_in_dir = os.path.abspath(in_dir)
         self.host_out_dir = os.path.abspath(out_dir)
 
-        self.pretrain_files = []
+        # generate docker image absolute path for pretrained weight files
+        # note pretrain_weights_dir will mount to docker container
         self.pretrain_weights_dir = osp.abspath(self.cfg.get('pretrain_weights_dir', './pretrain_weights_dir'))
-
-        if osp.isdir(self.pretrain_weights_dir):
-            # generate docker image absolute path for pretrained weight files
-            # note pretrain_weights_dir will mount to docker container
-            copy_files = glob.glob(osp.join(self.pretrain_weights_dir, '*'), recursive=False)
-            for f in copy_files:
-                if osp.isfile(f):
-                    self.pretrain_files.append(osp.join('/in/models', osp.relpath(f, start=self.pretrain_weights_dir)))
+        self.pretrain_files = get_pretrain_files(self.pretrain_weights_dir)
 
         # ymir env config, affect /in/env.yaml
-        if self.cfg.get('env_config'):
-            # support for all-in-one.yaml
-            self.env_config = todict(cfg.env_config)
-        else:
-            self.env_config_file = self.cfg.get('env_config_file', './env.yaml')
-            if osp.exists(self.env_config_file):
-                with open(self.env_config_file, 'r') as fp:
-                    self.env_config = yaml.safe_load(fp)
-            else:
-                self.env_config = self.get_default_env()
-
+        self.env_config = todict(self.cfg.env_config)
         self.docker_in_dir = self.cfg.env_config.input.root_dir  # '/in'
         self.docker_out_dir = self.cfg.env_config.output.root_dir  # '/out'
 
         # hyper-parameter config, affect /in/config.yaml
-        if self.cfg.get('param_config'):
-            # support for all-in-one.yaml
-            self.param_config = todict(self.cfg.param_config)
-        else:
-            self.param_config = {}
-            test_config_file = self.cfg.get('param_config_file', './test-config.yaml')
-            if osp.exists(test_config_file):
-                with open(test_config_file, 'r') as fp:
-                    self.param_config = yaml.safe_load(fp)
-            else:
-                for task in self.supported_tasks:
-                    self.param_config[task] = dict()
+        self.param_config = todict(self.cfg.param_config)
 
         # set pretrain_files to /in/config.yaml
         # note this will overwrite custom value
@@ -114,8 +93,18 @@ class Verifier(unittest.TestCase):
                         warnings.warn(f'overwrite test config {task} model_params_path')
                     self.param_config[task]['model_params_path'] = self.pretrain_files
 
+        # record the time of each stage, PipeLine will replace it with the pipeline trace
+        self.trace = TimingTrace()
+
+        # reuse the output of previous successful task if nothing changed, see src/result_cache.py
+        self.result_cache = ResultCache() if self.cfg.get('result_cache', False) else None
+        self.result_cache_key = ''
+        self.result_cache_components: Dict[str, str] = {}
+
         # docker client
         self.docker_image = self.cfg.get('docker_image', 'youdaoyzbx/ymir-executor:ymir2.1.0-mmyolo-cu113-tmi')
+        # run the container with docker sdk, docker cli or the fake executor, see src/runtime.py
+        self.runtime = get_runtime(self.cfg)
 
     def get_host_path(self, docker_file_path: str):
         """
@@ -142,60 +131,13 @@ class Verifier(unittest.TestCase):
             return osp.isdir(host_path), host_path
 
     def verify_exist(self, docker_image_name: str) -> None:
-        client = docker.from_env()
-        client.images.get(docker_image_name)
+        self.assertTrue(self.runtime.image_exists(docker_image_name),
+                        msg=f'docker image {docker_image_name} not found by {self.runtime.name} runtime')
 
     def get_default_env(self) -> dict:
+        """the default ymir env config, see src/config.py
         """
-        input:
-            annotations_dir: /in/annotations
-            assets_dir: /in/assets
-            candidate_index_file: /in/candidate-index.tsv
-            config_file: /in/config.yaml
-            models_dir: /in/models
-            root_dir: /in
-            training_index_file: /in/train-index.tsv
-            val_index_file: /in/val-index.tsv
-        output:
-            infer_result_file: /out/infer-result.json
-            mining_result_file: /out/result.tsv
-            models_dir: /out/models
-            monitor_file: /out/monitor.txt
-            root_dir: /out
-            tensorboard_dir: /out/tensorboard
-            training_result_file: /out/models/result.yaml
-        run_infer: false
-        run_mining: false
-        run_training: true
-        task_id: t00000020000029d077c1662111056
-        """
-        env = edict()
-        env.input = edict()
-        env.output = edict()
-
-        env.input.annotations_dir = '/in/annotations'
-        env.input.assets_dir = '/in/assets'
-        env.input.candidate_index_file = '/in/candidate-index.tsv'
-        env.input.config_file = '/in/config.yaml'
-        env.input.models_dir = 'in/models'
-        env.input.root_dir = '/in'
-        env.input.training_index_file = '/in/train-index.tsv'
-        env.input.val_index_file = '/in/val-index.tsv'
-
-        env.output.infer_result_file = '/out/infer-result.json'
-        env.output.mining_result_file = '/out/result.tsv'
-        env.output.models_dir = '/out/models'
-        env.output.monitor_file = '/out/monitor.txt'
-        env.output.root_dir = '/out'
-        env.output.tensorboard_dir = '/out/tensorboard'
-        env.output.training_result_file = '/out/models/result.yaml'
-
-        env.run_infer = False
-        env.run_mining = False
-        env.run_training = True
-        env.task_id = 't00000020000029d077c1662111056'
-
-        return todict(env)
+        return get_default_env_config()
 
     def create_workspace(self, task: str, pretrain_weights_dir: str = '') -> List[str]:
         """create a worksapce for docker
@@ -233,61 +175,97 @@ class Verifier(unittest.TestCase):
         self.data_dir = self.cfg.get('data_dir', None)
         self.work_dir = self.cfg.get('work_dir', None)
 
-        volumes = [f'-v{osp.abspath(self.cfg.in_dir)}:/in:ro', f'-v{osp.abspath(self.cfg.out_dir)}:/out:rw']
-
-        if self.data_dir is not None:
-            basename_assets_dir = osp.relpath(self.cfg.env_config.input.assets_dir, start=self.docker_in_dir)
-            basename_anntations_dir = osp.relpath(self.cfg.env_config.input.annotations_dir, start=self.docker_in_dir)
-            for subdir in [basename_assets_dir, basename_anntations_dir]:
-                src_dir = osp.join(osp.abspath(self.data_dir), subdir)
-                des_dir = osp.join(osp.abspath(self.cfg.in_dir), subdir)
-                if osp.exists(des_dir):
-                    warnings.warn(f'{des_dir} already exist, not needs to create soft link')
-                else:
-                    os.symlink(src_dir, des_dir)
-                append_binds(volumes, src_dir)
+        os.makedirs(self.cfg.in_dir, exist_ok=True)
+        os.makedirs(self.cfg.out_dir, exist_ok=True)
+        self.copy_stats = CopyStats()
+        volumes = self.get_volumes(pretrain_weights_dir)
+
+        with self.trace.span('symlink_dataset', task=task):
+            if self.data_dir is not None:
+                for subdir in self.get_dataset_subdirs():
+                    src_dir = osp.join(osp.abspath(self.data_dir), subdir)
+                    des_dir = osp.join(osp.abspath(self.cfg.in_dir), subdir)
+                    if osp.exists(des_dir):
+                        warnings.warn(f'{des_dir} already exist, not needs to create soft link')
+                    else:
+                        os.symlink(src_dir, des_dir)
 
         self.cfg.pretrain_weights_dir = pretrain_weights_dir
         if task in ['mining', 'infer']:
             assert osp.isdir(pretrain_weights_dir)
 
-        if pretrain_weights_dir and osp.isdir(pretrain_weights_dir):
-            basename_models_dir = osp.relpath(self.cfg.env_config.input.models_dir, start=self.docker_in_dir)
+        with self.trace.span('symlink_weights', task=task):
+            if pretrain_weights_dir and osp.isdir(pretrain_weights_dir):
+                basename_models_dir = osp.relpath(self.cfg.env_config.input.models_dir, start=self.docker_in_dir)
 
-            src_dir = osp.abspath(pretrain_weights_dir)
-            des_dir = osp.join(osp.abspath(self.cfg.in_dir), basename_models_dir)
-            if osp.exists(des_dir):
-                warnings.warn(f'{des_dir} already exist, not needs to create soft link')
-            else:
-                os.symlink(src_dir, des_dir)
-            append_binds(volumes, src_dir)
+                src_dir = osp.abspath(pretrain_weights_dir)
+                des_dir = osp.join(osp.abspath(self.cfg.in_dir), basename_models_dir)
+                if osp.exists(des_dir):
+                    warnings.warn(f'{des_dir} already exist, not needs to create soft link')
+                else:
+                    os.symlink(src_dir, des_dir)
 
         # generate config.yaml and env.yaml
         in_config_file = osp.join(self.cfg.in_dir, 'config.yaml')
         env_config_file = osp.join(self.cfg.in_dir, 'env.yaml')
-        self.generate_hyperparameter_yaml(task, in_config_file)
-        self.generate_env_yaml(task, env_config_file)
+        with self.trace.span('generate_config', task=task):
+            self.generate_hyperparameter_yaml(task, in_config_file)
+            self.generate_env_yaml(task, env_config_file)
 
         # copy train-index.tsv, val-index.tsv, candidate-index.tsv
-        if self.data_dir is not None:
-            if task in ['training']:
-                train_index_file = self.cfg.env_config.input.training_index_file
-                val_index_file = self.cfg.env_config.input.val_index_file
-
-                host_train_index_file = train_index_file.replace(self.docker_in_dir, self.data_dir)
-                host_val_index_file = val_index_file.replace(self.docker_in_dir, self.data_dir)
-                shutil.copy(host_train_index_file, self.cfg.in_dir)
-                shutil.copy(host_val_index_file, self.cfg.in_dir)
-            else:
-                candidate_index_file = self.cfg.env_config.input.candidate_index_file
-                host_candidate_index_file = candidate_index_file.replace(self.docker_in_dir, self.data_dir)
-                shutil.copy(host_candidate_index_file, self.cfg.in_dir)
+        with self.trace.span('copy_index', task=task):
+            if self.data_dir is not None:
+                if task in ['training']:
+                    train_index_file = self.cfg.env_config.input.training_index_file
+                    val_index_file = self.cfg.env_config.input.val_index_file
+
+                    host_train_index_file = train_index_file.replace(self.docker_in_dir, self.data_dir)
+                    host_val_index_file = val_index_file.replace(self.docker_in_dir, self.data_dir)
+                    index_files = [host_train_index_file, host_val_index_file]
+                else:
+                    candidate_index_file = self.cfg.env_config.input.candidate_index_file
+                    host_candidate_index_file = candidate_index_file.replace(self.docker_in_dir, self.data_dir)
+                    index_files = [host_candidate_index_file]
+
+                # hardlink or reflink the index files if possible, copy as fallback
+                for index_file in index_files:
+                    materialize_file(index_file, osp.join(self.cfg.in_dir, osp.basename(index_file)),
+                                     self.copy_stats)
         return volumes
 
-    def generate_hyperparameter_yaml(self, task: str, in_config_file: str) -> None:
+    def get_dataset_subdirs(self) -> List[str]:
+        """the assets and annotations directory relative to /in
+        """
+        return [
+            osp.relpath(self.cfg.env_config.input.assets_dir, start=self.docker_in_dir),
+            osp.relpath(self.cfg.env_config.input.annotations_dir, start=self.docker_in_dir)
+        ]
+
+    def get_volumes(self, pretrain_weights_dir: str = '') -> List[str]:
+        """the bind volumes for /in, /out, the dataset, extra binds and pretrain weights, eg: -v/host:/in:ro
+        the symlinks in /in point to the dataset and pretrain weights, bind them to the same path in container
+        """
+        volumes = [f'-v{osp.abspath(self.cfg.in_dir)}:/in:ro', f'-v{osp.abspath(self.cfg.out_dir)}:/out:rw']
+        data_dir = self.cfg.get('data_dir', None)
+        if data_dir is not None:
+            for subdir in self.get_dataset_subdirs():
+                append_binds(volumes, osp.join(osp.abspath(data_dir), subdir), mode='ro')
+
+        # eg: the original dataset for the symlinks in smoke dataset
+        for bind_dir in self.cfg.get('extra_binds', None) or []:
+            append_binds(volumes, bind_dir, mode='ro')
+
+        if pretrain_weights_dir and osp.isdir(pretrain_weights_dir):
+            append_binds(volumes, osp.abspath(pretrain_weights_dir), mode='ro')
+        return volumes
+
+    def get_hyperparameter_config(self, task: str) -> dict:
+        """merge the template config in docker image, the task config and user define config
+        """
         assert task in ['training', 'infer', 'mining'], f'task is {task}'
 
-        output = run_docker_cmd(self.docker_image, f'cat /img-man/{task}-template.yaml'.split())
+        with self.trace.span('template_fetch', task=task):
+            output = self.runtime.read_img_man_file(self.docker_image, f'/img-man/{task}-template.yaml')
 
         template_config = yaml.safe_load(output)
 
@@ -333,11 +311,17 @@ class Verifier(unittest.TestCase):
             in_config.update(self.param_config[task])
             logging.info(f'modify training template config with {self.param_config[task]}')
 
+        return in_config
+
+    def generate_hyperparameter_yaml(self, task: str, in_config_file: str) -> None:
+        in_config = self.get_hyperparameter_config(task)
         with open(in_config_file, 'w') as fp:
             yaml.dump(in_config, fp)
 
-    def generate_env_yaml(self, task: str, env_config_file: str) -> None:
-        env_config = self.env_config.copy()
+    def get_env_config(self, task: str) -> dict:
+        """the content of /in/env.yaml for task
+        """
+        env_config = copy.deepcopy(self.env_config)
         task_id = self.task_id
 
         if task == 'training':
@@ -355,6 +339,10 @@ class Verifier(unittest.TestCase):
             raise Exception(f'unknown task {task}')
 
         env_config.update(task_config)
+        return env_config
+
+    def generate_env_yaml(self, task: str, env_config_file: str) -> None:
+        env_config = self.get_env_config(task)
         with open(env_config_file, 'w') as fw:
             yaml.dump(env_config, fw)
 
@@ -363,14 +351,111 @@ class Verifier(unittest.TestCase):
         pprint(self.cfg)
 
         # create workspace in self.cfg.in_dir
-        volumes = self.create_workspace(task, pretrain_weights_dir)
-
-        cmd = 'docker run --rm'.split()
-        cmd += volumes
-        if self.gpu_id:
-            cmd.extend(['--gpus', f"\"device={self.gpu_id}\""])
+        with self.trace.span('create_workspace', task=task):
+            volumes = self.create_workspace(task, pretrain_weights_dir)
+        print(f'{task} workspace created, {self.copy_stats.copied_bytes} bytes copied: {self.copy_stats.to_dict()}')
+
+        if self.result_cache is not None:
+            with self.trace.span('result_cache_restore', task=task):
+                self.result_cache_components = self.get_result_cache_components(task)
+                self.result_cache_key = self.result_cache.get_key(self.result_cache_components)
+                cached_result = self.result_cache.restore(self.result_cache_key, self.host_out_dir)
+
+            if cached_result is not None:
+                print(f'{task} task result cache hit {self.result_cache_key}, skip the docker container')
+                self.task_result = dict(cached_result, cache_hit=True)
+                return self.task_result
+
+        container_name = self.get_container_name(task)
+
+        # save the logs and timing events in task workspace, eg: <work_dir>/<task_id>/<task>/<task>.log
+        task_dir = osp.dirname(self.host_out_dir)
+        log_file = osp.join(task_dir, f'{task}.log')
+        events_file = osp.join(task_dir, f'{task}-events.json')
+        milestones = dict(DEFAULT_LOG_MILESTONES, **self.cfg.get('log_milestones', {}))
+        log_capture = LogCapture(log_file, milestones=milestones, prefix=f'[{task}] ')
+        resource_file = osp.join(task_dir, f'{task}-resources.json')
+        resource_interval = self.cfg.get('resource_interval', 2)
+        resource_sampler = ResourceSampler(resource_interval) if resource_interval > 0 else None
+
+        # follow the monitor file in host while the container is running
+        monitor_file = self.get_host_path(self.env_config['output']['monitor_file'])
+        follower = MonitorFollower(monitor_file,
+                                   container_name,
+                                   interval=self.cfg.get('monitor_interval', 10),
+                                   stall_timeout=self.cfg.get('monitor_stall_timeout', 0),
+                                   first_write_timeout=self.cfg.get('monitor_first_write_timeout', 0),
+                                   kill=self.runtime.kill)
+        follower.start()
+        try:
+            self.runtime.run(self.docker_image,
+                             command=['bash', '/usr/bin/start.sh'],
+                             volumes=[v[2:] for v in volumes],
+                             gpu_id=self.gpu_id,
+                             name=container_name,
+                             log_capture=log_capture,
+                             resource_sampler=resource_sampler)
+        except subprocess.CalledProcessError:
+            if follower.stalled:
+                raise Exception(f'{task} task {self.task_id} killed, {follower.stall_reason}')
+            raise
+        finally:
+            follower.stop()
+            if follower.first_write_time is not None:
+                log_capture.add_event('first_monitor', follower.first_write_time)
+            log_capture.save_events(events_file)
+            if resource_sampler is not None:
+                resource_sampler.save(resource_file)
+
+        events = log_capture.events
+        self.trace.add_span('container_start', events['container_create'], events['container_start'], task=task)
+        self.trace.add_span('container_run',
+                            events['container_start'],
+                            events['container_exit'],
+                            category='executor',
+                            task=task)
+
+        self.task_result = dict(task=task,
+                                log_file=log_file,
+                                events=log_capture.get_durations(),
+                                workspace=self.copy_stats.to_dict())
+        print(f'{task} task timing events: {self.task_result["events"]["seconds"]}')
+        if resource_sampler is not None:
+            self.task_result['resources'] = resource_sampler.get_summary()
+            print(f'{task} task resource usage: {self.task_result["resources"]}')
+        return self.task_result
+
+    def get_result_cache_components(self, task: str) -> Dict[str, str]:
+        """the components of result cache key, call after create_workspace()
+        """
+        if task == 'training':
+            docker_index_files = [
+                self.env_config['input']['training_index_file'], self.env_config['input']['val_index_file']
+            ]
+        else:
+            docker_index_files = [self.env_config['input']['candidate_index_file']]
+        index_files = [self.get_host_path(f) for f in docker_index_files]
+        models_dir = self.get_host_path(self.env_config['input']['models_dir'])
+
+        return dict(task=task,
+                    image_id=self.runtime.get_image_id(self.docker_image),
+                    config=get_config_digest(osp.join(self.host_in_dir, 'config.yaml')),
+                    env=get_config_digest(osp.join(self.host_in_dir, 'env.yaml')),
+                    dataset=get_dataset_fingerprint(index_files, self.docker_in_dir, self.host_in_dir),
+                    weights=get_weights_digest(models_dir))
+
+    def save_result_cache(self, task_result: Dict) -> None:
+        """save the output after verify_*_output passed
+        """
+        if self.result_cache is None or task_result.get('cache_hit', False):
+            return
 
-        cmd.extend(['--ipc', 'host', self.docker_image])
-        cmd.extend(['bash', '/usr/bin/start.sh'])
+        with self.trace.span('result_cache_save', task=task_result['task']):
+            self.result_cache.save(self.result_cache_key, self.host_out_dir, self.result_cache_components,
+                                   task_result)
 
-        run_cmd(cmd)
+    def get_container_name(self, task: str) -> str:
+        """the unique container name for task, use to kill or inspect the running container
+        """
+        task_id = re.sub('[^a-zA-Z0-9_.-]', '-', str(self.task_id))
+        return f'ymir-verifier-{task_id}-{task}-{uuid.uuid4().hex[0:6]}'
@@ -1,13 +1,24 @@
 import glob
-import json
+import math
 import os.path as osp
 import warnings
-from typing import List
+from array import array
+from typing import Dict, List
 
 import yaml
 from easydict import EasyDict as edict
 
+from .streaming import HashIndex, get_score_distribution, iter_json_items
+from .tfevents import summarize_tensorboard_dir
 from .verifier import Verifier
+from .weights_audit import audit_weights_dir
+
+
+def get_image_key(image_path: str) -> str:
+    """the key to match the image in candidate index file and task result, the basename of image
+    the executor may write the image path in other form, eg: relative path or different prefix
+    """
+    return osp.basename(image_path.strip().split('\t')[0])
 
 
 class VerifierDetection(Verifier):
@@ -24,19 +35,26 @@ class VerifierDetection(Verifier):
         for task in tasks:
             self.verify_task(docker_image_name, task)
 
-    def verify_task(self, docker_image_name: str, task: str) -> None:
+    def verify_task(self, docker_image_name: str, task: str) -> dict:
         self.docker_image = docker_image_name
-        self.run_task(task, self.pretrain_weights_dir)
+        task_result = self.run_task(task, self.pretrain_weights_dir)
 
         # if task finished without error, check the output
+        with self.trace.span(f'verify_{task}_output', task=task):
+            if task == 'training':
+                self.verify_training_output()
+            elif task == 'infer':
+                self.verify_infer_output()
+            elif task == 'mining':
+                self.verify_mining_output()
+            else:
+                raise Exception(f'unknown task {task}')
+
         if task == 'training':
-            self.verify_training_output()
-        elif task == 'infer':
-            self.verify_infer_output()
-        elif task == 'mining':
-            self.verify_mining_output()
-        else:
-            raise Exception(f'unknown task {task}')
+            task_result['tensorboard'] = self.tensorboard_summary
+            task_result['weights'] = self.weights_audit
+        self.save_result_cache(task_result)
+        return task_result
 
     def verify_training_output(self) -> None:
         """
@@ -66,6 +84,8 @@ class VerifierDetection(Verifier):
                            0,
                            msg=f'no file found for {docker_model_out_dir} in docker, {model_out_dir} in host')
 
+        self.verify_weights_files(model_out_dir, task_result_file)
+
         if len(weight_files) > 0:
             recommand_weight_suffix = ('.pt', '.pth', '.weight', '.param', '.weights', '.params', '.pb')
             recommand_weight_files = [f for f in weight_files if f.endswith(recommand_weight_suffix)]
@@ -85,11 +105,44 @@ class VerifierDetection(Verifier):
         self.assertGreater(len(tensorboard_logs),
                            0,
                            msg=f'no tensorboard logs for {docker_tensorboard_dir} in docker, {tensorboard_dir} in host')
+        self.verify_tensorboard_dir(tensorboard_dir)
 
         # check process monitor file
         docker_monitor_file = ymir_env['output']['monitor_file']
         self.verify_monitor_file(docker_monitor_file=docker_monitor_file)
 
+    def verify_weights_files(self, models_dir: str, training_result_file: str) -> None:
+        """ hash the weight files in parallel, check the zero-byte and truncated files,
+        save the size and sha256 for each stage to self.weights_audit
+        """
+        with open(training_result_file, 'r') as fp:
+            training_result = yaml.safe_load(fp) or {}
+
+        self.weights_audit = audit_weights_dir(models_dir, training_result, self.cfg.get('num_workers', None))
+        errors = self.weights_audit['errors']
+        self.assertEqual(len(errors), 0, msg=f'{len(errors)} invalid weight files in {models_dir}: {errors}')
+        if self.weights_audit['duplicates']:
+            warnings.warn(f'identical weight files in different stages: {self.weights_audit["duplicates"]}')
+
+        stage_sizes = {name: stage['size'] for name, stage in self.weights_audit['stages'].items()}
+        print(f'weights audit: {self.weights_audit["file_num"]} files, {self.weights_audit["total_size"]} bytes, '
+              f'stage sizes: {stage_sizes}')
+
+    def verify_tensorboard_dir(self, tensorboard_dir: str) -> None:
+        """ check the event files are not truncated or corrupt, save the scalar curves and training speed
+        to self.tensorboard_summary
+        """
+        self.tensorboard_summary = summarize_tensorboard_dir(tensorboard_dir,
+                                                             check_crc=self.cfg.get('tensorboard_check_crc', True))
+        errors = self.tensorboard_summary['errors']
+        self.assertEqual(len(errors), 0, msg=f'{len(errors)} corrupt tensorboard event files: {errors}')
+        if not self.tensorboard_summary['scalars']:
+            warnings.warn(f'no scalar found in tensorboard event files of {tensorboard_dir}')
+
+        speed = {key: self.tensorboard_summary[key] for key in ['steps_per_sec', 'seconds_per_epoch']
+                 if key in self.tensorboard_summary}
+        print(f'tensorboard scalars: {list(self.tensorboard_summary["scalars"])}, training speed: {speed}')
+
     def verify_training_result_file(self, training_result_file) -> None:
         """ check the content of training result file
         1. check map
@@ -153,39 +206,65 @@ class VerifierDetection(Verifier):
         valid, task_result_file = self.verify_docker_path(docker_task_result_file, is_file=True)
         self.assertTrue(valid, msg=f'cannot find {docker_task_result_file} in docker, {task_result_file} in host')
 
-        with open(task_result_file, 'r') as f:
-            results = json.loads(f.read())
-
-        max_boxes = 50
-        self.assertIn('detection', results, msg='unexpected infer result format')
-        if 'detection' in results:
-            names_annotations_dict = results['detection']
-
-            docker_candidate_index_file = ymir_env['input']['candidate_index_file']
-            candidate_index_file = self.get_host_path(docker_candidate_index_file)
-
-            with open(candidate_index_file, 'r') as fp:
-                basename_list = [osp.basename(f.strip()) for f in fp.readlines()]
-
-            infer_basename_list = []
-            for basename, annotations_dict in names_annotations_dict.items():
-                infer_basename_list.append(basename)
-                if 'annotations' in annotations_dict and isinstance(annotations_dict['annotations'], list):
-                    annotations_dict['annotations'].sort(key=(lambda x: x['score']), reverse=True)
-                    annotations_dict['annotations'] = annotations_dict['annotations'][:max_boxes]
-
-            n1 = len(basename_list)
-            n2 = len(infer_basename_list)
-            self.assertEqual(n1, n2, msg=f'candidate basename list size {n1} != infer basename list size {n2}')
-
-            self.assertEqual(set(basename_list),
-                             set(infer_basename_list),
-                             msg='candidate basename set != infer basename set')
+        docker_candidate_index_file = ymir_env['input']['candidate_index_file']
+        candidate_index_file = self.get_host_path(docker_candidate_index_file)
+        self.verify_detection_result(task_result_file, candidate_index_file)
 
         # check process monitor file
         docker_monitor_file = ymir_env['output']['monitor_file']
         self.verify_monitor_file(docker_monitor_file=docker_monitor_file)
 
+    def verify_detection_result(self, infer_result_file: str, candidate_index_file: str) -> None:
+        """ check the detection result in infer result file with bounded memory
+        1. parse the detection result image by image, the annotations are dropped after checked
+        2. each annotation has a number score
+        3. check the image basename with the compact hash index of candidate basenames
+        """
+        with open(candidate_index_file, 'r') as fp:
+            candidate_num = sum(1 for _ in fp)
+        with open(candidate_index_file, 'r') as fp:
+            candidate_index = HashIndex(get_image_key(line) for line in fp)
+
+        # the candidate basenames found in infer result
+        visited = bytearray(len(candidate_index))
+        infer_num = 0
+        unknown_num = duplicate_num = 0
+        # the first 10 samples
+        unknown_basenames: List[str] = []
+        duplicate_basenames: List[str] = []
+        with open(infer_result_file, 'r') as fp:
+            try:
+                for basename, annotations_dict in iter_json_items(fp, key='detection'):
+                    infer_num += 1
+                    if isinstance(annotations_dict, dict) and isinstance(annotations_dict.get('annotations'), list):
+                        for box_idx, annotation in enumerate(annotations_dict['annotations']):
+                            score = annotation.get('score', None) if isinstance(annotation, dict) else None
+                            if isinstance(score, bool) or not isinstance(score, (int, float)):
+                                self.fail(f'no number score in annotations[{box_idx}] of image {basename}: '
+                                          f'{annotation}')
+
+                    idx = candidate_index.index(get_image_key(basename))
+                    if idx < 0:
+                        unknown_num += 1
+                        unknown_basenames = (unknown_basenames + [basename])[0:10]
+                    elif visited[idx]:
+                        duplicate_num += 1
+                        duplicate_basenames = (duplicate_basenames + [basename])[0:10]
+                    else:
+                        visited[idx] = 1
+            except ValueError as e:
+                self.fail(f'unexpected infer result format: {e}')
+
+        self.assertEqual(candidate_num,
+                         infer_num,
+                         msg=f'candidate basename list size {candidate_num} != infer basename list size {infer_num}')
+
+        missing_num = visited.count(0)
+        self.assertTrue(
+            unknown_num == 0 and duplicate_num == 0 and missing_num == 0,
+            msg=(f'candidate basename set != infer basename set, {missing_num} missing, '
+                 f'{unknown_num} unknown {unknown_basenames}, {duplicate_num} duplicate {duplicate_basenames}'))
+
     def verify_mining_output(self) -> None:
         """
         1. verify mining output result
@@ -201,22 +280,71 @@ class VerifierDetection(Verifier):
         if not valid:
             return None
 
-        with open(task_result_file, 'r') as fp:
-            lines = fp.readlines()
-
-        mining_image_list = []
-        for line in lines:
-            img_path, score_str = line.strip().split()
-            score = float(score_str)  # noqa
-            mining_image_list.append(img_path)
-
         docker_candidate_index_file = ymir_env['input']['candidate_index_file']
         candidate_index_file = self.get_host_path(docker_candidate_index_file)
+        self.verify_mining_result(task_result_file, candidate_index_file)
 
-        with open(candidate_index_file, 'r') as fp:
-            lines = fp.readlines()
-
-        self.assertEqual(len(lines), len(mining_image_list), msg='mining result image number != candidate image number')
         # check process monitor file
         docker_monitor_file = ymir_env['output']['monitor_file']
         self.verify_monitor_file(docker_monitor_file=docker_monitor_file)
+
+    def verify_mining_result(self, mining_result_file: str, candidate_index_file: str) -> None:
+        """ check the mining result file in one pass with bounded memory
+        1. each line is `image_path score`, the score is finite and in cfg.mining_score_range if offered
+        2. no duplicate or unknown image, no missing candidate image, the image is matched by basename
+        3. save the score distribution to self.mining_score_stats
+        """
+        with open(candidate_index_file, 'r') as fp:
+            candidate_num = sum(1 for _ in fp)
+        with open(candidate_index_file, 'r') as fp:
+            candidate_index = HashIndex(get_image_key(line) for line in fp)
+
+        # no bounds by default, eg: the log-likelihood score is negative
+        min_score, max_score = self.cfg.get('mining_score_range', None) or [None, None]
+        min_score = -math.inf if min_score is None else float(min_score)
+        max_score = math.inf if max_score is None else float(max_score)
+
+        visited = bytearray(len(candidate_index))
+        scores = array('d')
+        # the error count and the first 10 error samples
+        errors: Dict[str, list] = dict(invalid_line=[0, []], invalid_score=[0, []], unknown=[0, []], duplicate=[0, []])
+
+        def add_error(error_type: str, sample: str) -> None:
+            errors[error_type][0] += 1
+            if len(errors[error_type][1]) < 10:
+                errors[error_type][1].append(sample)
+
+        with open(mining_result_file, 'r') as fp:
+            for line_idx, line in enumerate(fp):
+                items = line.strip().rsplit(maxsplit=1)
+                try:
+                    img_path, score = items[0], float(items[1])
+                except (IndexError, ValueError):
+                    add_error('invalid_line', f'line {line_idx + 1}: {line.strip()}')
+                    continue
+
+                if not (math.isfinite(score) and min_score <= score <= max_score):
+                    add_error('invalid_score', f'{img_path} {score}')
+                scores.append(score)
+
+                idx = candidate_index.index(get_image_key(img_path))
+                if idx < 0:
+                    add_error('unknown', img_path)
+                elif visited[idx]:
+                    add_error('duplicate', img_path)
+                else:
+                    visited[idx] = 1
+
+        count, samples = errors['invalid_line']
+        self.assertEqual(count, 0, msg=f'{count} invalid lines in {mining_result_file}: {samples}')
+        count, samples = errors['invalid_score']
+        self.assertEqual(count, 0, msg=f'{count} scores are nan, inf or not in [{min_score}, {max_score}]: {samples}')
+        count, samples = errors['unknown']
+        self.assertEqual(count, 0, msg=f'{count} unknown image path in mining result: {samples}')
+        count, samples = errors['duplicate']
+        self.assertEqual(count, 0, msg=f'{count} duplicate image path in mining result: {samples}')
+        self.assertEqual(candidate_num, len(scores), msg='mining result image number != candidate image number')
+        self.assertEqual(visited.count(0), 0, msg=f'{visited.count(0)} candidate images not in mining result')
+
+        self.mining_score_stats = get_score_distribution(scores)
+        print(f'mining score distribution: {self.mining_score_stats}')
@@ -1,10 +1,14 @@
 import json
+import multiprocessing
+import os
 import os.path as osp
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 import yaml
 from easydict import EasyDict as edict
 
+from .rle import check_image_size_chunk, check_segmentation_chunk
 from .verifier_detection import VerifierDetection
 
 
@@ -13,19 +17,17 @@ class VerifierSegmentation(VerifierDetection):
     def __init__(self, cfg: edict):
         super().__init__(cfg)
         self.supported_algorithms = ['segmentation']
+        # object_type in /img-man/manifest.yaml, 3 for semantic segmentation, 4 for instance segmentation
+        self.object_type = self.cfg.get('object_type', 3)
 
     def verify_training_result_file(self, training_result_file) -> None:
         with open(training_result_file, 'r') as fp:
             result = yaml.safe_load(fp)
 
-        if self.object_type == 2:
-            metric = 'mAP'
-        elif self.object_type == 3:
-            metric = 'mIoU'
-        elif self.object_type == 4:
-            metric = 'maskAP'
-        else:
+        metrics = {2: 'mAP', 3: 'mIoU', 4: 'maskAP'}
+        if self.object_type not in metrics:
             raise Exception(f'unknown object type {self.object_type}')
+        metric = metrics[self.object_type]
 
         if metric in result:
             self.assertTrue(
@@ -69,8 +71,6 @@ class VerifierSegmentation(VerifierDetection):
     def verify_infer_output(self) -> None:
         if self.object_type == 2:
             return super().verify_infer_output()
-        elif self.object_type == 3:
-            pass
 
         ymir_env = self.env_config
 
@@ -79,14 +79,67 @@ class VerifierSegmentation(VerifierDetection):
         valid, task_result_file = self.verify_docker_path(docker_task_result_file, is_file=True)
         self.assertTrue(valid, msg=f'cannot find {docker_task_result_file} in docker, {task_result_file} in host')
 
-        with open(task_result_file, 'r') as f:
-            results = json.loads(f.read())
-
-        for ann in results['annotations']:
-            self.assertTrue('segmentation' in ann)
-            self.assertTrue('size' in ann['segmentation'])
-            self.assertTrue('counts' in ann['segmentation'])
+        docker_candidate_index_file = ymir_env['input']['candidate_index_file']
+        candidate_index_file = self.get_host_path(docker_candidate_index_file)
+        self.verify_segmentation_result(task_result_file, candidate_index_file)
 
         # check process monitor file
         docker_monitor_file = ymir_env['output']['monitor_file']
         self.verify_monitor_file(docker_monitor_file=docker_monitor_file)
+
+    def verify_segmentation_result(self, infer_result_file: str, candidate_index_file: str) -> None:
+        """ check the coco format segmentation result
+        1. the image in images refer to candidate image, and the size match the real image size
+        2. the image_id in annotations refer to images
+        3. decode the rle counts and check the sum of run length is height x width of image
+        the rle decode and image size check run in process pool, the workers are spawned not forked,
+        the pipeline run this check in its worker threads, which may hold locks at fork time
+        """
+        with open(infer_result_file, 'r') as f:
+            results = json.load(f)
+
+        self.assertIn('annotations', results, msg='unexpected infer result format, no annotations')
+
+        with open(candidate_index_file, 'r') as fp:
+            candidate_files = {}
+            for line in fp:
+                if line.strip():
+                    docker_image_file = line.strip().split()[0]
+                    candidate_files[osp.basename(docker_image_file)] = self.get_host_path(docker_image_file)
+
+        image_sizes: Dict[int, Optional[Tuple[int, int]]] = {}
+        image_size_items = []
+        for image in results.get('images', []):
+            basename = osp.basename(image['file_name'])
+            self.assertIn(basename, candidate_files, msg=f'image {image["file_name"]} not in candidate set')
+            if 'height' in image and 'width' in image:
+                image_sizes[image['id']] = (image['height'], image['width'])
+                image_size_items.append((candidate_files[basename], image['height'], image['width']))
+            else:
+                image_sizes[image['id']] = None
+
+        segmentation_items = []
+        for idx, ann in enumerate(results['annotations']):
+            self.assertTrue('segmentation' in ann, msg=f'no segmentation in annotations[{idx}]')
+            if image_sizes and 'image_id' in ann:
+                self.assertIn(ann['image_id'], image_sizes, msg=f'unknown image_id {ann["image_id"]}')
+            segmentation_items.append((idx, ann['segmentation'], image_sizes.get(ann.get('image_id'))))
+        del results
+
+        errors = []
+        chunk_size = 1000
+        chunks = [(check_segmentation_chunk, segmentation_items[i:i + chunk_size])
+                  for i in range(0, len(segmentation_items), chunk_size)]
+        chunks += [(check_image_size_chunk, image_size_items[i:i + chunk_size])
+                   for i in range(0, len(image_size_items), chunk_size)]
+        if not chunks:
+            return
+
+        # the spawned worker import the modules again, no more workers than chunks
+        max_workers = min(self.cfg.get('num_workers', None) or os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(fn, items) for fn, items in chunks]
+            for future in futures:
+                errors.extend(future.result())
+
+        self.assertEqual(len(errors), 0, msg=f'{len(errors)} invalid segmentation in infer result: {errors[0:10]}')
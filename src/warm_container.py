@@ -0,0 +1,135 @@
+"""run all tasks of pipeline in one warm container, skip the container create and start for each task
+
+warm_container: false  # optional, start the docker image once and run each task with `docker exec`
+
+the container is started with `sleep infinity`, the workspace root <work_dir>/<task_id>, the dataset,
+pretrain weights and extra binds are mounted at the same path. before each task, /in and /out in the
+container are re-pointed to the task workspace by symlinks, then `bash /usr/bin/start.sh` runs in it.
+
+note:
+- the tasks run one by one, because they share /in and /out in the container
+- the gpu subset of task is set by CUDA_VISIBLE_DEVICES, the container use all gpus of pipeline
+- only the container startup is saved, the executor process still starts for each task, eg: python imports
+- /in is writable in the container
+"""
+import os.path as osp
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .container import LogCapture
+from .runtime import Runtime
+from .telemetry import ResourceSampler
+
+
+class WarmContainer(Runtime):
+    """the runtime use one started container for all tasks, the other methods use the base runtime
+    """
+
+    def __init__(self, runtime: Runtime, docker_image: str, binds: List[str], gpu_id: str, name: str):
+        """binds: the bind volumes for all tasks, eg: ['/host/work_dir/task_id:/host/work_dir/task_id:rw']
+        """
+        self.runtime = runtime
+        self.name = f'{runtime.name}-warm'
+        self.docker_image = docker_image
+        self.binds = binds
+        self.gpu_id = gpu_id
+        self.container_name = name
+        self.container_id = ''
+        # the seconds to start the container, and the seconds from exec create to exec start for each task
+        self.startup_seconds = 0.0
+        self.exec_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def image_exists(self, docker_image: str) -> bool:
+        return self.runtime.image_exists(docker_image)
+
+    def get_image_id(self, docker_image: str) -> str:
+        return self.runtime.get_image_id(docker_image)
+
+    def get_image_size(self, docker_image: str) -> int:
+        return self.runtime.get_image_size(docker_image)
+
+    def read_img_man_file(self, docker_image: str, docker_file_path: str) -> str:
+        return self.runtime.read_img_man_file(docker_image, docker_file_path)
+
+    def start(self) -> None:
+        tic = time.time()
+        self.container_id = self.runtime.start(self.docker_image, self.binds, self.gpu_id, self.container_name)
+        self.startup_seconds = round(time.time() - tic, 3)
+        print(f'warm container {self.container_name} started in {self.startup_seconds}s')
+
+    def stop(self) -> None:
+        if self.container_id:
+            self.runtime.remove(self.container_id)
+            self.container_id = ''
+
+    def is_bound(self, host_path: str) -> bool:
+        for bind in self.binds:
+            bind_path = bind.split(':')[0]
+            if host_path == bind_path or host_path.startswith(bind_path.rstrip('/') + '/'):
+                return True
+        return False
+
+    def get_visible_devices(self, gpu_id: str) -> str:
+        """the index of task gpus in container gpus, eg: '1' for gpu_id='3' in container with gpu_id='2,3'
+        """
+        container_gpus = [d.strip() for d in str(self.gpu_id).split(',') if d.strip()]
+        task_gpus = [d.strip() for d in str(gpu_id).split(',') if d.strip()]
+        for d in task_gpus:
+            if d not in container_gpus:
+                raise Exception(f'gpu {d} is not in warm container gpus {self.gpu_id}')
+        return ','.join(str(container_gpus.index(d)) for d in task_gpus)
+
+    def run(self,
+            docker_image: str,
+            command: List[str],
+            volumes: List[str],
+            gpu_id: str,
+            name: str,
+            log_capture: LogCapture,
+            ipc_mode: str = 'host',
+            resource_sampler: Optional[ResourceSampler] = None) -> Dict:
+        """run the command in warm container, /in and /out in volumes are re-pointed by symlinks
+        """
+        if docker_image != self.docker_image:
+            raise Exception(f'cannot run {docker_image} in warm container of {self.docker_image}')
+
+        links = {}
+        for volume in volumes:
+            host_path, container_path = volume.split(':')[0:2]
+            if container_path in ['/in', '/out']:
+                links[container_path] = osp.abspath(host_path)
+                host_path = osp.abspath(host_path)
+            if not self.is_bound(host_path):
+                raise Exception(f'{host_path} is not mounted in warm container {self.container_name}')
+
+        environment = {}
+        if self.gpu_id:
+            environment['CUDA_VISIBLE_DEVICES'] = self.get_visible_devices(gpu_id)
+
+        with self._lock:
+            durations = self.runtime.exec(self.container_id,
+                                          command=command,
+                                          links=links,
+                                          environment=environment,
+                                          log_capture=log_capture,
+                                          resource_sampler=resource_sampler)
+        self.exec_seconds[name] = round(durations['seconds'].get('container_start', 0.0) -
+                                        durations['seconds'].get('container_create', 0.0), 3)
+        return durations
+
+    def kill(self, name: str) -> None:
+        """kill the whole container, the following tasks fail too
+        """
+        self.runtime.kill(self.container_id)
+
+    def get_report(self) -> Dict:
+        """the startup seconds saved compare with one container for each task
+        """
+        task_num = len(self.exec_seconds)
+        exec_seconds = round(sum(self.exec_seconds.values()), 3)
+        return dict(startup_seconds=self.startup_seconds,
+                    task_num=task_num,
+                    exec_seconds=exec_seconds,
+                    saved_seconds=round(max(task_num - 1, 0) * self.startup_seconds - exec_seconds, 3))
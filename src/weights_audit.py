@@ -0,0 +1,153 @@
+"""audit the weight files produced by training task
+
+the files in /out/models are hashed in thread pool with memory mapped read, see result_cache.get_file_digest().
+the digests are cached in process, so the result cache and the weights handoff check reuse them.
+
+the audit report contains:
+- stages: the files, size and sha256 for each model stage in training result file, '' for `model` list
+- duplicates: the identical files in different stages, eg: best.pt copied to each stage
+- errors: the zero-byte files and truncated checkpoints, the .pt/.pth file in zip format (torch >= 1.6)
+  must end with a valid end of central directory record
+"""
+import os
+import os.path as osp
+import struct
+from typing import Dict, List, Optional
+
+from .result_cache import get_file_digests, set_file_digest
+
+# the zip end of central directory record, and the zip64 end of central directory locator
+ZIP_EOCD_SIGNATURE = b'PK\x05\x06'
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP_EOCD_SIZE = 22
+ZIP_MAX_COMMENT_SIZE = 65535
+ZIP_CHECKPOINT_SUFFIX = ('.pt', '.pth')
+
+
+def check_zip_checkpoint(file_path: str) -> str:
+    """return the error message for truncated zip checkpoint, empty string for valid or non-zip file
+    eg: torch.save() killed by oom or disk full
+    """
+    size = osp.getsize(file_path)
+    with open(file_path, 'rb') as fp:
+        if fp.read(4) != b'PK\x03\x04':
+            # the legacy torch checkpoint (pickle) or other format
+            return ''
+
+        tail_size = min(size, ZIP_EOCD_SIZE + ZIP_MAX_COMMENT_SIZE)
+        fp.seek(size - tail_size)
+        tail = fp.read(tail_size)
+
+    pos = tail.rfind(ZIP_EOCD_SIGNATURE)
+    if pos < 0 or pos + ZIP_EOCD_SIZE > len(tail):
+        return 'truncated zip checkpoint, no end of central directory record'
+
+    cd_size, cd_offset = struct.unpack('<II', tail[pos + 12:pos + 20])
+    eocd_offset = size - tail_size + pos
+    if cd_offset == 0xffffffff or cd_size == 0xffffffff:
+        # the zip64 locator is just before the end of central directory record
+        if pos < 20 or tail[pos - 20:pos - 16] != ZIP64_LOCATOR_SIGNATURE:
+            return 'truncated zip64 checkpoint, no zip64 end of central directory locator'
+    elif cd_offset + cd_size > eocd_offset:
+        return f'truncated zip checkpoint, central directory [{cd_offset}, {cd_offset + cd_size}) ' \
+               f'out of range {eocd_offset}'
+    return ''
+
+
+def check_weights_file(file_path: str) -> str:
+    """return the error message for zero-byte or truncated weight file, empty string for valid file
+    """
+    if osp.getsize(file_path) == 0:
+        return 'zero-byte file'
+    if file_path.endswith(ZIP_CHECKPOINT_SUFFIX):
+        return check_zip_checkpoint(file_path)
+    return ''
+
+
+def get_stage_files(models_dir: str, training_result: Dict) -> Dict[str, List[str]]:
+    """the relative path of files to models_dir for each stage, '' for the `model` list
+    """
+    stage_files: Dict[str, List[str]] = {}
+    if isinstance(training_result.get('model', None), list):
+        stage_files[''] = [f for f in training_result['model'] if osp.isfile(osp.join(models_dir, f))]
+
+    for stage_name, stage in (training_result.get('model_stages', None) or {}).items():
+        files = []
+        for f in stage.get('files', None) or []:
+            if osp.isfile(osp.join(models_dir, stage_name, f)):
+                files.append(osp.join(stage_name, f))
+            elif osp.isfile(osp.join(models_dir, f)):
+                files.append(f)
+        stage_files[stage_name] = files
+    return stage_files
+
+
+def audit_weights_dir(models_dir: str, training_result: Dict, num_workers: Optional[int] = None) -> Dict:
+    """hash and check all files in models_dir, group them by stages in training result
+    """
+    file_paths = []
+    for root, _, files in sorted(os.walk(models_dir)):
+        file_paths.extend(osp.join(root, f) for f in sorted(files))
+    digests = get_file_digests(file_paths, num_workers)
+
+    files: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+    for file_path in file_paths:
+        relative_path = osp.relpath(file_path, start=models_dir)
+        files[relative_path] = dict(size=osp.getsize(file_path), sha256=digests[file_path])
+        error = check_weights_file(file_path)
+        if error:
+            errors[relative_path] = error
+
+    stages: Dict[str, Dict] = {}
+    # sha256 -> [(stage_name, relative path)]
+    stage_digests: Dict[str, List] = {}
+    for stage_name, stage_files in get_stage_files(models_dir, training_result).items():
+        stages[stage_name] = dict(files={f: files[f] for f in stage_files},
+                                  size=sum(files[f]['size'] for f in stage_files))
+        for f in stage_files:
+            stage_digests.setdefault(files[f]['sha256'], []).append((stage_name, f))
+
+    duplicates = []
+    for items in stage_digests.values():
+        if len(set(stage_name for stage_name, _ in items)) > 1:
+            duplicates.append(sorted(set(f for _, f in items)))
+
+    return dict(file_num=len(files),
+                total_size=sum(v['size'] for v in files.values()),
+                stages=stages,
+                duplicates=duplicates,
+                errors=errors)
+
+
+def compare_weights_dirs(src_dir: str, des_dir: str, num_workers: Optional[int] = None) -> List[str]:
+    """return the relative path of files which are missing, not byte-identical or share the inode in des_dir
+    the source files are hashed once (cached by the audit), the copy with the same size and mtime
+    (materialize_file keep the mtime) take the source digest without reading, the others are hashed
+    """
+    relative_paths = []
+    for root, _, files in sorted(os.walk(src_dir)):
+        relative_paths.extend(osp.relpath(osp.join(root, f), start=src_dir) for f in sorted(files))
+
+    mismatches = [f for f in relative_paths if not osp.isfile(osp.join(des_dir, f))]
+    paths = [f for f in relative_paths if osp.isfile(osp.join(des_dir, f))]
+    # the hardlink change with the source file
+    mismatches += [f for f in paths if osp.samefile(osp.join(src_dir, f), osp.join(des_dir, f))]
+    paths = [f for f in paths if f not in mismatches]
+    src_digests = get_file_digests([osp.join(src_dir, f) for f in paths], num_workers)
+
+    hash_paths = []
+    for f in paths:
+        src_stat, des_stat = os.stat(osp.join(src_dir, f)), os.stat(osp.join(des_dir, f))
+        if src_stat.st_size != des_stat.st_size:
+            mismatches.append(f)
+        elif src_stat.st_mtime_ns == des_stat.st_mtime_ns:
+            set_file_digest(osp.join(des_dir, f), src_digests[osp.join(src_dir, f)])
+        else:
+            hash_paths.append(f)
+
+    des_digests = get_file_digests([osp.join(des_dir, f) for f in hash_paths], num_workers)
+    for f in hash_paths:
+        if src_digests[osp.join(src_dir, f)] != des_digests[osp.join(des_dir, f)]:
+            mismatches.append(f)
+    return mismatches
@@ -0,0 +1,99 @@
+"""materialize files in workspace without copying data if possible
+
+try in order:
+1. hardlink, the same inode, zero copy, need the same filesystem
+2. reflink (FICLONE ioctl), copy on write, zero copy on btrfs/xfs
+3. copy, the fallback
+
+the files must stay unchanged are materialized with hardlink=False, eg: the handoff weights and the result cache,
+they must not share the inode with the task output, which the executor may rewrite in place.
+"""
+import os
+import os.path as osp
+import shutil
+import threading
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # not posix
+    fcntl = None  # type: ignore
+
+# linux/fs.h: #define FICLONE _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+class CopyStats(object):
+    """the count of files and bytes for each materialize method
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files: Dict[str, int] = dict(hardlink=0, reflink=0, copy=0)
+        self.bytes: Dict[str, int] = dict(hardlink=0, reflink=0, copy=0)
+
+    def add(self, method: str, size: int) -> None:
+        with self._lock:
+            self.files[method] += 1
+            self.bytes[method] += size
+
+    @property
+    def copied_bytes(self) -> int:
+        return self.bytes['copy']
+
+    def to_dict(self) -> Dict:
+        return dict(files=dict(self.files), bytes=dict(self.bytes), copied_bytes=self.copied_bytes)
+
+
+def reflink(src_file: str, dst_file: str) -> None:
+    if fcntl is None:
+        raise OSError('reflink not supported')
+
+    with open(src_file, 'rb') as fr, open(dst_file, 'wb') as fw:
+        try:
+            fcntl.ioctl(fw.fileno(), FICLONE, fr.fileno())
+        except OSError:
+            fw.close()
+            os.remove(dst_file)
+            raise
+    shutil.copystat(src_file, dst_file)
+
+
+def materialize_file(src_file: str, dst_file: str, stats: CopyStats = None, hardlink: bool = True) -> str:
+    """make dst_file has the same content with src_file, return the method: hardlink, reflink or copy
+    dst_file will be replaced if exist
+    hardlink: False to reflink or copy only, dst_file is independent of src_file
+    """
+    if osp.lexists(dst_file):
+        os.remove(dst_file)
+
+    size = osp.getsize(src_file)
+    try:
+        if not hardlink:
+            raise OSError('hardlink disabled')
+        os.link(src_file, dst_file)
+        method = 'hardlink'
+    except OSError:
+        try:
+            reflink(src_file, dst_file)
+            method = 'reflink'
+        except OSError:
+            shutil.copy2(src_file, dst_file)
+            method = 'copy'
+
+    if stats is not None:
+        stats.add(method, size)
+    return method
+
+
+def materialize_tree(src_dir: str, dst_dir: str, stats: CopyStats = None, hardlink: bool = True) -> None:
+    """replace shutil.copytree(src_dir, dst_dir), the symlinks are followed like copytree,
+    the target out of src_dir may not be visible in docker container
+    """
+    for root, _, files in os.walk(src_dir, followlinks=True):
+        relative_root = osp.relpath(root, start=src_dir)
+        des_root = osp.normpath(osp.join(dst_dir, relative_root))
+        os.makedirs(des_root, exist_ok=True)
+
+        for name in files:
+            materialize_file(osp.join(root, name), osp.join(des_root, name), stats, hardlink=hardlink)
@@ -0,0 +1,50 @@
+import os.path as osp
+import tempfile
+import unittest
+
+import yaml
+
+from src.benchmark import Benchmark, get_image_family
+from src.fake_executor import write_weights_file
+from tests.test_runtime import get_fake_cfg
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_image_family(self):
+        self.assertEqual(get_image_family('youdaoyzbx/ymir-executor:ymir2.1.0-yolov5-v7.0-cu111-tmi'),
+                         'youdaoyzbx_ymir-executor_ymir-yolov5-cu111-tmi')
+        self.assertEqual(get_image_family('localhost:5000/yolov5'), 'localhost_5000_yolov5')
+
+    def test_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir, speed=100)
+            write_weights_file(osp.join(cfg.pretrain_weights_dir, 'best.pth'), 4096, 'best')
+            cfg.benchmark = dict(tasks=['infer'], warmup=0, trials=1, baseline_dir=osp.join(tmp_dir, 'baseline'))
+
+            # the first run save the baseline
+            benchmark = Benchmark(cfg, benchmark_id='first')
+            self.assertTrue(benchmark.run())
+            with open(benchmark.baseline_file, 'r') as fp:
+                baseline = yaml.safe_load(fp)
+            self.assertEqual(baseline['infer']['image_num'], 4)
+            self.assertGreater(baseline['infer']['images_per_sec'], 0)
+
+            # fail if slower than baseline, the baseline is kept
+            baseline['infer']['images_per_sec'] *= 10
+            with open(benchmark.baseline_file, 'w') as fw:
+                yaml.safe_dump(baseline, fw)
+            benchmark = Benchmark(cfg, benchmark_id='slow')
+            self.assertFalse(benchmark.run())
+            with open(benchmark.result_file, 'r') as fp:
+                result = yaml.safe_load(fp)['results']['infer']
+            self.assertEqual(result['state'], 'fail')
+            self.assertIn('slower than baseline', result['error'])
+            self.assertLess(result['ratio'], 0.9)
+            with open(benchmark.baseline_file, 'r') as fp:
+                self.assertEqual(yaml.safe_load(fp), baseline)
+
+            # update the baseline explicitly, the run is still compared with the old baseline
+            self.assertFalse(Benchmark(cfg, benchmark_id='update', update_baseline=True).run())
+            with open(benchmark.baseline_file, 'r') as fp:
+                self.assertLess(yaml.safe_load(fp)['infer']['images_per_sec'], baseline['infer']['images_per_sec'])
@@ -0,0 +1,13 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestCmd(unittest.TestCase):
+
+    def test_lazy_import(self):
+        # the modules of each mode are imported on demand
+        modes = ['src.pipeline', 'src.matrix', 'src.sweep', 'src.benchmark', 'src.scaling', 'src.startup', 'docker']
+        code = f'import sys, src.cmd; print([m for m in {modes} if m in sys.modules])'
+        output = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8').strip()
+        self.assertEqual(output, '[]')
@@ -0,0 +1,58 @@
+import json
+import os.path as osp
+import tempfile
+import unittest
+
+from src.container import DEFAULT_LOG_MILESTONES, LogCapture, parse_docker_timestamp
+
+
+class TestLogCapture(unittest.TestCase):
+
+    def test_parse_docker_timestamp(self):
+        self.assertAlmostEqual(parse_docker_timestamp('1970-01-01T00:01:40.123456789Z'), 100.123456789)
+        self.assertEqual(parse_docker_timestamp('1970-01-01T00:01:40Z'), 100)
+        self.assertIsNone(parse_docker_timestamp('loading'))
+
+    def test_feed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = osp.join(tmp_dir, 'training.log')
+            log_capture = LogCapture(log_file, milestones=DEFAULT_LOG_MILESTONES)
+            log_capture.add_event('container_start', 100)
+            # the line is split across chunks, and the last line has no newline
+            data = (b'1970-01-01T00:01:41.000000000Z start training\n'
+                    b'1970-01-01T00:01:42.500000000Z loading dataset with 20 images\r\n'
+                    b'1970-01-01T00:01:45.000000000Z epoch 1/2 iter 1/10\n'
+                    b'1970-01-01T00:01:46.000000000Z epoch 1/2 iter 2/10\n'
+                    b'1970-01-01T00:01:50.000000000Z evaluating')
+            for offset in range(0, len(data), 7):
+                log_capture.feed(data[offset:offset + 7])
+            log_capture.close()
+
+            with open(log_file, 'r') as fp:
+                lines = fp.read().splitlines()
+            self.assertEqual(len(lines), 5)
+            self.assertEqual(lines[1], '1970-01-01T00:01:42.500000000Z loading dataset with 20 images')
+
+            events_file = osp.join(tmp_dir, 'training-events.json')
+            log_capture.save_events(events_file)
+            with open(events_file, 'r') as fp:
+                seconds = json.load(fp)['seconds']
+            # the first matched line is recorded for each milestone
+            self.assertEqual(seconds, dict(container_start=0,
+                                           first_log=1,
+                                           data_loaded=2.5,
+                                           first_iteration=5,
+                                           evaluation_start=10))
+
+    def test_feed_host_time(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_capture = LogCapture(osp.join(tmp_dir, 'infer.log'))
+            log_capture.feed_host_time(b'first line\nsecond ')
+            log_capture.feed_host_time(b'line')
+            log_capture.close()
+
+            with open(osp.join(tmp_dir, 'infer.log'), 'r') as fp:
+                lines = fp.read().splitlines()
+            self.assertEqual([line.partition(' ')[2] for line in lines], ['first line', 'second line'])
+            self.assertIsNotNone(parse_docker_timestamp(lines[0].partition(' ')[0]))
+            self.assertIn('first_log', log_capture.events)
@@ -0,0 +1,56 @@
+import os
+import os.path as osp
+import tempfile
+import unittest
+
+from src.dataset_index import DatasetIndex, check_index_files
+
+
+class TestDatasetIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = osp.join(self.tmp_dir.name, 'in')
+        self.old_cache_dir = os.environ.get('YMIR_VERIFIER_CACHE_DIR', None)
+        os.environ['YMIR_VERIFIER_CACHE_DIR'] = osp.join(self.tmp_dir.name, 'cache')
+
+        for sub_dir in ['assets/train', 'annotations/train']:
+            os.makedirs(osp.join(self.data_dir, sub_dir))
+
+        self.index_file = osp.join(self.data_dir, 'train-index.tsv')
+        with open(self.index_file, 'w') as fw:
+            for i in range(20):
+                asset_file = osp.join(self.data_dir, f'assets/train/{i}.jpg')
+                annotation_file = osp.join(self.data_dir, f'annotations/train/{i}.txt')
+                for f in [asset_file, annotation_file]:
+                    open(f, 'w').close()
+                fw.write(f'/in/assets/train/{i}.jpg\t/in/annotations/train/{i}.txt\n')
+
+    def tearDown(self):
+        if self.old_cache_dir is None:
+            os.environ.pop('YMIR_VERIFIER_CACHE_DIR')
+        else:
+            os.environ['YMIR_VERIFIER_CACHE_DIR'] = self.old_cache_dir
+        self.tmp_dir.cleanup()
+
+    def test_check(self):
+        dataset_index = DatasetIndex([self.index_file], '/in', self.data_dir, batch_size=1)
+        result = dataset_index.check()[self.index_file]
+        self.assertFalse(dataset_index.from_cache)
+        self.assertEqual(result['image_num'], 20)
+        self.assertEqual(result['missing'], dict(assets=0, annotations=0))
+
+        dataset_index = DatasetIndex([self.index_file], '/in', self.data_dir)
+        self.assertEqual(dataset_index.check()[self.index_file], result)
+        self.assertTrue(dataset_index.from_cache)
+
+        # the directory mtime changed, scan again
+        os.remove(osp.join(self.data_dir, 'annotations/train/3.txt'))
+        dataset_index = DatasetIndex([self.index_file], '/in', self.data_dir)
+        result = dataset_index.check()[self.index_file]
+        self.assertFalse(dataset_index.from_cache)
+        self.assertEqual(result['missing'], dict(assets=0, annotations=1))
+        self.assertEqual(result['samples'], [osp.join(self.data_dir, 'annotations/train/3.txt')])
+
+        with self.assertRaises(Exception):
+            check_index_files([self.index_file], '/in', self.data_dir)
@@ -0,0 +1,64 @@
+import os
+import os.path as osp
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from src.img_man import ImgManCache
+
+# the docker command line for tests, `docker cp` fail with the message in $DOCKER_CP_ERROR,
+# the image is not pulled until `docker pull` create $DOCKER_PULL_FILE
+FAKE_DOCKER = '''#!/bin/sh
+case "$1 $2" in
+  "image inspect")
+    if [ ! -f "$DOCKER_PULL_FILE" ]; then echo "Error: No such image: $5" >&2; exit 1; fi
+    echo "sha256:$DOCKER_IMAGE_ID" ;;
+  "pull "*) touch "$DOCKER_PULL_FILE" ;;
+  "create "*) echo fake-container ;;
+  "rm "*) echo fake-container ;;
+  "cp "*) echo "$DOCKER_CP_ERROR" >&2; exit 1 ;;
+esac
+'''
+
+
+class TestImgManCache(unittest.TestCase):
+
+    def run_update(self, tmp_dir: str, image_id: str, cp_error: str, pulled: bool = True) -> ImgManCache:
+        bin_dir = osp.join(tmp_dir, 'bin')
+        os.makedirs(bin_dir, exist_ok=True)
+        with open(osp.join(bin_dir, 'docker'), 'w') as fw:
+            fw.write(FAKE_DOCKER)
+        os.chmod(osp.join(bin_dir, 'docker'), 0o755)
+
+        pull_file = osp.join(tmp_dir, f'pulled-{image_id}')
+        if pulled:
+            open(pull_file, 'w').close()
+        env = dict(PATH=f'{bin_dir}:{os.environ["PATH"]}',
+                   DOCKER_IMAGE_ID=image_id,
+                   DOCKER_CP_ERROR=cp_error,
+                   DOCKER_PULL_FILE=pull_file)
+        with mock.patch.dict(os.environ, env):
+            cache = ImgManCache(f'fake-image-{image_id}', cache_root=osp.join(tmp_dir, 'cache'))
+            cache.update()
+        return cache
+
+    def test_missing_img_man(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = self.run_update(tmp_dir, 'a' * 8,
+                                    'Error: Could not find the file /img-man in container fake-container')
+            self.assertTrue(cache.is_valid())
+            self.assertEqual(os.listdir(cache.img_man_dir), [])
+
+    def test_docker_error(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(subprocess.CalledProcessError):
+                self.run_update(tmp_dir, 'b' * 8, 'Cannot connect to the Docker daemon')
+            # nothing cached for the transient error
+            self.assertEqual(os.listdir(osp.join(tmp_dir, 'cache', 'img-man')), [])
+
+    def test_pull_image(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = self.run_update(tmp_dir, 'c' * 8, 'Error: Could not find the file /img-man', pulled=False)
+            self.assertEqual(cache.image_id, 'sha256:' + 'c' * 8)
+            self.assertTrue(osp.isfile(osp.join(tmp_dir, f'pulled-{"c" * 8}')))
@@ -0,0 +1,59 @@
+import json
+import os.path as osp
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from src.matrix import get_worker_num, load_matrix_jobs, run_matrix
+from tests.test_runtime import get_fake_cfg
+
+
+def write_yaml(yaml_file: str, content: dict) -> str:
+    with open(yaml_file, 'w') as fw:
+        # easydict to plain dict
+        yaml.safe_dump(json.loads(json.dumps(content)), fw)
+    return yaml_file
+
+
+class TestMatrix(unittest.TestCase):
+
+    @mock.patch('os.cpu_count', return_value=8)
+    def test_worker_num(self, _):
+        self.assertEqual(get_worker_num('0,1,2,3', gpus_per_job=2, cpus_per_job=1), 2)
+        self.assertEqual(get_worker_num('0,1,2,3', gpus_per_job=1, cpus_per_job=4), 2)
+        self.assertEqual(get_worker_num('0,1,2,3', gpus_per_job=1, cpus_per_job=1, max_workers=3), 3)
+        with self.assertRaises(AssertionError):
+            get_worker_num('0', gpus_per_job=2, cpus_per_job=1)
+
+    @mock.patch('os.cpu_count', return_value=8)
+    def test_run_matrix(self, _):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            valid_config = write_yaml(osp.join(tmp_dir, 'valid.yaml'), cfg)
+            cfg.fake_executor.mode = 'crash'
+            crash_config = write_yaml(osp.join(tmp_dir, 'crash.yaml'), cfg)
+            report_file = osp.join(tmp_dir, 'matrix-report.yaml')
+            matrix_file = write_yaml(
+                osp.join(tmp_dir, 'matrix.yaml'),
+                dict(gpu_id='0,1',
+                     gpus_per_job=1,
+                     cpus_per_job=1,
+                     report_file=report_file,
+                     jobs=[dict(config=valid_config, docker_image=['image-a', 'image-b'], tasks='tmi'),
+                           dict(config=crash_config, tasks='t')]))
+
+            with open(matrix_file, 'r') as fp:
+                jobs = load_matrix_jobs(yaml.safe_load(fp))
+            self.assertEqual([job.docker_image for job in jobs], ['image-a', 'image-b', cfg.docker_image])
+            self.assertEqual([job.tasks for job in jobs], [['training', 'mining', 'infer']] * 2 + [['training']])
+
+            self.assertFalse(run_matrix(matrix_file))
+            with open(report_file, 'r') as fp:
+                results = yaml.safe_load(fp)['results']
+            self.assertEqual([result['state'] for result in results], ['pass', 'pass', 'fail'])
+            self.assertIn('CalledProcessError', results[2]['error'])
+            self.assertEqual(len(set(result['task_id'] for result in results)), 3)
+            # each job hold one device slot
+            self.assertTrue(all(result['gpu_id'] in ['0', '1'] for result in results))
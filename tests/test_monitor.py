@@ -0,0 +1,82 @@
+import os.path as osp
+import tempfile
+import time
+import unittest
+
+from src.monitor import MonitorFollower
+
+
+def write_monitor(monitor_file: str, percent: float, state: int) -> None:
+    with open(monitor_file, 'w') as fw:
+        fw.write(f'task\t{time.time()}\t{percent}\t{state}\n')
+
+
+class TestMonitorFollower(unittest.TestCase):
+
+    def test_stall(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            monitor_file = osp.join(tmp_dir, 'monitor.txt')
+            killed = []
+            follower = MonitorFollower(monitor_file, 'test', stall_timeout=0.05, kill=killed.append)
+
+            # the image pull and dataset loading before the first monitor write
+            follower.poll()
+            time.sleep(0.1)
+            follower.poll()
+            self.assertFalse(follower.stalled)
+
+            write_monitor(monitor_file, 0.5, 2)
+            follower.poll()
+            time.sleep(0.1)
+            follower.poll()
+            self.assertTrue(follower.stalled)
+            self.assertEqual(killed, ['test'])
+
+    def test_first_write_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            monitor_file = osp.join(tmp_dir, 'monitor.txt')
+            killed = []
+            follower = MonitorFollower(monitor_file, 'test', first_write_timeout=0.05, kill=killed.append)
+
+            # hang before the first monitor write
+            follower.poll()
+            self.assertFalse(follower.stalled)
+            time.sleep(0.1)
+            follower.poll()
+            self.assertTrue(follower.stalled)
+            self.assertEqual(follower.stall_reason, 'no monitor write in 0.05s')
+            self.assertEqual(killed, ['test'])
+
+    def test_done(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            monitor_file = osp.join(tmp_dir, 'monitor.txt')
+            killed = []
+            follower = MonitorFollower(monitor_file, 'test', stall_timeout=0.05, kill=killed.append)
+
+            # writing the result after the progress reach 100%
+            write_monitor(monitor_file, 1.0, 2)
+            follower.poll()
+            time.sleep(0.1)
+            follower.poll()
+            self.assertFalse(follower.stalled)
+            self.assertEqual(killed, [])
+
+    def test_first_write_time(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            monitor_file = osp.join(tmp_dir, 'monitor.txt')
+            # the stale monitor file of last run
+            write_monitor(monitor_file, 1.0, 3)
+            follower = MonitorFollower(monitor_file, 'test', kill=print, interval=10)
+            follower.start()
+            time.sleep(0.3)
+            self.assertIsNone(follower.first_write_time)
+
+            # found in the fast poll, not delayed to the poll interval
+            tic = time.time()
+            write_monitor(monitor_file, 0.1, 2)
+            time.sleep(0.5)
+            write_monitor(monitor_file, 0.2, 2)
+            follower.stop()
+            self.assertIsNotNone(follower.first_write_time)
+            self.assertLess(follower.first_write_time - tic, 0.4)
+            self.assertFalse(follower.done)
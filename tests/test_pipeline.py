@@ -0,0 +1,83 @@
+import os.path as osp
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from src.pipeline import PipeLine
+from tests.test_runtime import get_fake_cfg
+
+
+class TestPipeLine(unittest.TestCase):
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            cfg.task_id = 'resume'
+            run_stage = PipeLine.run_stage
+            stages = []
+
+            def record_stage(pipeline, node, gpu_id):
+                stages.append(node.workspace)
+                return run_stage(pipeline, node, gpu_id)
+
+            def broken_infer(pipeline, node, gpu_id):
+                if node.task == 'infer':
+                    raise Exception('infer broken')
+                return record_stage(pipeline, node, gpu_id)
+
+            with mock.patch.object(PipeLine, 'run_stage', broken_infer):
+                with self.assertRaises(Exception):
+                    PipeLine(cfg).run()
+
+            manifest_file = osp.join(cfg.work_dir, 'resume', 'run-manifest.yaml')
+            with open(manifest_file, 'r') as fp:
+                manifest = yaml.safe_load(fp)
+            self.assertEqual({name: stage['state'] for name, stage in manifest['stages'].items()},
+                             dict(training='pass', mining='pass', infer='fail'))
+            self.assertEqual(manifest['stages']['infer']['error'], 'Exception: infer broken')
+            weights_dir = manifest['stages']['training']['weights_dir']
+            self.assertTrue(osp.isdir(weights_dir))
+            self.assertTrue(manifest['stages']['training']['weights_digest'])
+
+            # the passed stages are skipped, the failed infer use the training weights of previous run
+            cfg.resume = True
+            stages.clear()
+            pipeline = PipeLine(cfg)
+            with mock.patch.object(PipeLine, 'run_stage', record_stage):
+                pipeline.run()
+            self.assertEqual(stages, ['infer'])
+            self.assertEqual(pipeline.training_weights_dir, weights_dir)
+            with open(manifest_file, 'r') as fp:
+                manifest = yaml.safe_load(fp)
+            self.assertTrue(all(stage['state'] == 'pass' for stage in manifest['stages'].values()))
+
+    def test_resume_different_image(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            cfg.task_id = 'resume'
+            cfg.tasks = ['training']
+            PipeLine(cfg).run()
+
+            cfg.resume = True
+            cfg.docker_image = 'other-image'
+            with self.assertRaisesRegex(Exception, 'cannot resume resume with different docker_image'):
+                PipeLine(cfg)
+
+    def test_smoke_dataset(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            data_dir = cfg.data_dir
+            cfg.smoke_size = 5
+            cfg.extra_binds = None
+            pipeline = PipeLine(cfg)
+            pipeline.run()
+
+            smoke_dir = osp.join(cfg.work_dir, pipeline.task_id, 'smoke-data')
+            self.assertEqual(pipeline.cfg.data_dir, smoke_dir)
+            # the symlink targets in original dataset are bind in docker container
+            self.assertEqual(pipeline.cfg.extra_binds, [osp.realpath(data_dir)])
+            with open(osp.join(smoke_dir, 'train-index.tsv'), 'r') as fp:
+                self.assertEqual(len(fp.readlines()), 5)
+            self.assertTrue(all(stage['state'] == 'pass' for stage in pipeline.manifest['stages'].values()))
@@ -0,0 +1,45 @@
+import os
+import os.path as osp
+import tempfile
+import unittest
+
+import yaml
+
+from src.result_cache import ResultCache, get_config_digest
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_config_digest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config_file = osp.join(tmp_dir, 'config.yaml')
+            digests = []
+            for task_id in ['t1', 't2']:
+                with open(config_file, 'w') as fw:
+                    yaml.safe_dump(dict(task_id=task_id, epochs=10), fw)
+                digests.append(get_config_digest(config_file))
+            self.assertEqual(digests[0], digests[1])
+
+            with open(config_file, 'w') as fw:
+                yaml.safe_dump(dict(task_id='t1', epochs=20), fw)
+            self.assertNotEqual(get_config_digest(config_file), digests[0])
+
+    def test_save_restore(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(osp.join(tmp_dir, 'cache'))
+            components = dict(task='training', image_id='sha256:abc')
+            key = cache.get_key(components)
+            out_dir = osp.join(tmp_dir, 'out')
+            self.assertIsNone(cache.restore(key, out_dir))
+
+            os.makedirs(osp.join(out_dir, 'models'))
+            with open(osp.join(out_dir, 'models', 'best.pt'), 'w') as fw:
+                fw.write('weights')
+            cache.save(key, out_dir, components, dict(task='training'))
+
+            new_out_dir = osp.join(tmp_dir, 'new_out')
+            result = cache.restore(key, new_out_dir)
+            self.assertEqual(result['task'], 'training')
+            self.assertEqual(result['key'], components)
+            with open(osp.join(new_out_dir, 'models', 'best.pt'), 'r') as fp:
+                self.assertEqual(fp.read(), 'weights')
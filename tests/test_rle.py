@@ -0,0 +1,48 @@
+import unittest
+
+from src.rle import check_rle, check_segmentation_chunk, decode_rle_counts
+
+
+def encode_rle_counts(runs):
+    """pycocotools rleToString, use to generate test data
+    """
+    chars = []
+    for i, x in enumerate(runs):
+        if i > 2:
+            x -= runs[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = (x != -1) if (c & 0x10) else (x != 0)
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return ''.join(chars)
+
+
+class TestRLE(unittest.TestCase):
+
+    def test_decode(self):
+        for runs in [[0], [100], [3, 5, 2, 90], [5000, 1, 1, 1, 12, 40000, 7, 0, 3]]:
+            self.assertEqual(list(decode_rle_counts(encode_rle_counts(runs))), runs)
+            self.assertEqual(list(decode_rle_counts(runs)), runs)
+
+    def test_check_rle(self):
+        runs = [3, 5, 2, 90]
+        self.assertEqual(check_rle(dict(size=[10, 10], counts=encode_rle_counts(runs))), '')
+        self.assertEqual(check_rle(dict(size=[10, 10], counts=runs), image_size=(10, 10)), '')
+        self.assertIn('sum of run length', check_rle(dict(size=[10, 11], counts=runs)))
+        self.assertIn('image size', check_rle(dict(size=[10, 10], counts=runs), image_size=(20, 5)))
+        self.assertIn('no counts', check_rle(dict(size=[10, 10])))
+        self.assertIn('truncated', check_rle(dict(size=[10, 10], counts='a')))
+
+    def test_check_chunk(self):
+        items = [(0, dict(size=[2, 2], counts=[4]), None), (1, [[0, 0, 1, 0, 1, 1]], None), (2, [[0, 0]], None)]
+        errors = check_segmentation_chunk(items)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('annotations[2]'))
+
+
+if __name__ == '__main__':
+    unittest.main()
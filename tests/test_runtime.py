@@ -0,0 +1,111 @@
+import os
+import os.path as osp
+import subprocess
+import tempfile
+import time
+import unittest
+
+import yaml
+from easydict import EasyDict as edict
+
+from src import verifier_detection
+from src.config import get_pretrain_files, resolve_config
+from src.pipeline import PipeLine
+from src.synthetic import SyntheticDataset
+
+
+def get_fake_cfg(tmp_dir: str, **fake_cfg) -> edict:
+    with open('tests/configs/all-in-one.yaml', 'r') as fp:
+        cfg = edict(yaml.safe_load(fp))
+
+    data_dir = osp.join(tmp_dir, 'data')
+    SyntheticDataset(data_dir, num_images=20, class_names=['dog'], image_size=(64, 48)).generate(num_workers=1)
+    cfg.data_dir = data_dir
+    cfg.work_dir = osp.join(tmp_dir, 'work')
+    cfg.pretrain_weights_dir = osp.join(tmp_dir, 'no-pretrain-weights')
+    cfg.runtime = 'fake'
+    cfg.fake_executor = dict(dict(speed=1000, weights_size=4096), **fake_cfg)
+    cfg.resource_interval = 0
+    cfg.monitor_interval = 0.1
+    return cfg
+
+
+class TestFakeRuntime(unittest.TestCase):
+
+    def test_pipeline(self):
+        for object_type in [2, 3]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cfg = get_fake_cfg(tmp_dir, object_type=object_type)
+                pipeline = PipeLine(cfg)
+                pipeline.run()
+
+                self.assertEqual(pipeline.object_type, object_type)
+                stages = pipeline.manifest['stages']
+                self.assertEqual(sorted(stages), ['infer', 'mining', 'training'])
+                self.assertTrue(all(stage['state'] == 'pass' for stage in stages.values()), stages)
+
+    def test_broken_executor(self):
+        for mode, tasks, error in [('bad_output', ['training'], AssertionError),
+                                   ('missing_output', ['training'], AssertionError),
+                                   ('crash', ['training'], subprocess.CalledProcessError),
+                                   ('stall', ['training'], Exception)]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                cfg = get_fake_cfg(tmp_dir, mode=mode)
+                cfg.tasks = tasks
+                cfg.monitor_stall_timeout = 0.5
+                pipeline = PipeLine(cfg)
+                with self.assertRaises(error, msg=mode):
+                    pipeline.run()
+                self.assertEqual(pipeline.manifest['stages']['training']['state'], 'fail')
+
+    def test_warm_container(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            cfg.warm_container = True
+            cfg.gpu_id = '2,3'
+            pipeline = PipeLine(cfg)
+            pipeline.run()
+
+            stages = pipeline.manifest['stages']
+            self.assertTrue(all(stage['state'] == 'pass' for stage in stages.values()), stages)
+            self.assertEqual(pipeline.manifest['warm_container']['task_num'], 3)
+            self.assertEqual(pipeline.warm_container.get_visible_devices('3'), '1')
+            self.assertEqual(pipeline.warm_container.container_id, '')
+
+    def test_dry_run(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            cfg.dry_run = True
+            cfg.smoke_size = 5
+            tic = time.time()
+            plan = PipeLine(cfg).plan()
+            self.assertLess(time.time() - tic, 1)
+
+            # nothing written in work_dir
+            self.assertFalse(osp.exists(cfg.work_dir))
+            self.assertEqual([(t['task'], t['depends']) for t in plan['tasks']],
+                             [('training', []), ('mining', [0]), ('infer', [0])])
+            training, mining, _ = plan['tasks']
+            self.assertIn(f'{osp.join(cfg.data_dir, "assets")}:{osp.join(cfg.data_dir, "assets")}:ro',
+                          training['volumes'])
+            self.assertEqual(training['config']['class_names'], ['dog'])
+            self.assertEqual(training['env']['run_training'], True)
+            self.assertEqual(mining['env']['input']['training_index_file'], '')
+            self.assertEqual(mining['pretrain_weights_dir'], osp.join(plan['work_dir'], 'training', 'models'))
+            self.assertIn(f'{mining["pretrain_weights_dir"]}:{mining["pretrain_weights_dir"]}:ro', mining['volumes'])
+            yaml.safe_dump(plan)
+
+    def test_resolve_config(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = resolve_config(get_fake_cfg(tmp_dir))
+            cfg.in_dir = osp.join(tmp_dir, 'in')
+            cfg.out_dir = osp.join(tmp_dir, 'out')
+            os.makedirs(cfg.pretrain_weights_dir)
+            with open(osp.join(cfg.pretrain_weights_dir, 'best.pt'), 'w') as fw:
+                fw.write('weights')
+
+            # the module import, or the verifier is collected as test case
+            v = verifier_detection.VerifierDetection(cfg)
+            self.assertIs(v.cfg, cfg)
+            self.assertEqual(v.pretrain_files, ['/in/models/best.pt'])
+            self.assertEqual(get_pretrain_files(cfg.pretrain_weights_dir), ['/in/models/best.pt'])
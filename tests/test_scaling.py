@@ -0,0 +1,60 @@
+import os.path as osp
+import tempfile
+import unittest
+
+import yaml
+
+from src.fake_executor import write_weights_file
+from src.scaling import Scaling, fit_exponent, fit_linear
+from tests.test_runtime import get_fake_cfg
+
+
+class TestScaling(unittest.TestCase):
+
+    def test_fit(self):
+        sizes = [100, 1000, 10000, 100000]
+        fixed, per_image = fit_linear(sizes, [30 + 0.01 * s for s in sizes])
+        self.assertAlmostEqual(fixed, 30)
+        self.assertAlmostEqual(per_image, 0.01)
+
+        self.assertAlmostEqual(fit_exponent(sizes, [0.01 * s for s in sizes]), 1)
+        self.assertAlmostEqual(fit_exponent(sizes, [1e-6 * s * s for s in sizes]), 2)
+        self.assertEqual(fit_exponent([100], [1]), 0)
+
+    def test_analyze_memory(self):
+        scaling = Scaling.__new__(Scaling)
+        scaling.max_time_exponent = 1.2
+        scaling.max_memory_growth = 0.5
+        results = {s: dict(total=10 + 0.01 * s, steady=0.01 * s, rss_peak=1e9) for s in [100, 1000]}
+        self.assertEqual(scaling.analyze(results)['flags'], [])
+
+        results[1000]['rss_peak'] = 3e9
+        self.assertEqual(len(scaling.analyze(results)['flags']), 1)
+
+        # not sampled, the memory growth is unknown rather than zero
+        results[100]['rss_peak'] = None
+        summary = scaling.analyze(results)
+        self.assertIsNone(summary['memory_growth'])
+        self.assertEqual(summary['memory_unknown_sizes'], [100])
+
+    def test_fake_runtime(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir, speed=100)
+            cfg.scaling = dict(task='infer', sizes=[10, 40])
+            write_weights_file(osp.join(cfg.pretrain_weights_dir, 'best.pth'), 4096, 'best')
+            scaling = Scaling(cfg, scaling_id='test')
+            self.assertTrue(scaling.run())
+
+            with open(osp.join(cfg.work_dir, 'scaling-test', 'scaling-result.yaml'), 'r') as fp:
+                result = yaml.safe_load(fp)
+            self.assertEqual(sorted(result['results']), [10, 40])
+            self.assertEqual(result['error'], '')
+            self.assertEqual(result['summary']['flags'], [])
+            # the fake executor spends 0.01 seconds for each image
+            self.assertAlmostEqual(result['summary']['per_image_seconds'], 0.01, delta=0.005)
+            # the resource usage is not sampled in fake runtime
+            self.assertEqual(result['summary']['memory_unknown_sizes'], [10, 40])
+
+            # the same run is flagged with a stricter exponent
+            cfg.scaling.max_time_exponent = 0.5
+            self.assertFalse(Scaling(cfg, scaling_id='strict').run())
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from src.scheduler import TaskScheduler, build_task_graph, get_graph_width, split_gpu_id
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_build_task_graph(self):
+        nodes = build_task_graph(['training', 'training', 'mining', 'infer'])
+        self.assertEqual([node.workspace for node in nodes], ['training', 'pretrain', 'mining', 'infer'])
+        self.assertEqual([node.depends for node in nodes], [[], [0], [0], [0]])
+        self.assertEqual(get_graph_width(nodes), 3)
+
+        nodes = build_task_graph(['training', 'training', 'training'])
+        self.assertEqual([node.depends for node in nodes], [[], [0], [0, 1]])
+        self.assertEqual(get_graph_width(nodes), 1)
+
+        nodes = build_task_graph(['mining', 'infer'])
+        self.assertEqual([node.depends for node in nodes], [[], []])
+
+    def test_split_gpu_id(self):
+        self.assertEqual(split_gpu_id('0,1,2,3,4', 2), ['0,1,4', '2,3'])
+        self.assertEqual(split_gpu_id('0', 1), ['0'])
+
+    def test_run(self):
+        nodes = build_task_graph(['training', 'mining', 'infer'])
+        scheduler = TaskScheduler(nodes, gpu_id='0,1,2,3')
+        self.assertEqual(scheduler.max_workers, 2)
+
+        lock = threading.Lock()
+        records = []
+
+        def run_fn(node, gpu_id):
+            with lock:
+                records.append(('start', node.task, gpu_id))
+            time.sleep(0.05)
+            with lock:
+                records.append(('end', node.task, gpu_id))
+
+        scheduler.run(run_fn)
+        # the training run alone with all devices
+        self.assertEqual(records[:2], [('start', 'training', '0,1,2,3'), ('end', 'training', '0,1,2,3')])
+        # mining and infer run at the same time with different devices
+        self.assertEqual({r[0] for r in records[2:4]}, {'start'})
+        self.assertEqual({r[2] for r in records[2:4]}, {'0,1', '2,3'})
+
+    def test_node_devices(self):
+        nodes = build_task_graph(['training', 'training', 'mining', 'infer'])
+        scheduler = TaskScheduler(nodes, gpu_id='0,1,2,3')
+        self.assertEqual(scheduler.node_devices, {0: '0,1,2,3', 1: '0,3', 2: '1', 3: '2'})
+
+        # serial tasks use all devices
+        scheduler = TaskScheduler(nodes, gpu_id='0,1,2,3', parallel=False)
+        self.assertEqual(set(scheduler.node_devices.values()), {'0,1,2,3'})
+        scheduler = TaskScheduler(build_task_graph(['training', 'training']), gpu_id='0,1')
+        self.assertEqual(scheduler.node_devices, {0: '0,1', 1: '0,1'})
+
+    def test_run_failed(self):
+        nodes = build_task_graph(['training', 'mining', 'infer'])
+        scheduler = TaskScheduler(nodes, gpu_id='0')
+        tasks = []
+
+        def run_fn(node, gpu_id):
+            tasks.append(node.task)
+            raise AssertionError(f'{node.task} failed')
+
+        with self.assertRaises(AssertionError):
+            scheduler.run(run_fn)
+        self.assertEqual(tasks, ['training'])
+
+
+if __name__ == '__main__':
+    unittest.main()
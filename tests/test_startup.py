@@ -0,0 +1,24 @@
+import unittest
+
+from src.startup import get_startup_seconds, parse_importtime
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:    100000 |     100000 |   numpy.core',
+            'import time:    200000 |     300000 | numpy',
+            'import time:     50000 |      50000 | json',
+            'import numpy failed: xxx',
+        ]
+        result = parse_importtime(lines)
+        self.assertEqual(result['total_seconds'], 0.35)
+        self.assertEqual(result['package_num'], 3)
+        self.assertEqual([p['name'] for p in result['top']], ['numpy', 'json'])
+
+    def test_startup_seconds(self):
+        events = dict(container_create=10, container_start=11.5, first_log=14, container_exit=20)
+        self.assertEqual(get_startup_seconds(events),
+                         dict(container_start=1.5, first_log=4, container_exit=10))
@@ -0,0 +1,47 @@
+import io
+import json
+import unittest
+
+from src.streaming import HashIndex, iter_json_items
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_iter_json_items(self):
+        result = dict(meta=[1, 2, {'a': 3}],
+                      detection={f'{i}.jpg': dict(annotations=[dict(score=0.1 * i, box=[1, 2, 3, 4])])
+                                 for i in range(100)},
+                      count=12345)
+        text = json.dumps(result, indent=2)
+        for chunk_size in [1, 7, 1 << 20]:
+            items = list(iter_json_items(io.StringIO(text), key='detection', chunk_size=chunk_size))
+            self.assertEqual(dict(items), result['detection'])
+
+            items = list(iter_json_items(io.StringIO(text), chunk_size=chunk_size))
+            self.assertEqual(dict(items), result)
+
+        self.assertEqual(list(iter_json_items(io.StringIO('{"detection": {}}'), key='detection')), [])
+
+        with self.assertRaises(ValueError):
+            list(iter_json_items(io.StringIO('{"other": {}}'), key='detection'))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_items(io.StringIO('{"detection": {"a.jpg": [}}'), key='detection'))
+
+        # the invalid value is not buffered until the end of file
+        fp = io.StringIO('{"detection": {"a.jpg": [}, ' + text[1:])
+        with self.assertRaises(ValueError):
+            list(iter_json_items(fp, key='detection', chunk_size=64))
+        self.assertLess(fp.tell(), 256)
+
+    def test_hash_index(self):
+        index = HashIndex(['a.jpg', 'b.jpg', 'a.jpg'])
+        self.assertEqual(len(index), 2)
+        self.assertIn('a.jpg', index)
+        self.assertNotIn('c.jpg', index)
+        self.assertNotEqual(index.index('a.jpg'), index.index('b.jpg'))
+        self.assertEqual(index.index('c.jpg'), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
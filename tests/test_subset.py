@@ -0,0 +1,55 @@
+import json
+import os
+import os.path as osp
+import tempfile
+import unittest
+
+from src.subset import SubsetBuilder, select_stratified
+
+
+class TestSubset(unittest.TestCase):
+
+    def test_select_stratified(self):
+        labels = [['dog']] * 90 + [['cat']] * 9 + [['bird', 'dog']]
+        selected = select_stratified(labels, 10, seed=3)
+        self.assertEqual(len(selected), 10)
+        self.assertEqual(selected, select_stratified(labels, 10, seed=3))
+        self.assertEqual(selected, sorted(selected))
+        # each class has at least one image
+        self.assertIn(99, selected)
+        self.assertTrue(any(90 <= idx < 99 for idx in selected))
+
+        self.assertEqual(len(select_stratified(labels, 0.2)), 20)
+        self.assertEqual(select_stratified(labels, 200), list(range(100)))
+
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = osp.join(tmp_dir, 'in')
+            os.makedirs(osp.join(data_dir, 'assets'))
+            os.makedirs(osp.join(data_dir, 'annotations'))
+            coco = dict(images=[], annotations=[], categories=[dict(id=1, name='dog')])
+            with open(osp.join(data_dir, 'train-index.tsv'), 'w') as fw:
+                for i in range(10):
+                    open(osp.join(data_dir, 'assets', f'{i}.jpg'), 'w').close()
+                    coco['images'].append(dict(id=i, file_name=f'{i}.jpg'))
+                    coco['annotations'].append(dict(id=i, image_id=i, category_id=1))
+                    fw.write(f'/in/assets/{i}.jpg\t/in/annotations/coco.json\n')
+            with open(osp.join(data_dir, 'annotations', 'coco.json'), 'w') as fw:
+                json.dump(coco, fw)
+
+            smoke_dir = osp.join(tmp_dir, 'smoke')
+            builder = SubsetBuilder(data_dir, smoke_dir, size=3)
+            result = builder.build([osp.join(data_dir, 'train-index.tsv')], ['assets', 'annotations'])
+            self.assertEqual(result['train-index.tsv']['selected_num'], 3)
+
+            with open(osp.join(smoke_dir, 'train-index.tsv'), 'r') as fp:
+                lines = fp.readlines()
+            self.assertEqual(len(lines), 3)
+            for line in lines:
+                asset_file = line.split('\t')[0].replace('/in', smoke_dir)
+                self.assertTrue(osp.islink(asset_file))
+                self.assertTrue(osp.isfile(asset_file))
+            self.assertEqual(len(os.listdir(osp.join(smoke_dir, 'assets'))), 3)
+
+            with open(osp.join(smoke_dir, 'annotations', 'coco.json'), 'r') as fp:
+                self.assertEqual(len(json.load(fp)['annotations']), 3)
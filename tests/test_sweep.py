@@ -0,0 +1,51 @@
+import os.path as osp
+import tempfile
+import unittest
+from unittest import mock
+
+from src.sweep import Sweep, expand_grid
+from tests.test_runtime import get_fake_cfg
+
+
+class TestSweep(unittest.TestCase):
+
+    def test_expand_grid(self):
+        self.assertEqual(expand_grid({}), [{}])
+        self.assertEqual(expand_grid(dict(a=[1, 2], b=3)), [dict(a=1, b=3), dict(a=2, b=3)])
+
+    def test_run_and_resume(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            # the duplicate epochs render the same config.yaml
+            cfg.hyper_parameters = dict(training=dict(epochs=[1, 2, 1]),
+                                        mining=dict(mining_algorithm=['random', 'entropy']))
+            sweep = Sweep(cfg, sweep_id='test')
+            self.assertTrue(sweep.run())
+
+            tasks = sorted(state['task'] for state in sweep.state.values())
+            self.assertEqual(tasks, ['infer', 'mining', 'mining', 'training', 'training'])
+            self.assertTrue(all(state['state'] == 'pass' for state in sweep.state.values()))
+            # mining and infer use the weights of first passed training point
+            self.assertTrue(sweep.cfg.pretrain_weights_dir.startswith(sweep.sweep_dir))
+            with open(osp.join(tmp_dir, 'work', 'sweep-test', 'sweep-result.tsv'), 'r') as fp:
+                self.assertEqual(len(fp.readlines()), 1 + 5)
+
+            # the passed points are not run again
+            sweep = Sweep(cfg, sweep_id='test')
+            with mock.patch.object(Sweep, 'run_point') as run_point:
+                self.assertTrue(sweep.run())
+            run_point.assert_not_called()
+
+    def test_skip_without_training_weights(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir, mode='crash')
+            cfg.hyper_parameters = dict(mining=dict(mining_algorithm=['random', 'entropy']))
+            sweep = Sweep(cfg, sweep_id='test')
+            self.assertFalse(sweep.run())
+
+            states = {point_id: state['state'] for point_id, state in sweep.state.items()}
+            self.assertEqual(sorted(states.values()), ['fail', 'skip', 'skip', 'skip'])
+            for state in sweep.state.values():
+                if state['task'] != 'training':
+                    self.assertEqual(state['state'], 'skip')
+                    self.assertIn('no training point passed', state['error'])
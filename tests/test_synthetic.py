@@ -0,0 +1,42 @@
+import json
+import os.path as osp
+import tempfile
+import unittest
+
+from src.synthetic import SyntheticDataset
+from src.utils import get_image_size
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_generate(self):
+        for annotation_format, payload in [('voc', 'sparse'), ('coco', 'dedup')]:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                dataset = SyntheticDataset(tmp_dir,
+                                           num_images=20,
+                                           annotation_format=annotation_format,
+                                           image_size=(64, 48),
+                                           payload=payload,
+                                           payload_size=4096,
+                                           shard_size=8)
+                # more chunks than the in-flight bound of one worker
+                dataset.generate(num_workers=1, chunk_size=4)
+
+                with open(osp.join(tmp_dir, 'train-index.tsv'), 'r') as fp:
+                    train_lines = [line.strip().split('\t') for line in fp]
+                with open(osp.join(tmp_dir, 'candidate-index.tsv'), 'r') as fp:
+                    candidate_lines = fp.readlines()
+                self.assertEqual(len(train_lines), 16)
+                self.assertEqual(len(candidate_lines), 4)
+
+                for asset_path, annotation_path in train_lines:
+                    self.assertEqual(get_image_size(asset_path.replace('/in', tmp_dir)), (48, 64))
+                    self.assertTrue(osp.isfile(annotation_path.replace('/in', tmp_dir)))
+
+                if annotation_format == 'coco':
+                    with open(osp.join(tmp_dir, 'annotations', 'coco-annotations.json'), 'r') as fp:
+                        coco = json.load(fp)
+                    self.assertEqual([image['id'] for image in coco['images']], list(range(20)))
+                    self.assertEqual(len(coco['annotations']), 20)
+                else:
+                    self.assertEqual(osp.getsize(train_lines[0][0].replace('/in', tmp_dir)), 4096)
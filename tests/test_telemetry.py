@@ -0,0 +1,43 @@
+import os
+import os.path as osp
+import tempfile
+import unittest
+from unittest import mock
+
+from src import telemetry
+from src.telemetry import ResourceSampler
+
+
+class FakeContainer(object):
+
+    def __init__(self, container_id: str):
+        self.id = container_id
+
+
+class TestResourceSampler(unittest.TestCase):
+
+    def test_no_sample(self):
+        summary = ResourceSampler().get_summary()
+        self.assertEqual(summary['sample_count'], 0)
+        self.assertIsNone(summary['rss_peak'])
+        self.assertIsNone(summary['blkio_read'])
+
+    def test_first_sample(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.object(telemetry, 'CGROUP_ROOT', tmp_dir):
+            cgroup_dir = osp.join(tmp_dir, 'system.slice', 'docker-abc.scope')
+            os.makedirs(cgroup_dir)
+            for name, content in [('cgroup.controllers', 'cpu memory io\n'), ('cpu.stat', 'usage_usec 1000\n'),
+                                  ('memory.stat', 'anon 4096\nfile 8192\nshmem 0\n')]:
+                with open(osp.join(cgroup_dir, name), 'w') as fw:
+                    fw.write(content)
+
+            sampler = ResourceSampler(interval=60)
+            sampler.start_sampling(FakeContainer('abc'))
+            sampler.stop()
+
+        # the short task has only one sample, the memory is recorded but the cpu usage is unknown
+        summary = sampler.get_summary()
+        self.assertEqual(summary['sample_count'], 1)
+        self.assertEqual(summary['rss_peak'], 4096)
+        self.assertEqual(summary['cache_peak'], 8192)
+        self.assertIsNone(summary['cpu_percent_peak'])
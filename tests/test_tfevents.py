@@ -0,0 +1,72 @@
+import os
+import os.path as osp
+import struct
+import tempfile
+import unittest
+
+from src.tfevents import (EventWriter, crc32c, decode_event, encode_event, encode_record, encode_varint, py_crc32c,
+                          summarize_tensorboard_dir)
+
+
+def encode_field(field: int, value: bytes) -> bytes:
+    return encode_varint(field << 3 | 2) + encode_varint(len(value)) + value
+
+
+class TestTFEvents(unittest.TestCase):
+
+    def test_crc32c(self):
+        self.assertEqual(crc32c(b'123456789'), 0xe3069283)
+        self.assertEqual(crc32c(b''), 0)
+        self.assertEqual(py_crc32c(b'123456789'), 0xe3069283)
+        self.assertEqual(py_crc32c(b'6789', py_crc32c(b'12345')), 0xe3069283)
+
+    def test_tensor_scalar(self):
+        # torch.utils.tensorboard: DT_FLOAT tensor with packed float_val
+        float_tensor = b'\x08\x01' + encode_field(5, struct.pack('<f', 0.25))
+        # tf2 summary: DT_DOUBLE tensor with tensor_content
+        double_tensor = b'\x08\x02' + encode_field(4, struct.pack('<d', 1.5))
+        # DT_HALF tensor with half_val
+        half_tensor = b'\x08\x13' + encode_field(13, encode_varint(struct.unpack('<H', struct.pack('<e', 2.0))[0]))
+
+        summary = b''
+        for tag, tensor in [('loss', float_tensor), ('lr', double_tensor), ('half', half_tensor)]:
+            summary += encode_field(1, encode_field(1, tag.encode()) + encode_field(8, tensor))
+        event = decode_event(b'\x09' + struct.pack('<d', 100.0) + b'\x10\x07' + encode_field(5, summary))
+        self.assertEqual(event, dict(wall_time=100.0, step=7, scalars=dict(loss=0.25, lr=1.5, half=2.0)))
+
+    def test_summarize(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            writer = EventWriter(osp.join(tmp_dir, 'events.out.tfevents.1.host'))
+            for epoch in range(3):
+                for step in range(10):
+                    writer.add_scalar('train/loss', 1 / (step + 1), epoch * 10 + step, wall_time=epoch * 20 + step)
+                    # the per-iteration tag not used for seconds_per_epoch
+                    writer.add_scalar('val_loss_step', 1, epoch * 10 + step, wall_time=epoch * 20 + step)
+                writer.add_scalar('val/mAP', 0.1 * (epoch + 1), epoch * 10 + 9, wall_time=epoch * 20 + 10)
+            writer.close()
+
+            summary = summarize_tensorboard_dir(tmp_dir)
+            self.assertEqual(summary['errors'], {})
+            self.assertEqual(summary['scalars']['train/loss']['num'], 30)
+            self.assertEqual(summary['scalars']['val_loss_step']['num'], 30)
+            self.assertAlmostEqual(summary['scalars']['val/mAP']['last'], 0.3, places=5)
+            # 29 steps in 49 seconds
+            self.assertEqual(summary['steps_per_sec'], round(29 / 49, 3))
+            self.assertEqual(summary['seconds_per_epoch'], 20)
+
+    def test_corrupt_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            record = encode_record(encode_event(1.0, 1, dict(loss=0.5)))
+            files = dict(truncated=record + record[0:-3],
+                         flipped=record[0:-6] + bytes([record[-6] ^ 0xff]) + record[-5:],
+                         valid=record * 2)
+            for name, data in files.items():
+                with open(osp.join(tmp_dir, f'events.out.tfevents.{name}'), 'wb') as fw:
+                    fw.write(data)
+            os.makedirs(osp.join(tmp_dir, 'plugins'))
+
+            summary = summarize_tensorboard_dir(tmp_dir)
+            self.assertEqual(sorted(summary['errors']),
+                             ['events.out.tfevents.flipped', 'events.out.tfevents.truncated'])
+            self.assertIn('crc mismatch', summary['errors']['events.out.tfevents.flipped'])
+            self.assertEqual(summary['scalars']['loss']['num'], 2)
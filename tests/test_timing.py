@@ -0,0 +1,56 @@
+import json
+import os.path as osp
+import tempfile
+import threading
+import unittest
+
+from src.pipeline import PipeLine
+from src.timing import TimingTrace
+from tests.test_runtime import get_fake_cfg
+
+
+class TestTimingTrace(unittest.TestCase):
+
+    def test_summary(self):
+        trace = TimingTrace()
+        trace.add_span('training', 100, 110, category='executor')
+        # the nested span is counted by name, not by category
+        trace.add_span('template_fetch', 101, 102, task='training')
+        trace.add_span('verify', 110, 113)
+        thread = threading.Thread(target=trace.add_span, args=('mining', 100, 104, 'executor'), name='worker')
+        thread.start()
+        thread.join()
+
+        summary = trace.get_summary()
+        self.assertEqual(summary['names'], dict(training=10, template_fetch=1, verify=3, mining=4))
+        self.assertEqual(summary['categories'], dict(executor=14, verifier=3))
+
+    def test_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace = TimingTrace()
+            with trace.span('verify', task='infer'):
+                pass
+            trace.add_span('infer', 1.5, 2.25, category='executor')
+            trace.save_chrome_trace(osp.join(tmp_dir, 'timing-trace.json'))
+            with open(osp.join(tmp_dir, 'timing-trace.json'), 'r') as fp:
+                events = json.load(fp)['traceEvents']
+
+            self.assertEqual(events[0], dict(name='thread_name', ph='M', pid=1, tid=1,
+                                             args=dict(name=threading.current_thread().name)))
+            self.assertEqual([(e['name'], e['cat'], e['ph']) for e in events[1:]],
+                             [('verify', 'verifier', 'X'), ('infer', 'executor', 'X')])
+            self.assertEqual(events[1]['args'], dict(task='infer'))
+            self.assertEqual((events[2]['ts'], events[2]['dur']), (1500000, 750000))
+
+    def test_pipeline_trace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cfg = get_fake_cfg(tmp_dir)
+            cfg.tasks = ['training']
+            pipeline = PipeLine(cfg)
+            pipeline.run()
+
+            with open(osp.join(cfg.work_dir, pipeline.task_id, 'timing-trace.json'), 'r') as fp:
+                events = json.load(fp)['traceEvents']
+            spans = [e for e in events if e['ph'] == 'X']
+            self.assertIn('executor', [e['cat'] for e in spans])
+            self.assertTrue(all(e['dur'] >= 0 for e in spans))
@@ -0,0 +1,61 @@
+import json
+import os.path as osp
+import tempfile
+import unittest
+
+import yaml
+from easydict import EasyDict as edict
+
+# the module import, or the verifier is collected as test case
+from src import verifier_detection
+
+
+def get_verifier(tmp_dir: str, **kwargs) -> verifier_detection.VerifierDetection:
+    with open('tests/configs/all-in-one.yaml', 'r') as fp:
+        cfg = edict(yaml.safe_load(fp))
+    cfg.data_dir = None
+    cfg.in_dir = tmp_dir
+    cfg.out_dir = osp.join(tmp_dir, 'out')
+    cfg.runtime = 'fake'
+    cfg.update(kwargs)
+    return verifier_detection.VerifierDetection(cfg)
+
+
+def write_file(file_path: str, content: str) -> str:
+    with open(file_path, 'w') as fw:
+        fw.write(content)
+    return file_path
+
+
+class TestVerifierDetection(unittest.TestCase):
+
+    def test_mining_result(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_file = write_file(osp.join(tmp_dir, 'candidate-index.tsv'), '/in/assets/a.jpg\n/in/assets/b.jpg\n')
+            # relative path and negative score
+            result_file = write_file(osp.join(tmp_dir, 'result.tsv'), 'assets/a.jpg\t-1.5\nb.jpg\t-0.2\n')
+            v = get_verifier(tmp_dir)
+            v.verify_mining_result(result_file, index_file)
+            self.assertEqual(v.mining_score_stats['count'], 2)
+
+            v = get_verifier(tmp_dir, mining_score_range=[0, 1])
+            with self.assertRaises(AssertionError):
+                v.verify_mining_result(result_file, index_file)
+
+            result_file = write_file(osp.join(tmp_dir, 'result.tsv'), 'a.jpg\t0.5\nc.jpg\tnan\n')
+            with self.assertRaises(AssertionError):
+                get_verifier(tmp_dir).verify_mining_result(result_file, index_file)
+
+    def test_detection_result(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_file = write_file(osp.join(tmp_dir, 'candidate-index.tsv'), '/in/assets/a.jpg\n/in/assets/b.jpg\n')
+            annotations = [dict(box=dict(x=0, y=0, w=1, h=1), class_name='dog', score=0.5)]
+            result = dict(detection={name: dict(annotations=annotations) for name in ['/data/a.jpg', 'b.jpg']})
+            result_file = write_file(osp.join(tmp_dir, 'infer-result.json'), json.dumps(result))
+            get_verifier(tmp_dir).verify_detection_result(result_file, index_file)
+
+            result['detection']['b.jpg'] = dict(annotations=annotations + [
+                dict(box=dict(x=0, y=0, w=1, h=1), class_name='dog')])
+            result_file = write_file(osp.join(tmp_dir, 'infer-result.json'), json.dumps(result))
+            with self.assertRaisesRegex(AssertionError, 'no number score in annotations\\[1\\] of image b.jpg'):
+                get_verifier(tmp_dir).verify_detection_result(result_file, index_file)
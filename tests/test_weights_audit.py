@@ -0,0 +1,95 @@
+import os
+import os.path as osp
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from src import result_cache
+from src.result_cache import get_file_digest
+from src.weights_audit import audit_weights_dir, check_weights_file, compare_weights_dirs
+from src.workspace import materialize_file
+
+
+def write_checkpoint(file_path: str, payload: bytes) -> None:
+    os.makedirs(osp.dirname(file_path), exist_ok=True)
+    with zipfile.ZipFile(file_path, 'w') as zf:
+        zf.writestr('archive/data.pkl', payload)
+
+
+class TestWeightsAudit(unittest.TestCase):
+
+    def test_check_weights_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            valid_file = osp.join(tmp_dir, 'valid.pt')
+            write_checkpoint(valid_file, b'x' * 10000)
+            with open(valid_file, 'rb') as fp:
+                data = fp.read()
+            truncated_file = osp.join(tmp_dir, 'truncated.pt')
+            with open(truncated_file, 'wb') as fw:
+                fw.write(data[0:len(data) // 2])
+            empty_file = osp.join(tmp_dir, 'empty.pth')
+            open(empty_file, 'wb').close()
+            legacy_file = osp.join(tmp_dir, 'legacy.pt')
+            with open(legacy_file, 'wb') as fw:
+                fw.write(b'\x80\x02legacy pickle')
+
+            self.assertEqual(check_weights_file(valid_file), '')
+            self.assertEqual(check_weights_file(legacy_file), '')
+            self.assertIn('truncated', check_weights_file(truncated_file))
+            self.assertEqual(check_weights_file(empty_file), 'zero-byte file')
+
+    def test_audit(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            models_dir = osp.join(tmp_dir, 'models')
+            write_checkpoint(osp.join(models_dir, 'epoch_1', 'epoch_1.pt'), b'1' * 100)
+            write_checkpoint(osp.join(models_dir, 'epoch_2', 'epoch_2.pt'), b'2' * 100)
+            write_checkpoint(osp.join(models_dir, 'best', 'best.pt'), b'2' * 100)
+            open(osp.join(models_dir, 'epoch_2', 'empty.pt'), 'wb').close()
+            result = dict(model_stages=dict(epoch_1=dict(files=['epoch_1.pt']),
+                                            epoch_2=dict(files=['epoch_2.pt', 'empty.pt']),
+                                            best=dict(files=['best.pt'])))
+
+            audit = audit_weights_dir(models_dir, result, num_workers=2)
+            self.assertEqual(audit['file_num'], 4)
+            self.assertEqual(sorted(audit['stages']), ['best', 'epoch_1', 'epoch_2'])
+            self.assertEqual(audit['stages']['epoch_1']['size'], osp.getsize(osp.join(models_dir, 'epoch_1',
+                                                                                      'epoch_1.pt')))
+            self.assertEqual(audit['duplicates'], [['best/best.pt', 'epoch_2/epoch_2.pt']])
+            self.assertEqual(list(audit['errors']), ['epoch_2/empty.pt'])
+
+    def test_compare_weights_dirs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_dir = osp.join(tmp_dir, 'src')
+            des_dir = osp.join(tmp_dir, 'des')
+            for name in ['a.pt', 'b.pt', 'c.pt', 'd.pt']:
+                write_checkpoint(osp.join(src_dir, name), name.encode() * 100)
+            os.makedirs(des_dir)
+            method = materialize_file(osp.join(src_dir, 'a.pt'), osp.join(des_dir, 'a.pt'), hardlink=False)
+            self.assertIn(method, ['reflink', 'copy'])
+            write_checkpoint(osp.join(des_dir, 'b.pt'), b'changed')
+            os.link(osp.join(src_dir, 'd.pt'), osp.join(des_dir, 'd.pt'))
+
+            # the hardlink d.pt change with the source file
+            self.assertEqual(compare_weights_dirs(src_dir, des_dir), ['c.pt', 'd.pt', 'b.pt'])
+            self.assertFalse(osp.samefile(osp.join(src_dir, 'a.pt'), osp.join(des_dir, 'a.pt')))
+            # the hardlinks share the cached digest
+            self.assertEqual(get_file_digest(osp.join(src_dir, 'd.pt')), get_file_digest(osp.join(des_dir, 'd.pt')))
+
+    def test_compare_copy_without_reading(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_dir = osp.join(tmp_dir, 'src')
+            des_dir = osp.join(tmp_dir, 'des')
+            os.makedirs(des_dir)
+            for name in ['a.pt', 'e.pt']:
+                write_checkpoint(osp.join(src_dir, name), name.encode() * 100)
+                materialize_file(osp.join(src_dir, name), osp.join(des_dir, name), hardlink=False)
+            # the same content with different mtime is hashed
+            os.utime(osp.join(des_dir, 'e.pt'), (0, 0))
+
+            with mock.patch.object(result_cache, 'get_file_digest', wraps=get_file_digest) as digest:
+                self.assertEqual(compare_weights_dirs(src_dir, des_dir), [])
+            hashed_files = sorted(osp.relpath(call.args[0], start=tmp_dir) for call in digest.call_args_list)
+            self.assertEqual(hashed_files, ['des/e.pt', 'src/a.pt', 'src/e.pt'])
+            # the copy take the source digest
+            self.assertEqual(get_file_digest(osp.join(des_dir, 'a.pt')), get_file_digest(osp.join(src_dir, 'a.pt')))
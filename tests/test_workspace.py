@@ -0,0 +1,76 @@
+import os
+import os.path as osp
+import tempfile
+import unittest
+from unittest import mock
+
+from src import workspace
+from src.workspace import CopyStats, materialize_file, materialize_tree
+
+
+def write_file(file_path: str, content: str) -> str:
+    os.makedirs(osp.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as fw:
+        fw.write(content)
+    return file_path
+
+
+class TestWorkspace(unittest.TestCase):
+
+    def test_materialize_tree(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_dir = osp.join(tmp_dir, 'src')
+            write_file(osp.join(src_dir, 'models', 'best.pth'), 'weights')
+            write_file(osp.join(src_dir, 'result.yaml'), 'result')
+            os.makedirs(osp.join(src_dir, 'tensorboard'))
+
+            stats = CopyStats()
+            materialize_tree(src_dir, osp.join(tmp_dir, 'dst'), stats)
+            self.assertTrue(osp.samefile(osp.join(src_dir, 'models', 'best.pth'),
+                                         osp.join(tmp_dir, 'dst', 'models', 'best.pth')))
+            self.assertTrue(osp.isdir(osp.join(tmp_dir, 'dst', 'tensorboard')))
+            self.assertEqual(stats.to_dict(), dict(files=dict(hardlink=2, reflink=0, copy=0),
+                                                   bytes=dict(hardlink=13, reflink=0, copy=0),
+                                                   copied_bytes=0))
+
+            # the immutable copy never share the inode with source
+            stats = CopyStats()
+            materialize_tree(src_dir, osp.join(tmp_dir, 'handoff'), stats, hardlink=False)
+            self.assertFalse(osp.samefile(osp.join(src_dir, 'models', 'best.pth'),
+                                          osp.join(tmp_dir, 'handoff', 'models', 'best.pth')))
+            self.assertEqual(stats.files['hardlink'], 0)
+            self.assertEqual(stats.files['reflink'] + stats.files['copy'], 2)
+
+    def test_fallback(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_file = write_file(osp.join(tmp_dir, 'src.txt'), 'content')
+            dst_file = write_file(osp.join(tmp_dir, 'dst.txt'), 'old content')
+
+            # eg: cross device link, reflink on ext4
+            with mock.patch('os.link', side_effect=OSError('cross device')), \
+                    mock.patch.object(workspace, 'reflink', side_effect=OSError('not supported')):
+                self.assertEqual(materialize_file(src_file, dst_file), 'copy')
+            with open(dst_file, 'r') as fp:
+                self.assertEqual(fp.read(), 'content')
+
+            with mock.patch('os.link', side_effect=OSError('cross device')), \
+                    mock.patch.object(workspace, 'reflink') as reflink:
+                self.assertEqual(materialize_file(src_file, dst_file), 'reflink')
+            reflink.assert_called_once_with(src_file, dst_file)
+
+    def test_follow_symlinks(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outside_file = write_file(osp.join(tmp_dir, 'outside', 'best.pth'), 'weights')
+            src_dir = osp.join(tmp_dir, 'src')
+            write_file(osp.join(src_dir, 'result.yaml'), 'result')
+            os.symlink(outside_file, osp.join(src_dir, 'best.pth'))
+            os.symlink(osp.dirname(outside_file), osp.join(src_dir, 'stage'))
+
+            dst_dir = osp.join(tmp_dir, 'dst')
+            materialize_tree(src_dir, dst_dir, CopyStats(), hardlink=False)
+            # the link target outside the work dir is materialized, no dangling symlink in container
+            for name in ['best.pth', osp.join('stage', 'best.pth')]:
+                self.assertFalse(osp.islink(osp.join(dst_dir, name)))
+                with open(osp.join(dst_dir, name), 'r') as fp:
+                    self.assertEqual(fp.read(), 'weights')
+            self.assertFalse(osp.islink(osp.join(dst_dir, 'stage')))